@@ -0,0 +1,980 @@
+"""
+Micro-benchmarks for the itinerary planner.
+
+Usage:
+python backend/benchmarks.py solvers --pois 30 --days 3
+python backend/benchmarks.py multiday --pois 80 --days 7 14
+python backend/benchmarks.py transit --trains 5000 --stations 3000
+python backend/benchmarks.py catalogue --pois 200000
+python backend/benchmarks.py distance --origins 50 --pairs 200
+python backend/benchmarks.py scoring --pois 100000
+python backend/benchmarks.py topk --pois 50000
+python backend/benchmarks.py cache --requests 300
+python backend/benchmarks.py legs --pois 60
+python backend/benchmarks.py serving --clients 8 --workers 4
+python backend/benchmarks.py serialize --days 14
+python backend/benchmarks.py catalogue-endpoint --pois 20000
+python backend/benchmarks.py coldstart --pois 20000 --trains 5000
+python backend/benchmarks.py workers --workers 4 --pois 20000
+python backend/benchmarks.py reload --pois 20000
+python backend/benchmarks.py budget --budgets 3000 5000 8000
+python backend/benchmarks.py tour --cities 4 6 8 10
+python backend/benchmarks.py replan --plans 24
+python backend/benchmarks.py batch --days 3 5 7 10 --workers 1 4
+python backend/benchmarks.py chat --clients 16 --concurrency 4
+python backend/benchmarks.py chat-stub --port 8001  # then CHAT_BASE_URL=http://127.0.0.1:8001 python backend/main.py
+"""
+
+import os
+import sys
+import time
+import argparse
+import itertools
+import gzip
+import json
+import logging
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+import urllib.request
+import urllib.error
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import POI, config, trip_planner, TrainDataStorage, TransitRouter, POIStorage, SpatialIndex
+
+CATEGORIES = list(trip_planner.personalization.category_weights.keys())
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def add_synthetic_pois(city: str, center, count: int, seed: int = 0, spread_deg: float = 0.3):
+    rng = random.Random(seed)
+    pois = []
+    for k in range(count):
+        open_time = rng.choice([300, 360, 420, 480, 540])
+        close_time = rng.choice([960, 1020, 1080, 1140, 1200])
+        poi = POI(
+            f"bench_{city.lower()}_{k}", f"{city} Spot {k}", city,
+            center[0] + rng.uniform(-spread_deg, spread_deg), center[1] + rng.uniform(-spread_deg, spread_deg),
+            rng.sample(CATEGORIES, 2), rng.choice([45, 60, 90, 120]), rng.uniform(0.4, 0.95),
+            open_time, close_time, rng.choice([0, 50, 100, 200]), "RNC",
+            rating=rng.uniform(3.0, 4.8)
+        )
+        main.live_data().poi_storage.add_poi(poi)
+        pois.append(poi)
+    return pois
+
+
+def synthetic_timetable(num_trains: int, num_stations: int, stops_per_train: int = 20, seed: int = 0):
+    rng = random.Random(seed)
+    codes = [f"S{k:05d}" for k in range(num_stations)]
+    schedule = []
+    for t in range(num_trains):
+        minutes = rng.randrange(1440)
+        stops = []
+        for code in rng.sample(codes, stops_per_train):
+            stops.append((code, main.minutes_to_time(minutes % 1440), main.minutes_to_time((minutes + 2) % 1440)))
+            minutes += rng.randrange(20, 90)
+        schedule.append({"name": f"Synthetic {t}", "number": str(10000 + t), "stops": stops})
+    return codes, schedule
+
+
+def synthetic_catalogue(count: int, seed: int = 0):
+    """Yield `count` POIs spread over Jharkhand with varied categories, costs and seasons."""
+    rng = random.Random(seed)
+    for k in range(count):
+        month = rng.randrange(12)
+        yield POI(
+            f"catalogue_{k}", f"Attraction {k}", rng.choice(["Ranchi", "Deoghar", "Jamshedpur", "Betla", "Netarhat"]),
+            23.5 + rng.uniform(-1.5, 1.5), 85.5 + rng.uniform(-1.5, 1.5), rng.sample(CATEGORIES, rng.randint(1, 4)),
+            rng.choice([45, 60, 90, 120, 240, 400]), rng.uniform(0.4, 0.95), rng.choice([300, 360, 420]),
+            rng.choice([1020, 1080, 1200]), rng.choice([0, 50, 100, 200, 1500, 3000]), None,
+            f"Synthetic attraction number {k}", rng.uniform(3.0, 4.8), rng.randrange(5000), rng.uniform(0.3, 0.9),
+            rng.random() < 0.7, [MONTHS[(month + j) % 12] for j in range(rng.randint(0, 5))]
+        )
+
+
+def per_object_pass(pois, preferences, base_location):
+    """The filter + score loop over POI objects that the columnar store replaced."""
+    personalization = trip_planner.personalization
+    max_duration = config.PACE_CONFIGS[preferences["pace"]]["daily_hours"] * 60 // 2
+    passing = [poi for poi in pois if poi.cost <= preferences["budget"] * 0.4 and poi.duration <= max_duration]
+    distances = main.batch_distance(base_location[0], base_location[1],
+                                    [poi.lat for poi in passing], [poi.lon for poi in passing])
+    scored = []
+    for poi, distance in zip(passing, distances.tolist()):
+        budget_score = 0.3 if poi.cost > preferences["budget"] * 0.3 else 0.7 if poi.cost > preferences["budget"] * 0.15 else 1.0
+        score = (0.6 * personalization.calculate_personalization_score(poi, preferences)
+                 + 0.2 / (1.0 + distance / 100) + 0.2 * budget_score)
+        scored.append((score, poi))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [poi for _, poi in scored]
+
+
+def plan_city(pois, start_location, days: int, solver: str, pace: str, time_limit_ms: int):
+    remaining, scheduled, travel_minutes = list(pois), 0, 0
+    location = start_location
+    for day in range(days):
+        if not remaining:
+            break
+        schedule, location = trip_planner.optimize_day_route(
+            remaining, location, "Ranchi", day * 1440 + 8 * 60, 22 * 60, "car",
+            solver=solver, pace=pace, time_limit_ms=time_limit_ms
+        )
+        if not schedule:
+            break
+        ids = {item["poi"].id for item in schedule}
+        remaining = [p for p in remaining if p.id not in ids]
+        scheduled += len(schedule)
+        travel_minutes += sum(item["travel_time"] for item in schedule)
+    return scheduled, travel_minutes
+
+
+def bench_solvers(args):
+    pois = add_synthetic_pois("Ranchi", config.DEFAULT_BASE_LOCATION, args.pois)
+    print(f"{args.pois} POIs, {args.days} days, pace={args.pace}, time limit {args.time_limit_ms} ms")
+    print(f"{'solver':<8} {'scheduled':>9} {'travel_min':>10} {'seconds':>8} {'pois/s':>9}")
+    for solver in config.SOLVERS:
+        start = time.perf_counter()
+        scheduled, travel_minutes = plan_city(pois, config.DEFAULT_BASE_LOCATION, args.days, solver,
+                                              args.pace, args.time_limit_ms)
+        elapsed = time.perf_counter() - start
+        print(f"{solver:<8} {scheduled:>9} {travel_minutes:>10} {elapsed:>8.3f} {scheduled / elapsed:>9.1f}")
+
+
+def bench_multiday(args):
+    pois = add_synthetic_pois("Ranchi", config.DEFAULT_BASE_LOCATION, args.pois, spread_deg=0.6)
+    base = config.DEFAULT_BASE_LOCATION
+    print(f"{args.pois} POIs, pace={args.pace}")
+    print(f"{'days':>4} {'planner':<8} {'solver':<8} {'scheduled':>9} {'travel_min':>10} {'seconds':>8}")
+    for days in args.days:
+        for solver in args.solvers:
+            start = time.perf_counter()
+            scheduled, travel_minutes = plan_city(pois, base, days, solver, args.pace, args.time_limit_ms)
+            elapsed = time.perf_counter() - start
+            print(f"{days:>4} {'daily':<8} {solver:<8} {scheduled:>9} {travel_minutes:>10} {elapsed:>8.3f}")
+
+            start = time.perf_counter()
+            day_plans = trip_planner.plan_city_days(pois, base, "Ranchi", 1, days, "car", solver=solver,
+                                                    pace=args.pace, time_limit_ms=args.time_limit_ms)
+            elapsed = time.perf_counter() - start
+            scheduled = sum(len(schedule) for schedule, _, _ in day_plans)
+            travel_minutes = sum(item["travel_time"] for schedule, _, _ in day_plans for item in schedule)
+            print(f"{days:>4} {'joint':<8} {solver:<8} {scheduled:>9} {travel_minutes:>10} {elapsed:>8.3f}")
+
+
+def bench_transit(args):
+    codes, schedule = synthetic_timetable(args.trains, args.stations, args.stops)
+    timetable = TrainDataStorage()
+    start = time.perf_counter()
+    timetable.load_timetable(schedule)
+    router = TransitRouter(timetable)
+    router.earliest_arrival(codes[0], codes[1], 0)
+    print(f"{args.trains} trains, {args.stations} stations: load + unroll {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(1)
+    queries = [(rng.choice(codes), rng.choice(codes), rng.randrange(1440)) for _ in range(args.queries)]
+    router._scans.clear()
+    start = time.perf_counter()
+    found = sum(router.earliest_arrival(a, b, t) is not None for a, b, t in queries)
+    elapsed = time.perf_counter() - start
+    print(f"cold:  {args.queries / elapsed:9.1f} queries/s ({found}/{args.queries} reachable)")
+
+    # The per-candidate pattern: one origin and departure minute, many targets
+    origin, depart = codes[0], 8 * 60
+    targets = [rng.choice(codes) for _ in range(args.queries)]
+    router._scans.clear()
+    start = time.perf_counter()
+    for target in targets:
+        router.earliest_arrival(origin, target, depart)
+    elapsed = time.perf_counter() - start
+    print(f"shared origin: {args.queries / elapsed:9.1f} queries/s")
+
+
+def bench_catalogue(args):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects, grid = {}, SpatialIndex(config.POI_GRID_CELL_DEG)
+    for poi in synthetic_catalogue(args.pois):
+        objects[poi.id] = poi
+        grid.insert(poi.id, poi.lat, poi.lon)
+    object_bytes = tracemalloc.get_traced_memory()[0] - start
+
+    start = tracemalloc.get_traced_memory()[0]
+    storage = POIStorage()
+    for poi in synthetic_catalogue(args.pois):
+        storage.add_poi(poi)
+    column_bytes = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    print(f"{args.pois} POIs")
+    print(f"memory: dict of POI objects {object_bytes / args.pois:6.0f} B/POI, "
+          f"columnar store {column_bytes / args.pois:6.0f} B/POI")
+
+    preferences = {"budget": 20000, "pace": "moderate", "interests": ["nature", "culture", "temple"],
+                   "family_trip": True, "accessibility_needs": False}
+    base = config.DEFAULT_BASE_LOCATION
+    pois = list(objects.values())
+    for label, run in (("per-object pass", lambda: per_object_pass(pois, preferences, base)),
+                       ("columnar rank_pois", lambda: trip_planner.rank_pois(storage, preferences, base)),
+                       ("rank + materialise", lambda: trip_planner.filter_and_score_pois(storage, preferences, base))):
+        start = time.perf_counter()
+        ranked = run()
+        print(f"{label:<20} {time.perf_counter() - start:8.3f} s ({len(ranked)} POIs)")
+
+
+def bench_distance(args):
+    """batch_distance in both accuracy modes vs geopy's geodesic; exits non-zero past the tolerances."""
+    from geopy.distance import geodesic
+    rng = np.random.default_rng(0)
+
+    def short_span(lat, lon, n):
+        return lat + rng.uniform(-0.5, 0.5, n), lon + rng.uniform(-0.5, 0.5, n)
+
+    def long_span(lat, lon, n):
+        return rng.uniform(-89, 89, n), rng.uniform(-180, 180, n)
+
+    def antipodal(lat, lon, n):
+        return -lat + rng.uniform(-1e-3, 1e-3, n), (lon + 180 + rng.uniform(-1e-3, 1e-3, n) + 180) % 360 - 180
+
+    failures = []
+    print(f"{args.origins} origins x {args.pairs} points per span")
+    print(f"{'span':<10} {'mode':<6} {'batch_ms':>8} {'geopy_ms':>8} {'max_abs_km':>11} {'max_rel':>9}")
+    jharkhand, world = ((21.9, 25.3), (83.3, 87.9)), ((-80, 80), (-180, 180))
+    for span, (lat_range, lon_range), targets in (("short", jharkhand, short_span), ("long", world, long_span),
+                                                  ("antipodal", world, antipodal)):
+        origins = [(rng.uniform(*lat_range), rng.uniform(*lon_range)) for _ in range(args.origins)]
+        pairs = [(lat, lon) + targets(lat, lon, args.pairs) for lat, lon in origins]
+        start = time.perf_counter()
+        reference = [np.array([geodesic((lat, lon), (a, b)).kilometers for a, b in zip(lats, lons)])
+                     for lat, lon, lats, lons in pairs]
+        geopy_ms = 1000 * (time.perf_counter() - start)
+        for mode, limit_abs, limit_rel in (("exact", args.exact_tolerance_km, None), ("fast", None, args.fast_tolerance)):
+            start = time.perf_counter()
+            computed = [main.batch_distance(lat, lon, lats, lons, mode) for lat, lon, lats, lons in pairs]
+            batch_ms = 1000 * (time.perf_counter() - start)
+            errors = np.concatenate([np.abs(km - ref) for km, ref in zip(computed, reference)])
+            relative = errors / np.maximum(np.concatenate(reference), 1e-9)
+            print(f"{span:<10} {mode:<6} {batch_ms:>8.2f} {geopy_ms:>8.2f} {errors.max():>11.2e} {relative.max():>9.3%}")
+            if limit_abs is not None and errors.max() > limit_abs:
+                failures.append(f"{mode} {span}: {errors.max():.2e} km")
+            if limit_rel is not None and relative.max() > limit_rel:
+                failures.append(f"{mode} {span}: {relative.max():.3%}")
+    if failures:
+        sys.exit("batch_distance drifted from geopy: " + ", ".join(failures))
+
+
+def bench_scoring(args):
+    """Batch vs scalar personalization; exits non-zero if any score differs."""
+    storage = POIStorage()
+    for poi in synthetic_catalogue(args.pois):
+        storage.add_poi(poi)
+    pois = storage.get_all_pois()
+    personalization = trip_planner.personalization
+    print(f"{len(storage)} POIs")
+    print(f"{'interests':<40} {'flags':<5} {'month':<5} {'scalar_s':>8} {'batch_ms':>8} {'mismatches':>10}")
+    interest_sets = [[], ["nature"], ["nature", "culture", "temple", "waterfall"], ["waterfall", "nature", "nature", "scuba"]]
+    mismatches = 0
+    for interests, accessibility, family, month in itertools.product(interest_sets, (False, True), (False, True), ("Jan", "Jul")):
+        preferences = {"interests": interests, "accessibility_needs": accessibility, "family_trip": family}
+        start = time.perf_counter()
+        scalar = [personalization.calculate_personalization_score(poi, preferences, month) for poi in pois]
+        scalar_s = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = personalization.calculate_personalization_scores(storage, preferences, current_month=month)
+        batch_ms = (time.perf_counter() - start) * 1000
+        differing = int(sum(a != b for a, b in zip(scalar, batch.tolist())))
+        mismatches += differing
+        flags = f"{'A' if accessibility else '-'}{'F' if family else '-'}"
+        print(f"{','.join(interests) or '-':<40} {flags:<5} {month:<5} {scalar_s:>8.3f} {batch_ms:>8.2f} {differing:>10}")
+    if mismatches:
+        sys.exit(f"{mismatches} batch scores differ from the scalar path")
+
+
+def bench_topk(args):
+    storage = POIStorage()
+    for poi in synthetic_catalogue(args.pois):
+        storage.add_poi(poi)
+    base = config.DEFAULT_BASE_LOCATION
+    print(f"{len(storage)} POIs")
+    print(f"{'days':>4} {'pace':<9} {'K':>5} {'full_s':>7} {'top_k_s':>7} {'city_full':>9} {'route_full_s':>12} "
+          f"{'city_k':>6} {'route_k_s':>9}")
+    for days in args.days:
+        for pace in config.PACE_CONFIGS:
+            preferences = {"num_days": days, "pace": pace, "budget": 20000, "interests": ["nature", "culture"]}
+            k = trip_planner.candidate_limit(preferences, storage)
+            start = time.perf_counter()
+            ranked = trip_planner.filter_and_score_pois(storage, preferences, base)
+            full_s = time.perf_counter() - start
+            start = time.perf_counter()
+            candidates = trip_planner.filter_and_score_pois(storage, preferences, base, k)
+            top_k_s = time.perf_counter() - start
+
+            # One greedy day in the top candidate's city, from every passing POI there vs the top-K ones
+            city = candidates[0].city
+            timings = []
+            for pool in ([p for p in ranked if p.city == city][:args.route_cap], [p for p in candidates if p.city == city]):
+                start = time.perf_counter()
+                trip_planner.optimize_day_route(pool, base, city, 8 * 60, 22 * 60, "car", pace=pace)
+                timings.append((len(pool), time.perf_counter() - start))
+            (full_pool, route_full_s), (k_pool, route_k_s) = timings
+            print(f"{days:>4} {pace:<9} {k:>5} {full_s:>7.3f} {top_k_s:>7.3f} {full_pool:>9} {route_full_s:>12.3f} "
+                  f"{k_pool:>6} {route_k_s:>9.3f}")
+
+
+def bench_cache(args):
+    """Replay skewed traffic over popular preference combinations through the endpoint."""
+    rng = random.Random(0)
+    combos = [{"destination_city": city, "num_days": days, "transport_mode": mode, "interests": ["nature", "culture"]}
+              for city in ("Ranchi", "Deoghar", "Jamshedpur", "Netarhat") for days in (3, 5, 7) for mode in ("car", "train")]
+    weights = [1.0 / (rank + 1) for rank in range(len(combos))]  # Zipf-like popularity
+    client = main.app.test_client()
+    main.logger.setLevel(logging.WARNING)
+    main.itinerary_cache.clear()
+    latencies = {"hit": [], "miss": []}
+    for _ in range(args.requests):
+        body = dict(rng.choices(combos, weights)[0], start_date=f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+        before = main.itinerary_cache.counters["misses"]
+        start = time.perf_counter()
+        response = client.post("/api/generate-itinerary", json=body)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        latencies["miss" if main.itinerary_cache.counters["misses"] > before else "hit"].append(elapsed)
+    stats = main.itinerary_cache.stats()
+    print(f"{args.requests} requests over {len(combos)} combinations: hit rate {stats['hit_rate']:.1%}")
+    for kind, values in latencies.items():
+        if values:
+            print(f"{kind:<5} {len(values):>5} requests, mean {1000 * sum(values) / len(values):8.2f} ms")
+
+
+def bench_legs(args):
+    """Repeated planning for one city with varied preferences, with and without the journey-leg cache."""
+    add_synthetic_pois("Ranchi", config.DEFAULT_BASE_LOCATION, args.pois, spread_deg=0.4)
+    main.logger.setLevel(logging.WARNING)
+    requests = [{"num_days": days, "destination_city": "Ranchi", "transport_mode": mode, "interests": interests,
+                 "pace": pace, "start_date": "2025-01-10", "home_city": "Mumbai"}
+                for days in (3, 5) for mode in ("car", "train") for pace in config.PACE_CONFIGS
+                for interests in ([], ["nature"], ["culture", "history"])]
+    cache = main.journey_leg_cache
+    print(f"{len(requests)} requests, {args.pois} extra POIs in Ranchi, bucket {cache.bucket_minutes} min")
+    for label, size in (("uncached", 0), ("cached", config.JOURNEY_CACHE_SIZE)):
+        cache.max_entries = size
+        cache.clear()
+        cache.counters = dict.fromkeys(cache.counters, 0)
+        for rounds in (1, 2):
+            start = time.perf_counter()
+            for preferences in requests:
+                trip_planner.generate_itinerary(preferences)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<9} pass {rounds}: {1000 * elapsed / len(requests):7.2f} ms/request")
+    print(cache.stats())
+
+
+def bench_serving(args):
+    """Concurrent itinerary requests plus /health probes against a threaded server, inline vs solver pool."""
+    from werkzeug.serving import make_server
+    add_synthetic_pois("Ranchi", config.DEFAULT_BASE_LOCATION, args.pois, spread_deg=0.4)
+    main.logger.setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def call(path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as response:
+                status = response.status
+                response.read()
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return status, time.perf_counter() - start
+
+    for label, pool in (("inline", None), ("pool", main.SolverPool(args.workers, args.clients))):
+        if pool is not None:
+            pool.start()
+        main.solver_pool = pool
+        main.itinerary_cache.clear()
+        bodies = [{"num_days": 5, "destination_city": "Ranchi", "solver": "ortools", "planner": "joint",
+                   "interests": ["nature"], "budget": 20000 + k} for k in range(args.requests)]
+        probes = []
+        stop = threading.Event()
+
+        def probe():
+            while not stop.is_set():
+                probes.append(call("/health")[1])
+                time.sleep(0.01)
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as clients:
+            results = list(clients.map(lambda body: call("/api/generate-itinerary", body), bodies))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        prober.join()
+        statuses = sorted({status for status, _ in results})
+        probes.sort()
+        print(f"{label:<7} {len(bodies) / elapsed:6.2f} itineraries/s, statuses {statuses}, "
+              f"/health p50 {1000 * probes[len(probes) // 2]:7.2f} ms p99 {1000 * probes[int(len(probes) * 0.99)]:7.2f} ms")
+        if pool is not None:
+            print(pool.stats())
+    main.solver_pool = None
+    server.shutdown()
+
+
+def bench_serialize(args):
+    """Encode time and size of a long plan: asdict + Flask JSON vs plan_dict + encode_json."""
+    add_synthetic_pois("Ranchi", config.DEFAULT_BASE_LOCATION, args.pois, spread_deg=0.4)
+    main.logger.setLevel(logging.WARNING)
+    trip_plan = trip_planner.generate_itinerary({"num_days": args.days, "destination_city": "Ranchi", "pace": "fast",
+                                                 "budget": 1e9, "start_date": "2025-01-10"})
+    print(f"{args.days}-day plan, {trip_plan.total_pois} POIs, encoder {'orjson' if main.orjson else 'json'}")
+    with main.app.app_context():
+        variants = {
+            "asdict+flask": lambda: main.app.json.dumps(asdict(trip_plan)).encode(),
+            "plan_dict+encode": lambda: main.encode_json(main.plan_dict(trip_plan)),
+        }
+        for label, encode in variants.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                body = encode()
+            elapsed = (time.perf_counter() - start) / args.repeat
+            sizes = f"raw {len(body):>7} B, gzip {len(gzip.compress(body, config.GZIP_LEVEL)):>6} B"
+            if main.brotli is not None:
+                sizes += f", br {len(main.brotli.compress(body, quality=config.BROTLI_QUALITY)):>6} B"
+            print(f"{label:<17} {1e6 * elapsed:8.1f} us  {sizes}")
+
+
+def bench_catalogue_endpoint(args):
+    """GET /api/available-pois: render after add_poi vs cached body vs 304 revalidation vs one projected page."""
+    storage = POIStorage()
+    for poi in synthetic_catalogue(args.pois):
+        storage.add_poi(poi)
+    # the endpoint only reads the catalogue; the travel matrix is not involved
+    main.set_live_data(replace(main.live_data(), poi_storage=storage))
+    main.logger.setLevel(logging.WARNING)
+    client = main.app.test_client()
+    gzip_header = {"Accept-Encoding": "gzip"}
+
+    def timed(label, path, headers=None, invalidate=False):
+        elapsed = 0.0
+        for _ in range(args.repeat):
+            if invalidate:
+                storage.version += 1
+            start = time.perf_counter()
+            response = client.get(path, headers=headers or {})
+            elapsed += time.perf_counter() - start
+        print(f"{label:<22} {1000 * elapsed / args.repeat:8.2f} ms  status {response.status_code}, {len(response.data):>9} B")
+        return response
+
+    print(f"{len(storage)} POIs")
+    timed("render (gzip)", "/api/available-pois", gzip_header, invalidate=True)
+    etag = timed("cached (gzip)", "/api/available-pois", gzip_header).headers["ETag"]
+    timed("If-None-Match", "/api/available-pois", {"If-None-Match": etag})
+    timed("page of 50, 2 fields", "/api/available-pois?fields=id,name&limit=50", gzip_header)
+
+
+def write_synthetic_source(path: str, args):
+    codes, schedule = synthetic_timetable(args.trains, args.stations)
+    rng = random.Random(0)
+    stations = pd.DataFrame([[code, f"Station {code}", f"City {code}", 23.5 + rng.uniform(-3, 3), 85.5 + rng.uniform(-3, 3)]
+                             for code in codes], columns=main.SOURCE_TABLES["stations"])
+    stops = pd.DataFrame([[train["number"], train["name"], seq, *stop] for train in schedule
+                          for seq, stop in enumerate(train["stops"])], columns=main.SOURCE_TABLES["stops"])
+    pois = pd.DataFrame([[getattr(poi, c) if not isinstance(getattr(poi, c), list) else ",".join(getattr(poi, c))
+                          for c in main.SOURCE_TABLES["pois"]] for poi in synthetic_catalogue(args.pois)],
+                        columns=main.SOURCE_TABLES["pois"])
+    db = sqlite3.connect(path)
+    for name, frame in (("stations", stations), ("stops", stops), ("pois", pois)):
+        frame.to_sql(name, db, index=False)
+    db.close()
+    print(f"{args.pois} POIs, {args.trains} trains over {args.stations} stations ({len(stops)} stops)")
+
+
+def bench_coldstart(args):
+    """Process start-up from a SQLite source vs from memory-mapped artifacts built from it."""
+    workdir = tempfile.mkdtemp(prefix="coldstart-")
+    source, artifacts = os.path.join(workdir, "source.sqlite"), os.path.join(workdir, "artifacts")
+    write_synthetic_source(source, args)
+
+    start = time.perf_counter()
+    manifest = main.build_artifacts(source, artifacts)
+    print(f"build-artifacts        {time.perf_counter() - start:7.2f} s  ({manifest['matrix_nodes']} matrix nodes)")
+    probe = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    for label, variable, path in (("start from source", "DATA_SOURCE", source),
+                                  ("start from artifacts", "DATA_ARTIFACTS", artifacts)):
+        env = dict(os.environ, **{variable: path})
+        output = subprocess.run([sys.executable, "-c", probe], env=env, capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        print(f"{label:<22} {float(output.split()[-1]):7.2f} s  (import main)")
+
+
+WORKER_PROBE = """
+import sys, numpy, main
+for holder in (main.live_data().poi_storage, main.live_data().train_data, main.live_data().travel_matrix):
+    for value in vars(holder).values():
+        if isinstance(value, numpy.ndarray) and value.dtype != object:
+            value.sum()
+main.live_data().transit_router.warm()
+print(main.live_data().generation, flush=True)
+sys.stdin.read()
+"""
+
+
+def memory_of(pid: int) -> Dict[str, int]:
+    """Rss, Pss (shared pages divided between their users) and private kB from /proc (Linux)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def bench_workers(args):
+    """Per-worker memory with each worker loading its own copy vs attaching to one shared generation."""
+    workdir = tempfile.mkdtemp(prefix="workers-")
+    source = os.path.join(workdir, "source.sqlite")
+    write_synthetic_source(source, args)
+    shared_root = os.path.join(args.shm if os.path.isdir(args.shm) else workdir, f"generations-{os.getpid()}")
+    for label, extra in (("own copy (DATA_SOURCE)", {}),
+                         ("shared generation", {"SHARED_DATA_DIR": shared_root})):
+        env = dict(os.environ, DATA_SOURCE=source, **extra)
+        start = time.perf_counter()
+        workers = [subprocess.Popen([sys.executable, "-c", WORKER_PROBE], env=env, stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+                   for _ in range(args.workers)]
+        generations = {worker.stdout.readline().strip() for worker in workers}
+        elapsed = time.perf_counter() - start
+        usage = [memory_of(worker.pid) for worker in workers]
+        for worker in workers:
+            worker.communicate("")
+        total = {key: sum(u[key] for u in usage) / 1024 for key in ("rss", "pss", "private")}
+        print(f"{label:<24} {args.workers} workers ready in {elapsed:6.1f} s  generation {','.join(sorted(generations))}  "
+              f"pss {total['pss']:7.1f} MB ({total['pss'] / args.workers:6.1f}/worker)  "
+              f"private {total['private']:7.1f} MB  rss {total['rss']:7.1f} MB")
+    shutil.rmtree(shared_root, ignore_errors=True)
+
+
+def bench_reload(args):
+    """Request latency while a reload builds a new snapshot from a large source and swaps it in."""
+    source = os.path.join(tempfile.mkdtemp(prefix="reload-"), "source.sqlite")
+    write_synthetic_source(source, args)
+    main.logger.setLevel(logging.WARNING)
+    client = main.app.test_client()
+    body = {"num_days": 2, "destination_city": "Ranchi", "interests": ["nature"]}
+    samples = []
+
+    def probe(stop):
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.post("/api/generate-itinerary", json=body).status_code
+            samples.append((start, time.perf_counter() - start, status, main.live_data().generation))
+
+    def report(label, window):
+        latencies = sorted(elapsed for _, elapsed, _, _ in window)
+        if latencies:
+            print(f"{label:<16} {len(latencies):>5} requests  p50 {1000 * latencies[len(latencies) // 2]:7.1f} ms  "
+                  f"p99 {1000 * latencies[int(len(latencies) * 0.99)]:7.1f} ms  max {1000 * latencies[-1]:7.1f} ms  "
+                  f"errors {sum(status != 200 for _, _, status, _ in window)}")
+
+    main.itinerary_cache.max_entries = 0  # every probe plans
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(stop,))
+    prober.start()
+    time.sleep(args.settle)
+    began = time.perf_counter()
+    main.data_reloader.start(source)
+    while main.data_reloader.stats()["state"] == "running":
+        time.sleep(0.05)
+    swapped = time.perf_counter()
+    time.sleep(args.settle)
+    stop.set()
+    prober.join()
+    status = main.data_reloader.stats()
+    print(f"reload {status['state']} in {status['seconds']:.2f} s -> generation {status['generation']}, "
+          f"{len(main.live_data().poi_storage)} POIs")
+    report("before reload", [s for s in samples if s[0] < began])
+    report("during reload", [s for s in samples if began <= s[0] < swapped])
+    report("after swap", [s for s in samples if s[0] >= swapped])
+
+
+def bench_budget(args):
+    """Budget-constrained candidate selection: knapsack vs taking candidates in ranking order,
+    then whole plans at each budget."""
+    rng = np.random.default_rng(0)
+    scores, costs = rng.uniform(0.3, 1.0, args.candidates), rng.choice([0, 50, 100, 200, 500, 1500], args.candidates)
+    costs = costs + rng.uniform(20, 400, args.candidates)
+    print(f"{args.candidates} candidates, capacity {args.capacity}")
+    print(f"{'budget':>7} {'ranked score':>12} {'knapsack score':>14} {'ms':>7}")
+    for budget in args.budgets:
+        spent, ranked = 0.0, []
+        for k in range(args.candidates):
+            if len(ranked) < args.capacity and spent + costs[k] <= budget:
+                ranked.append(k)
+                spent += costs[k]
+        start = time.perf_counter()
+        chosen = trip_planner.select_within_budget(scores, costs, budget, args.capacity)
+        elapsed = time.perf_counter() - start
+        assert costs[chosen].sum() <= budget and len(chosen) <= args.capacity
+        print(f"{budget:>7} {scores[ranked].sum():>12.2f} {scores[chosen].sum():>14.2f} {1000 * elapsed:>7.2f}")
+
+    main.logger.setLevel(logging.WARNING)
+    print(f"\n{'budget':>7} {'plans':>5} {'within':>6} {'mean POIs':>9} {'mean cost':>9} {'seconds':>8}")
+    for budget in args.budgets:
+        plans, elapsed = [], 0.0
+        for city, days, mode in itertools.product(("Ranchi", "Jamshedpur", "Netarhat"), (3, 7), ("car", "train")):
+            preferences = {"destination_city": city, "home_city": "Ranchi", "num_days": days, "transport_mode": mode,
+                           "budget": budget, "interests": ["nature", "culture"], "start_date": "2025-01-10"}
+            start = time.perf_counter()
+            plans.append(trip_planner.generate_itinerary(preferences))
+            elapsed += time.perf_counter() - start
+        within = sum(plan.total_cost <= budget for plan in plans)
+        print(f"{budget:>7} {len(plans):>5} {within:>6} {sum(p.total_pois for p in plans) / len(plans):>9.1f} "
+              f"{sum(p.total_cost for p in plans) / len(plans):>9.0f} {elapsed / len(plans):>8.3f}")
+
+
+def bench_tour(args):
+    """Inter-city transit minutes of visiting cities in score order vs in the tour solver's order."""
+    storage = main.live_data().poi_storage
+    by_city = {}
+    for poi in trip_planner.filter_and_score_pois(storage, {"interests": []}, config.DEFAULT_BASE_LOCATION):
+        by_city.setdefault(poi.city, []).append(poi)
+    cities = sorted(by_city)
+    rng = random.Random(0)
+
+    def transit(sequence):
+        return sum(trip_planner.city_leg(a, b, args.mode)["total_time"] for a, b in zip(sequence, sequence[1:]))
+
+    print(f"{len(cities)} cities with POIs, mode={args.mode}, {args.trials} trips per size")
+    print(f"{'cities':>6} {'score order min':>15} {'tour min':>9} {'saved':>6} {'solve ms':>8}")
+    for size in args.cities:
+        size = min(size, len(cities))
+        ranked_total, tour_total, elapsed = 0.0, 0.0, 0.0
+        for _ in range(args.trials):
+            sequence = rng.sample(cities, size)  # destination first, the rest as ranking produced them
+            trip = {city: by_city[city] for city in sequence}
+            trip_planner.plan_city_tour(sequence[0], trip, {}, None, args.mode)  # warm the city legs
+            start = time.perf_counter()
+            tour = trip_planner.plan_city_tour(sequence[0], trip, {}, None, args.mode)
+            elapsed += time.perf_counter() - start
+            assert sorted(tour) == sorted(sequence)
+            ranked_total += transit(sequence)
+            tour_total += transit(tour)
+        print(f"{size:>6} {ranked_total / args.trials:>15.0f} {tour_total / args.trials:>9.0f} "
+              f"{1 - tour_total / max(ranked_total, 1e-9):>6.1%} {1000 * elapsed / args.trials:>8.2f}")
+
+
+def bench_replan(args):
+    """Edits applied through /api/itinerary/replan vs generating the edited trip from scratch."""
+    rng = random.Random(0)
+    client = main.app.test_client()
+    main.logger.setLevel(logging.WARNING)
+    timings = {"generate": [], "remove": [], "add": [], "start_date": []}
+    changed = {"remove": [], "add": [], "start_date": []}
+    combos = list(itertools.product(("Ranchi", "Deoghar", "Netarhat", "Jamshedpur"), (5, 7, 10), ("car", "train"),
+                                    ("moderate", "fast")))
+    for destination, days, mode, pace in rng.sample(combos, min(args.plans, len(combos))):
+        body = {"destination_city": destination, "num_days": days, "transport_mode": mode, "pace": pace,
+                "home_city": "Ranchi", "interests": ["nature", "culture"], "solver": args.solver}
+        main.itinerary_cache.clear()
+        start = time.perf_counter()
+        plan = client.post("/api/generate-itinerary", json=body).get_json()["data"]
+        timings["generate"].append(time.perf_counter() - start)
+        planned = [item["poi"]["id"] for day in plan["days"] for item in day["pois"] if "poi" in item]
+        if not planned:
+            continue
+        removed = rng.choice(planned)
+        edits = (("remove", plan, {"remove_pois": [removed]}), ("add", None, {"add_pois": [removed]}),
+                 ("start_date", plan, {"start_date": "2025-12-01"}))
+        for kind, base, changes in edits:
+            start = time.perf_counter()
+            response = client.post("/api/itinerary/replan", json={"plan": base or plan, "changes": changes})
+            timings[kind].append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+            result = response.get_json()
+            changed[kind].append(len(result["replan"]["changed_days"]))
+            if kind == "remove":
+                plan = result["data"]  # the add puts the removed POI back
+    print(f"{len(timings['generate'])} plans, solver={args.solver}")
+    for kind, values in timings.items():
+        days = f"{sum(changed[kind]) / len(changed[kind]):5.1f} days changed" if kind in changed else ""
+        print(f"{kind:<10} mean {1000 * sum(values) / len(values):8.2f} ms {days}")
+
+
+def bench_batch(args):
+    """Canned itineraries (city x pace x duration): serial endpoint calls vs generate_batch."""
+    main.logger.setLevel(logging.WARNING)
+    cities = sorted(set(poi.city for poi in main.live_data().poi_storage.get_all_pois()))
+    bodies = [{"destination_city": city, "pace": pace, "num_days": days}
+              for city in cities for pace in config.PACE_CONFIGS for days in args.days]
+    print(f"{len(bodies)} itineraries")
+    client = main.app.test_client()
+    main.itinerary_cache.clear()
+    main.journey_leg_cache.clear()  # every run starts with cold legs
+    start = time.perf_counter()
+    for body in bodies:
+        assert client.post("/api/generate-itinerary", json=body).status_code == 200
+    elapsed = time.perf_counter() - start
+    print(f"{'serial requests':<18} {elapsed:7.2f} s {len(bodies) / elapsed:8.1f} itineraries/s")
+    preference_sets = [main.parse_itinerary_request(body)[0] for body in bodies]
+    for workers in args.workers:
+        main.itinerary_cache.clear()
+        main.journey_leg_cache.clear()
+        summary = list(main.generate_batch(preference_sets, workers, prime_cache=False))[-1]["data"]
+        assert summary["failed"] == 0, summary
+        print(f"{f'batch, {workers} workers':<18} {summary['seconds']:7.2f} s {summary['itineraries_per_second']:8.1f} itineraries/s")
+
+
+STUB_ANSWER = ("Hundru Falls is 45 km from Ranchi (23.45 N, 85.65 E), where the Subarnarekha drops 98 m. "
+               "Visit from July to October, take a cab from Ranchi and try dhuska at the stalls by the steps.")
+
+
+def chat_stub_app(latency: float, tokens_per_second: float, error_rate: float = 0.0):
+    """OpenAI-compatible chat completions that always answer STUB_ANSWER, plain or streamed."""
+    from flask import Flask, Response, jsonify, request
+    app = Flask("chat_stub")
+    words = STUB_ANSWER.split(" ")
+    tokens = [word + " " for word in words[:-1]] + words[-1:]
+
+    @app.route("/openai/v1/chat/completions", methods=["POST"])
+    def completions():
+        body = request.get_json()
+        time.sleep(latency)
+        if random.random() < error_rate:
+            return jsonify({"error": {"message": "stub overloaded", "type": "server_error"}}), 503
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            time.sleep(len(tokens) / tokens_per_second)
+            return jsonify(dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": {"role": "assistant", "content": STUB_ANSWER}, "finish_reason": "stop"}
+            ], usage={"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}))
+
+        def chunk(delta, finish_reason=None):
+            payload = dict(base, object="chat.completion.chunk",
+                           choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+            return f"data: {json.dumps(payload)}\n\n"
+
+        def generate():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                time.sleep(1 / tokens_per_second)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    return app
+
+
+def run_chat_stub(args):
+    """Serve chat_stub_app so /chat can be exercised with no network (set CHAT_BASE_URL to its address)."""
+    from werkzeug.serving import make_server
+    server = make_server(args.host, args.port, chat_stub_app(args.latency, args.tokens_per_second, args.error_rate),
+                         threaded=True)
+    print(f"chat stub on http://{args.host}:{server.server_port} (CHAT_BASE_URL)")
+    server.serve_forever()
+
+
+def bench_chat(args):
+    """/chat against the local stub: full completions vs streamed first tokens, cache hits and overload."""
+    from werkzeug.serving import make_server
+    main.logger.setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, chat_stub_app(args.latency, args.tokens_per_second), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    main.chat_assistant = main.ChatAssistant(f"http://127.0.0.1:{server.server_port}", args.concurrency)
+    client = main.app.test_client()
+    places = ["Hundru Falls", "Netarhat", "Betla National Park", "Parasnath Hill", "Dassam Falls", "Deoghar",
+              "Patratu Valley", "Dalma Wildlife Sanctuary"]
+    questions = [f"What is the best time to visit {place}?" for place in places]
+
+    def ask(message, stream=False):
+        start = time.perf_counter()
+        response = client.post("/chat", json={"message": message, "stream": stream}, buffered=False)
+        first = None
+        for part in response.response:
+            if first is None and (b"event: token" in part or not stream):
+                first = time.perf_counter() - start
+        response.close()
+        return response.status_code, first, time.perf_counter() - start
+
+    print(f"stub: {args.latency * 1000:.0f} ms to first token, {args.tokens_per_second:.0f} tokens/s, "
+          f"{len(STUB_ANSWER.split())} tokens")
+    print(f"{'mode':<22} {'first byte ms':>13} {'complete ms':>11}")
+    for label, stream, rephrase in (("full completion", False, None), ("streamed (SSE)", True, None),
+                                    ("cached, rephrased", False, lambda q: f"  {q.upper()[:-1]} ??"),
+                                    ("cached, streamed", True, lambda q: q.lower())):
+        if rephrase is None:
+            main.chat_assistant.clear()
+        results = [ask(rephrase(q) if rephrase else q, stream) for q in questions]
+        assert all(status == 200 for status, _, _ in results), results
+        print(f"{label:<22} {1000 * sum(r[1] for r in results) / len(results):>13.1f} "
+              f"{1000 * sum(r[2] for r in results) / len(results):>11.1f}")
+        if rephrase is None:
+            main.chat_assistant.clear()
+            for q in questions:
+                ask(q)
+
+    main.chat_assistant.clear()
+    with ThreadPoolExecutor(args.clients) as pool:
+        statuses = list(pool.map(lambda k: ask(f"Question {k} about Jharkhand")[0], range(args.clients)))
+    print(f"{args.clients} simultaneous new questions, {args.concurrency} slots: "
+          f"{statuses.count(200)} answered, {statuses.count(429)} told to retry (429)")
+    print(main.chat_assistant.stats())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    solvers = subparsers.add_parser("solvers", help="greedy vs OR-Tools day routing")
+    solvers.add_argument("--pois", type=int, default=30)
+    solvers.add_argument("--days", type=int, default=3)
+    solvers.add_argument("--pace", default="moderate", choices=list(config.PACE_CONFIGS))
+    solvers.add_argument("--time-limit-ms", type=int, default=config.ORTOOLS_TIME_LIMIT_MS)
+    solvers.set_defaults(func=bench_solvers)
+
+    multiday = subparsers.add_parser("multiday", help="day-by-day carving vs joint multi-day planning")
+    multiday.add_argument("--pois", type=int, default=80)
+    multiday.add_argument("--days", type=int, nargs="+", default=[7, 14])
+    multiday.add_argument("--pace", default="moderate", choices=list(config.PACE_CONFIGS))
+    multiday.add_argument("--solvers", nargs="+", default=list(config.SOLVERS), choices=list(config.SOLVERS))
+    multiday.add_argument("--time-limit-ms", type=int, default=2000)
+    multiday.set_defaults(func=bench_multiday)
+
+    transit = subparsers.add_parser("transit", help="connection-scan journey planner throughput")
+    transit.add_argument("--trains", type=int, default=5000)
+    transit.add_argument("--stations", type=int, default=3000)
+    transit.add_argument("--stops", type=int, default=20)
+    transit.add_argument("--queries", type=int, default=500)
+    transit.set_defaults(func=bench_transit)
+
+    catalogue = subparsers.add_parser("catalogue", help="columnar POI store memory and filter + score pass")
+    catalogue.add_argument("--pois", type=int, default=200000)
+    catalogue.set_defaults(func=bench_catalogue)
+
+    distance = subparsers.add_parser("distance", help="batch distances vs geopy geodesic (parity check)")
+    distance.add_argument("--origins", type=int, default=50)
+    distance.add_argument("--pairs", type=int, default=200)
+    distance.add_argument("--exact-tolerance-km", type=float, default=1e-6)
+    distance.add_argument("--fast-tolerance", type=float, default=0.006, help="largest relative error of haversine")
+    distance.set_defaults(func=bench_distance)
+
+    scoring = subparsers.add_parser("scoring", help="batch vs scalar personalization scores (parity check)")
+    scoring.add_argument("--pois", type=int, default=100000)
+    scoring.set_defaults(func=bench_scoring)
+
+    topk = subparsers.add_parser("topk", help="full ranking vs bounded top-K candidate selection")
+    topk.add_argument("--pois", type=int, default=50000)
+    topk.add_argument("--days", type=int, nargs="+", default=[3, 7, 14])
+    topk.add_argument("--route-cap", type=int, default=2000, help="largest full city pool to route")
+    topk.set_defaults(func=bench_topk)
+
+    cache = subparsers.add_parser("cache", help="itinerary result cache hit rate under skewed traffic")
+    cache.add_argument("--requests", type=int, default=300)
+    cache.set_defaults(func=bench_cache)
+
+    legs = subparsers.add_parser("legs", help="journey-leg cache on repeated same-city planning")
+    legs.add_argument("--pois", type=int, default=60)
+    legs.set_defaults(func=bench_legs)
+
+    serving = subparsers.add_parser("serving", help="threaded server latency with inline vs solver-pool planning")
+    serving.add_argument("--pois", type=int, default=60)
+    serving.add_argument("--requests", type=int, default=24)
+    serving.add_argument("--clients", type=int, default=8)
+    serving.add_argument("--workers", type=int, default=4)
+    serving.set_defaults(func=bench_serving)
+
+    serialize = subparsers.add_parser("serialize", help="TripPlan response encoding time and size")
+    serialize.add_argument("--days", type=int, default=14)
+    serialize.add_argument("--pois", type=int, default=120)
+    serialize.add_argument("--repeat", type=int, default=200)
+    serialize.set_defaults(func=bench_serialize)
+
+    catalogue_endpoint = subparsers.add_parser("catalogue-endpoint", help="cached /api/available-pois bodies and 304s")
+    catalogue_endpoint.add_argument("--pois", type=int, default=20000)
+    catalogue_endpoint.add_argument("--repeat", type=int, default=20)
+    catalogue_endpoint.set_defaults(func=bench_catalogue_endpoint)
+
+    coldstart = subparsers.add_parser("coldstart", help="start-up from a data source vs memory-mapped artifacts")
+    coldstart.add_argument("--pois", type=int, default=20000)
+    coldstart.add_argument("--trains", type=int, default=5000)
+    coldstart.add_argument("--stations", type=int, default=3000)
+    coldstart.set_defaults(func=bench_coldstart)
+
+    workers = subparsers.add_parser("workers", help="per-worker memory with private vs shared data generations")
+    workers.add_argument("--workers", type=int, default=4)
+    workers.add_argument("--pois", type=int, default=20000)
+    workers.add_argument("--trains", type=int, default=2000)
+    workers.add_argument("--stations", type=int, default=1500)
+    workers.add_argument("--shm", default="/dev/shm", help="shared-memory filesystem for the generation root")
+    workers.set_defaults(func=bench_workers)
+
+    reload = subparsers.add_parser("reload", help="request latency while data is reloaded in the background")
+    reload.add_argument("--pois", type=int, default=20000)
+    reload.add_argument("--trains", type=int, default=2000)
+    reload.add_argument("--stations", type=int, default=1500)
+    reload.add_argument("--settle", type=float, default=3.0, help="seconds of probing before and after")
+    reload.set_defaults(func=bench_reload)
+
+    budget = subparsers.add_parser("budget", help="knapsack candidate selection and plans under a budget")
+    budget.add_argument("--budgets", type=int, nargs="+", default=[3000, 5000, 8000])
+    budget.add_argument("--candidates", type=int, default=200)
+    budget.add_argument("--capacity", type=int, default=15)
+    budget.set_defaults(func=bench_budget)
+
+    tour = subparsers.add_parser("tour", help="inter-city transit of score-ordered vs solved city tours")
+    tour.add_argument("--cities", type=int, nargs="+", default=[4, 6, 8, 10])
+    tour.add_argument("--trials", type=int, default=20)
+    tour.add_argument("--mode", default="car", choices=sorted(config.TRANSPORT_PROFILES))
+    tour.set_defaults(func=bench_tour)
+
+    replan = subparsers.add_parser("replan", help="incremental itinerary edits vs full generation")
+    replan.add_argument("--plans", type=int, default=24)
+    replan.add_argument("--solver", default="greedy", choices=config.SOLVERS)
+    replan.set_defaults(func=bench_replan)
+
+    batch = subparsers.add_parser("batch", help="batch itinerary generation vs serial requests")
+    batch.add_argument("--days", type=int, nargs="+", default=[3, 5, 7, 10])
+    batch.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    batch.set_defaults(func=bench_batch)
+
+    chat = subparsers.add_parser("chat", help="/chat streaming, prompt cache and overload against the local stub")
+    chat.add_argument("--clients", type=int, default=16)
+    chat.add_argument("--concurrency", type=int, default=4)
+    chat.add_argument("--latency", type=float, default=0.3, help="stub seconds to first token")
+    chat.add_argument("--tokens-per-second", type=float, default=50.0)
+    chat.set_defaults(func=bench_chat)
+
+    chat_stub = subparsers.add_parser("chat-stub", help="serve a local OpenAI-compatible model for /chat")
+    chat_stub.add_argument("--host", default="127.0.0.1")
+    chat_stub.add_argument("--port", type=int, default=8001)
+    chat_stub.add_argument("--latency", type=float, default=0.3, help="seconds to first token")
+    chat_stub.add_argument("--tokens-per-second", type=float, default=50.0)
+    chat_stub.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    chat_stub.set_defaults(func=run_chat_stub)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main_cli()
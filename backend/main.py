@@ -11,19 +11,52 @@ import math
 import datetime
 import json
 import logging
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional, Tuple, Any
-from collections import defaultdict
+import threading
+import hashlib
+import sqlite3
+import time
+import multiprocessing
+import gzip
+import mmap
+import shutil
+import argparse
+import hmac
+import atexit
+import tempfile
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Any, Callable, Iterable, Set
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import pandas as pd
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 from geopy.distance import geodesic
+from geographiclib.geodesic import Geodesic
 from functools import lru_cache
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from groq import Groq
+import httpx
+from groq import Groq, APIConnectionError, InternalServerError, RateLimitError
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # optional: responses fall back to the standard json encoder
+    orjson = None
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+try:
+    import fcntl
+except ImportError:  # not on Windows: shared data generations are then published without a lock
+    fcntl = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,6 +75,61 @@ class Config:
     MIN_POIS_PER_DAY = 2
     DEFAULT_BUDGET = 50000
     DEFAULT_BASE_LOCATION = (23.36, 85.33)  # Default to Ranchi coordinates
+    DISTANCE_ACCURACY = "exact"  # "fast" (haversine) or "exact" (ellipsoidal)
+    SOLVERS = ("greedy", "ortools")
+    DEFAULT_SOLVER = "greedy"
+    PLANNERS = ("daily", "joint")  # carve one day at a time, or assign a city's POIs to all its days at once
+    DEFAULT_PLANNER = "daily"
+    ORTOOLS_TIME_LIMIT_MS = 500
+    MIN_TRANSFER_MINUTES = 30  # minimum change time between trains
+    TRANSIT_SEARCH_HORIZON = 2880  # only consider departures within this many minutes of the query
+    POI_GRID_CELL_DEG = 0.05  # ~5.5 km spatial index buckets for POIs
+    STATION_GRID_CELL_DEG = 0.5
+    MAX_STATION_DISTANCE_KM = 50  # farthest a station may be to count as a POI's / location's nearest
+    MAX_NEARBY_RADIUS_KM = 500
+    MAX_TRANSFER_SLOWDOWN = 3.0  # connecting trains are offered only if at most this many times slower than driving
+    CANDIDATE_OVERPROVISION = 3.0  # ranked candidates kept per day x pois_per_day slot; None keeps every passing POI
+    CANDIDATE_CITY_RESERVE = 3  # extra candidates per city the trip can reach
+    CITY_TOUR_MAX_CITIES = 10  # cities besides the destination the tour solver weighs; lower-value ones are left out
+    CITY_LEG_CACHE_SIZE = 4096  # travel-day journeys by (city, next city, mode); covers every pair of a few dozen cities
+    JOURNEY_CACHE_SIZE = 20000  # ~700 B a leg, so ~14 MB per process; a plan adds up to ~330 distinct legs
+    JOURNEY_TIME_BUCKET_MINUTES = 1  # train-capable legs depart on these boundaries; 1 keeps journeys exact
+    ITINERARY_CACHE_SIZE = 512
+    ITINERARY_CACHE_TTL_SECONDS = 6 * 3600
+    ITINERARY_CACHE_PATH = os.getenv("ITINERARY_CACHE_PATH")  # SQLite file shared by worker processes; unset keeps it in memory
+    SERVING_MODE = os.getenv("SERVING_MODE", "inline")  # "pool" generates itineraries in SolverPool worker processes
+    SOLVER_WORKERS = int(os.getenv("SOLVER_WORKERS", os.cpu_count() or 2))
+    SOLVER_MAX_PENDING = int(os.getenv("SOLVER_MAX_PENDING", 4 * SOLVER_WORKERS))  # running + queued jobs before 429s
+    ITINERARY_DEADLINE_SECONDS = 30.0  # also the ceiling for a request's own deadline_seconds
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))  # threads running /api/itinerary-jobs
+    JOB_TTL_SECONDS = 3600  # finished jobs are dropped this long after their last update
+    JOB_DEADLINE_SECONDS = 300.0  # solver-pool deadline for a background job
+    JOB_STORE_PATH = os.getenv("JOB_STORE_PATH")  # SQLite file so every worker process can answer job polls
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", SOLVER_WORKERS))  # processes per batch; 1 plans in-process
+    BATCH_MAX_ITINERARIES = 2000  # preference sets accepted by one /api/generate-itineraries/batch call
+    CHAT_MODEL = os.getenv("CHAT_MODEL", "openai/gpt-oss-120b")
+    CHAT_BASE_URL = os.getenv("CHAT_BASE_URL")  # e.g. the stub from `benchmarks.py chat-stub`; unset uses Groq
+    CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "8"))  # retries included; the Next.js proxy waits 10 s
+    CHAT_CONNECT_TIMEOUT_SECONDS = 2.0
+    CHAT_MAX_RETRIES = 1  # retried only on connection errors, 429s and 5xx, and only while the deadline allows
+    CHAT_MAX_CONNECTIONS = int(os.getenv("CHAT_MAX_CONNECTIONS", 16))  # pooled HTTP connections to the model API
+    CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", 8))  # completions in flight per process
+    CHAT_QUEUE_SECONDS = 2.0  # how long a request waits for a completion slot before a 429
+    CHAT_CACHE_SIZE = 1024
+    CHAT_CACHE_TTL_SECONDS = 6 * 3600
+    COMPRESS_MIN_BYTES = 1024  # smaller responses are sent uncompressed
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    RENDERED_CACHE_SIZE = 256  # pre-encoded GET bodies (one per endpoint, page and projection)
+    DATA_SOURCE = os.getenv("DATA_SOURCE")  # SQLite file or directory of Parquet files replacing the built-in data
+    DATA_ARTIFACTS = os.getenv("DATA_ARTIFACTS")  # directory written by `main.py build-artifacts`; memory-mapped at startup
+    SHARED_DATA_DIR = os.getenv("SHARED_DATA_DIR")  # e.g. /dev/shm/namaste-jharkhand: one mapped copy for all workers
+    SHARED_DATA_KEEP = 2  # generations kept on disk; older ones vanish once no process maps them
+    DATA_WATCH_SECONDS = float(os.getenv("DATA_WATCH_SECONDS", "5"))  # reload when the data changes on disk; 0 disables
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # bearer token for /api/admin/*; unset disables them
+    # ~68 B per node pair: the default 2000 nodes take ~260 MiB per process (shared when mapped from artifacts).
+    # POIs beyond this are measured on demand
+    TRAVEL_MATRIX_MAX_NODES = 2000
 
     TRANSPORT_PROFILES = {
         "car": {"speed": 50.0, "cost_km": 8.0, "comfort": 0.9, "flexibility": 1.0},
@@ -113,15 +201,114 @@ class TripPlan:
     user_preferences: Dict
     generated_at: str
 
+# Plain-dict forms of the models. Unlike dataclasses.asdict they copy only what is not
+# already a fresh plain object: schedule items are built as dicts by the planner.
+def poi_dict(poi: POI) -> Dict:
+    return dict(vars(poi), categories=list(poi.categories), best_time_to_visit=list(poi.best_time_to_visit))
+
+def day_dict(day: ItineraryDay) -> Dict:
+    return dict(vars(day))
+
+def plan_dict(plan: TripPlan) -> Dict:
+    return {'days': [day_dict(day) for day in plan.days], 'total_cost': plan.total_cost, 'total_pois': plan.total_pois,
+            'user_preferences': plan.user_preferences, 'generated_at': plan.generated_at}
+
+def encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':'), default=list).encode()
+
+def decode_json(data) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 # --------------------
 # Utility Functions
 # --------------------
 @lru_cache(maxsize=1000)
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def _geodesic_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     if abs(lat1 - lat2) < 1e-9 and abs(lon1 - lon2) < 1e-9:
         return 0.0
     return geodesic((lat1, lon1), (lat2, lon2)).kilometers
 
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+EARTH_RADIUS_KM = 6371.0088
+
+def _haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    dphi, dlam = phi2 - phi1, np.radians(lons - lon)
+    h = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+def _vincenty_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray,
+                 max_iter: int = 20, tol: float = 1e-12) -> np.ndarray:
+    f = WGS84_F
+    L = np.radians(lons - lon)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lats)))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < tol
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        km = WGS84_B * A * (sigma - delta_sigma) / 1000.0
+
+    # Vincenty converges in a handful of steps except for nearly antipodal points, where it
+    # crawls or oscillates; those rows get Karney's solution (what geopy wraps, called directly
+    # to skip its per-pair setup) instead of more iterations over the whole batch
+    for k in np.flatnonzero(~converged | ~np.isfinite(km)):
+        km[k] = Geodesic.WGS84.Inverse(lat, lon, lats[k], lons[k], Geodesic.DISTANCE)["s12"] / 1000.0
+    return km
+
+def batch_distance(lat: float, lon: float, lats, lons, accuracy: Optional[str] = None) -> np.ndarray:
+    """Distances in km from one origin to every (lats[i], lons[i]) in a single vectorized pass.
+
+    accuracy="fast" uses a spherical haversine (up to ~0.6% error); "exact" solves the
+    WGS-84 inverse problem (Vincenty, Karney fallback) and matches geopy's geodesic.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.size == 0:
+        return np.zeros(lats.shape)
+    if (accuracy or config.DISTANCE_ACCURACY) == "fast":
+        km = _haversine_km(lat, lon, lats, lons)
+    else:
+        km = _vincenty_km(lat, lon, lats, lons)
+    km[(np.abs(lats - lat) < 1e-9) & (np.abs(lons - lon) < 1e-9)] = 0.0
+    return km
+
+def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float,
+                       travel_matrix: Optional["TravelMatrix"] = None) -> float:
+    # Known POIs/stations are answered from the precomputed matrix when one is given
+    if travel_matrix is not None:
+        i, j = travel_matrix.index_of(lat1, lon1), travel_matrix.index_of(lat2, lon2)
+        if i is not None and j is not None:
+            return float(travel_matrix.distance[i, j])
+    return _geodesic_distance(lat1, lon1, lat2, lon2)
+
 def time_to_minutes(time_str: str) -> int:
     if not time_str or time_str == "--:--":
         return 0
@@ -143,9 +330,15 @@ def minutes_to_time(total_minutes: int) -> str:
     else:
         return f"+{days} days {hours:02d}:{mins:02d}"
 
-def calculate_road_travel(lat1, lon1, lat2, lon2, mode="car"):
+def calculate_road_travel(lat1, lon1, lat2, lon2, mode="car", distance: Optional[float] = None,
+                          travel_matrix: Optional["TravelMatrix"] = None):
+    if distance is None:
+        if travel_matrix is not None:
+            i, j = travel_matrix.index_of(lat1, lon1), travel_matrix.index_of(lat2, lon2)
+            if i is not None and j is not None:
+                return travel_matrix.road_travel(i, j, mode)
+        distance = _geodesic_distance(lat1, lon1, lat2, lon2)
     profile = config.TRANSPORT_PROFILES.get(mode, config.TRANSPORT_PROFILES["car"])
-    distance = calculate_distance(lat1, lon1, lat2, lon2)
     if distance > 200:
         effective_speed = 80.0  # highway speed for long distances
         traffic_factor = 1.0
@@ -165,10 +358,289 @@ def calculate_road_travel(lat1, lon1, lat2, lon2, mode="car"):
 # --------------------
 # Data Storage
 # --------------------
+class SpatialIndex:
+    """Uniform lat/lon grid (geohash-style buckets) answering radius and k-nearest queries.
+
+    A query only visits the buckets overlapping its bounding box and measures exact
+    distances for the points found there, so cost tracks local density, not catalogue size.
+    Bulk-loaded points are held as CSR arrays (sorted bucket keys, offsets into the points
+    in bucket order, their positions and coordinates) that `save` writes and `attach`
+    memory-maps; points inserted afterwards go to a small dict of buckets on top.
+    """
+
+    GRID_ARRAYS = ("cells", "offsets", "positions", "coords")
+
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.keys: List[str] = []
+        self._grid = self._build(np.zeros((0, 2)))
+        self._positions: Optional[Dict[str, int]] = {}  # built on the first insert after a bulk load
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)  # inserted points only
+        self._coords: Dict[int, Tuple[float, float]] = {}
+        self._moved: Set[int] = set()  # grid points since inserted elsewhere
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    @staticmethod
+    def _cell_key(i, j):
+        # Row-major order of (i, j) for ints or int64 arrays, j offset to stay non-negative
+        return i * (1 << 32) + j + (1 << 31)
+
+    def _build(self, coords: np.ndarray) -> Dict[str, np.ndarray]:
+        keys = self._cell_key(np.floor(coords[:, 0] / self.cell_deg).astype(np.int64),
+                              np.floor(coords[:, 1] / self.cell_deg).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        cells, starts = np.unique(keys[order], return_index=True)
+        return {"cells": cells, "offsets": np.append(starts, len(order)).astype(np.int64),
+                "positions": order.astype(np.int64), "coords": coords[order]}
+
+    def _reset(self, keys: List[str], grid: Dict[str, np.ndarray]):
+        self.keys = list(keys)
+        self._grid = grid
+        self._positions = None
+        self._cells, self._coords, self._moved = defaultdict(list), {}, set()
+
+    def insert(self, key: str, lat: float, lon: float):
+        if self._positions is None:
+            self._positions = {key: position for position, key in enumerate(self.keys)}
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = len(self.keys)
+            self.keys.append(key)
+        elif position in self._coords:
+            self._cells[self._cell(*self._coords[position])].remove(position)
+        else:
+            self._moved.add(position)
+        self._coords[position] = (lat, lon)
+        self._cells[self._cell(lat, lon)].append(position)
+
+    def load(self, keys: List[str], lats: np.ndarray, lons: np.ndarray):
+        """Replace the contents with distinct `keys` at the given coordinates in one pass."""
+        self._reset(keys, self._build(np.column_stack([lats, lons]).astype(np.float64)))
+
+    def save(self, directory: str, name: str):
+        """Write the grid, inserted points included, as `<name>_grid_*.npy` for `attach`."""
+        grid = self._grid
+        if self._coords:
+            coords = np.empty((len(self.keys), 2))
+            coords[grid["positions"]] = grid["coords"]
+            for position, point in self._coords.items():
+                coords[position] = point
+            grid = self._build(coords)
+        for part in self.GRID_ARRAYS:
+            np.save(os.path.join(directory, f"{name}_grid_{part}.npy"), grid[part])
+
+    def attach(self, directory: str, name: str, keys: List[str]):
+        """Memory-map the grid `save` wrote; `keys` are the saved index's keys in order."""
+        self._reset(keys, {part: np.load(os.path.join(directory, f"{name}_grid_{part}.npy"), mmap_mode="c")
+                           for part in self.GRID_ARRAYS})
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[str, float]]:
+        """(key, distance_km) for every point within radius_km, nearest first."""
+        lat_span = radius_km / 110.5
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + lat_span))), 0.01)
+        lon_span = radius_km / (111.3 * cos_lat)
+        lat_lo, lon_lo = self._cell(lat - lat_span, lon - lon_span)
+        lat_hi, lon_hi = self._cell(lat + lat_span, lon + lon_span)
+
+        # Grid: one contiguous run of buckets per row of the bounding box
+        grid = self._grid
+        rows = np.arange(lat_lo, lat_hi + 1, dtype=np.int64)
+        starts = grid["offsets"][np.searchsorted(grid["cells"], self._cell_key(rows, lon_lo))]
+        lengths = grid["offsets"][np.searchsorted(grid["cells"], self._cell_key(rows, lon_hi), side="right")] - starts
+        picks = np.arange(int(lengths.sum())) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions, coords = grid["positions"][picks], grid["coords"][picks]
+        if self._moved:
+            current = ~np.isin(positions, np.fromiter(self._moved, dtype=np.int64))
+            positions, coords = positions[current], coords[current]
+
+        if self._cells:
+            if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > len(self._cells):
+                inserted = [p for (i, j), cell in self._cells.items()
+                            if lat_lo <= i <= lat_hi and lon_lo <= j <= lon_hi for p in cell]
+            else:
+                inserted = [p for i in range(lat_lo, lat_hi + 1) for j in range(lon_lo, lon_hi + 1)
+                            for p in self._cells.get((i, j), ())]
+            if inserted:
+                positions = np.concatenate([positions, np.array(inserted, dtype=np.int64)])
+                coords = np.concatenate([coords, np.array([self._coords[p] for p in inserted])])
+        if not len(positions):
+            return []
+        distances = batch_distance(lat, lon, coords[:, 0], coords[:, 1])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.lexsort((positions, distances))
+        return [(self.keys[p], float(d)) for p, d in zip(positions[order].tolist(), distances[order].tolist())]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Up to k (key, distance_km) pairs, nearest first, optionally capped at max_km."""
+        if not self.keys:
+            return []
+        radius = self.cell_deg * 111.3
+        limit = max_km if max_km is not None else 20040.0  # half the Earth's circumference
+        while True:
+            radius = min(radius, limit)
+            found = self.within(lat, lon, radius)
+            if len(found) >= k or radius >= limit:
+                return found[:k]
+            radius *= 2
+
 class POIStorage:
-    def __init__(self):
-        self.pois_dict: Dict[str, POI] = {}
-        self._initialize_default_pois()
+    """Columnar POI catalogue.
+
+    Scalar fields live in NumPy columns indexed by row; categories and best-visit
+    months are also kept as bitmasks over interned vocabularies, and text (including
+    the ordered category/month lists) is packed as UTF-8 into one shared buffer.
+    Filters and scoring run on the columns; `get_poi`/`get_all_pois` materialise
+    `POI` views.
+    """
+
+    NUMERIC_COLUMNS = {
+        "lat": np.float64, "lon": np.float64, "duration": np.int32, "popularity": np.float64,
+        "open_time": np.int32, "close_time": np.int32, "cost": np.float64, "rating": np.float64,
+        "review_count": np.int32, "accessibility_score": np.float64, "family_friendly": np.bool_
+    }
+    PACKED_FIELDS = ("name", "description", "categories", "best_time_to_visit")
+    LIST_SEPARATOR = "\x1f"
+
+    def __init__(self, train_data: Optional["TrainDataStorage"] = None, initialize: bool = True):
+        self.train_data = train_data
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        # Interned vocabularies: value list plus value -> code dict
+        self.city_names: List[str] = []
+        self.city_codes: Dict[str, int] = {}
+        self.station_names: List[str] = []
+        self.station_codes: Dict[str, int] = {}
+        self.category_names: List[str] = []
+        self.category_codes: Dict[str, int] = {}
+        self.month_names: List[str] = []
+        self.month_codes: Dict[str, int] = {}
+        self._text = bytearray()
+        self._allocate(0)
+        self.spatial_index = SpatialIndex(config.POI_GRID_CELL_DEG)
+        self._listeners: List[Callable[[POI], None]] = []
+        self.version = 0  # bumped by add_poi
+        self.added: List[POI] = []  # every add_poi since construction or load, replayed by solver pool workers
+        if initialize:
+            self._initialize_default_pois()
+
+    def _allocate(self, capacity: int, words: Tuple[int, int] = (1, 1)):
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.NUMERIC_COLUMNS.items()}
+        self.columns["city"] = np.zeros(capacity, dtype=np.int32)
+        self.columns["station"] = np.full(capacity, -1, dtype=np.int32)
+        for field in self.PACKED_FIELDS:
+            self.columns[field + "_at"] = np.zeros(capacity, dtype=np.int64)
+            self.columns[field + "_len"] = np.zeros(capacity, dtype=np.int32)
+        self.category_mask = np.zeros((capacity, words[0]), dtype=np.uint64)
+        self.month_mask = np.zeros((capacity, words[1]), dtype=np.uint64)
+
+    def _ensure_capacity(self, needed: int):
+        capacity = len(self.columns["lat"])
+        if needed <= capacity:
+            return
+        old_columns, old_category_mask, old_month_mask = self.columns, self.category_mask, self.month_mask
+        self._allocate(max(needed, 2 * capacity, 16), (old_category_mask.shape[1], old_month_mask.shape[1]))
+        n = self.size
+        for name, column in old_columns.items():
+            self.columns[name][:n] = column[:n]
+        self.category_mask[:n] = old_category_mask[:n]
+        self.month_mask[:n] = old_month_mask[:n]
+
+    @staticmethod
+    def _intern(codes: Dict[str, int], names: List[str], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    @staticmethod
+    def _mask_bits(codes, words: int) -> np.ndarray:
+        bits = np.zeros(words, dtype=np.uint64)
+        for code in codes:
+            bits[code >> 6] |= np.uint64(1 << (code & 63))
+        return bits
+
+    def _set_mask(self, attr: str, row: int, codes: List[int]):
+        mask = getattr(self, attr)
+        words = max(mask.shape[1], (max(codes) >> 6) + 1 if codes else 0)
+        if words > mask.shape[1]:
+            mask = np.hstack([mask, np.zeros((len(mask), words - mask.shape[1]), dtype=np.uint64)])
+            setattr(self, attr, mask)
+        mask[row] = self._mask_bits(codes, words)
+
+    def _pack(self, row: int, field: str, text: str):
+        if not isinstance(self._text, bytearray):
+            self._text = bytearray(self._text)  # first write after load: leave the read-only mapping
+        payload = text.encode()
+        self.columns[field + "_at"][row] = len(self._text)
+        self.columns[field + "_len"][row] = len(payload)
+        self._text.extend(payload)
+
+    def _unpack(self, rows: np.ndarray, field: str) -> List[str]:
+        spans = zip(self.columns[field + "_at"][rows].tolist(), self.columns[field + "_len"][rows].tolist())
+        return [self._text[at:at + length].decode() for at, length in spans]
+
+    def _unpack_lists(self, rows: np.ndarray, field: str) -> List[List[str]]:
+        return [text.split(self.LIST_SEPARATOR) if text else [] for text in self._unpack(rows, field)]
+
+    def _set_row(self, row: int, poi: POI):
+        for name in self.NUMERIC_COLUMNS:
+            self.columns[name][row] = getattr(poi, name)
+        self.columns["city"][row] = self._intern(self.city_codes, self.city_names, poi.city)
+        self.columns["station"][row] = (-1 if poi.nearest_station_id is None else
+                                        self._intern(self.station_codes, self.station_names, poi.nearest_station_id))
+        self._pack(row, "name", poi.name)
+        self._pack(row, "description", poi.description)
+        self._pack(row, "categories", self.LIST_SEPARATOR.join(poi.categories))
+        self._pack(row, "best_time_to_visit", self.LIST_SEPARATOR.join(poi.best_time_to_visit))
+        self._set_mask("category_mask", row, [self._intern(self.category_codes, self.category_names, c)
+                                              for c in poi.categories])
+        self._set_mask("month_mask", row, [self._intern(self.month_codes, self.month_names, m)
+                                           for m in poi.best_time_to_visit])
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, poi_id: str) -> bool:
+        return poi_id in self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Live view of one column over the stored rows."""
+        return self.columns[name][:self.size]
+
+    def category_bits(self, categories: List[str]) -> np.ndarray:
+        """Bitmask row matching `category_mask` for the known categories in `categories`."""
+        codes = [self.category_codes[c] for c in categories if c in self.category_codes]
+        return self._mask_bits(codes, self.category_mask.shape[1])
+
+    def month_bits(self, months: List[str]) -> np.ndarray:
+        codes = [self.month_codes[m] for m in months if m in self.month_codes]
+        return self._mask_bits(codes, self.month_mask.shape[1])
+
+    def views(self, rows) -> List[POI]:
+        """Materialise POI objects for the given rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = {name: self.columns[name][rows].tolist() for name in self.NUMERIC_COLUMNS}
+        names = self._unpack(rows, "name")
+        descriptions = self._unpack(rows, "description")
+        categories = self._unpack_lists(rows, "categories")
+        months = self._unpack_lists(rows, "best_time_to_visit")
+        stations = [self.station_names[s] if s >= 0 else None for s in self.columns["station"][rows].tolist()]
+        cities = [self.city_names[c] for c in self.columns["city"][rows].tolist()]
+        return [
+            POI(self.ids[row], names[k], cities[k], values["lat"][k], values["lon"][k], categories[k],
+                values["duration"][k], values["popularity"][k], values["open_time"][k], values["close_time"][k],
+                values["cost"][k], stations[k], descriptions[k], values["rating"][k], values["review_count"][k],
+                values["accessibility_score"][k], values["family_friendly"][k], months[k])
+            for k, row in enumerate(rows.tolist())
+        ]
 
     def _initialize_default_pois(self):
         default_pois = [
@@ -202,19 +674,123 @@ class POIStorage:
             POI("vaishali", "Vaishali", "Vaishali", 25.9981, 85.1356, ["history", "culture", "buddhist"], 150, 0.65, 480, 1020, 150, None, "Ancient city, birthplace of democracy", 3.8, 400, 0.8, True),
             POI("rajgir", "Rajgir", "Rajgir", 25.0258, 85.4203, ["history", "culture", "hot_springs", "buddhist"], 200, 0.8, 360, 1140, 400, None, "Ancient capital with hot springs and Buddhist sites", 4.1, 1500, 0.6, True)
         ]
-        self.pois_dict = {poi.id: poi for poi in default_pois}
+        for poi in default_pois:
+            self._store(poi)
+
+    def get_poi(self, poi_id: str) -> Optional[POI]:
+        row = self.rows.get(poi_id)
+        return self.views([row])[0] if row is not None else None
 
     def get_all_pois(self) -> List[POI]:
-        return list(self.pois_dict.values())
+        return self.views(np.arange(self.size))
+
+    def city_location(self, city: str) -> Optional[Tuple[float, float]]:
+        """Coordinates of the first POI stored for `city`."""
+        code = self.city_codes.get(city)
+        if code is None:
+            return None
+        row = int(np.argmax(self.column("city") == code))
+        return float(self.columns["lat"][row]), float(self.columns["lon"][row])
+
+    def _store(self, poi: POI):
+        if poi.nearest_station_id is None and self.train_data:
+            station = self.train_data.nearest_station(poi.lat, poi.lon, config.MAX_STATION_DISTANCE_KM)
+            poi.nearest_station_id = station.id if station else None
+        row = self.rows.get(poi.id)
+        if row is None:
+            row = self.size
+            self._ensure_capacity(row + 1)
+            self.rows[poi.id] = row
+            self.ids.append(poi.id)
+            self.size += 1
+        self._set_row(row, poi)
+        self.spatial_index.insert(poi.id, poi.lat, poi.lon)
+
+    def pois_within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[POI, float]]:
+        nearby = self.spatial_index.within(lat, lon, radius_km)
+        pois = self.views([self.rows[poi_id] for poi_id, _ in nearby])
+        return [(poi, distance) for poi, (_, distance) in zip(pois, nearby)]
 
     def add_poi(self, poi: POI):
-        self.pois_dict[poi.id] = poi
+        self._store(poi)
+        self.version += 1
+        self.added.append(poi)
+        for listener in self._listeners:
+            listener(poi)
+
+    def subscribe(self, listener: Callable[[POI], None]):
+        """Register a callback invoked with every POI passed to add_poi."""
+        self._listeners.append(listener)
+
+    def save(self, directory: str):
+        """Write the stored rows as .npy columns, the text buffer and a JSON header for `load`."""
+        n = self.size
+        for name, column in self.columns.items():
+            np.save(os.path.join(directory, f"poi_{name}.npy"), column[:n])
+        np.save(os.path.join(directory, "poi_category_mask.npy"), self.category_mask[:n])
+        np.save(os.path.join(directory, "poi_month_mask.npy"), self.month_mask[:n])
+        with open(os.path.join(directory, "poi_text.bin"), "wb") as f:
+            f.write(self._text)
+        self.spatial_index.save(directory, "poi")
+        with open(os.path.join(directory, "poi_header.json"), "w") as f:
+            json.dump({"ids": self.ids, "cities": self.city_names, "stations": self.station_names,
+                       "categories": self.category_names, "months": self.month_names}, f)
+
+    @classmethod
+    def load(cls, directory: str, train_data: Optional["TrainDataStorage"] = None) -> "POIStorage":
+        """Catalogue written by `save`, with columns and text memory-mapped copy-on-write:
+        pages are shared with other processes mapping the same files until written."""
+        storage = cls(train_data, initialize=False)
+        with open(os.path.join(directory, "poi_header.json")) as f:
+            header = json.load(f)
+        storage.ids = header["ids"]
+        storage.rows = {poi_id: row for row, poi_id in enumerate(storage.ids)}
+        storage.size = len(storage.ids)
+        for attr, key in (("city", "cities"), ("station", "stations"), ("category", "categories"), ("month", "months")):
+            setattr(storage, f"{attr}_names", header[key])
+            setattr(storage, f"{attr}_codes", {name: code for code, name in enumerate(header[key])})
+        storage.columns = {name: np.load(os.path.join(directory, f"poi_{name}.npy"), mmap_mode="c")
+                           for name in storage.columns}
+        storage.category_mask = np.load(os.path.join(directory, "poi_category_mask.npy"), mmap_mode="c")
+        storage.month_mask = np.load(os.path.join(directory, "poi_month_mask.npy"), mmap_mode="c")
+        with open(os.path.join(directory, "poi_text.bin"), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                storage._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        storage.spatial_index.attach(directory, "poi", storage.ids)
+        return storage
 
 class TrainDataStorage:
-    def __init__(self):
+    """Station metadata plus a column-oriented timetable index.
+
+    Station codes are interned to ints. Every (from, to) pair served by a train is
+    one row of flat columns (departure, arrival, duration, train id) sorted by
+    route key then departure; `route_keys`/`route_offsets` give each route's
+    slice, so next-departure lookups are two bisects and no per-route objects exist.
+    All of these, and the connections the transit router scans, are saved as .npy
+    columns and memory-mapped by `load`.
+    """
+
+    TRANSIT_COLUMNS = ("depart", "arrive", "from", "to", "trip")
+
+    def __init__(self, initialize: bool = True):
         self.stations: Dict[str, TrainStation] = {}
-        self.trains_by_route: Dict[Tuple[str, str], List[Dict]] = {}
-        self._initialize_data()
+        self.station_codes: List[str] = []
+        self.station_ids: Dict[str, int] = {}
+        self.train_names: List[str] = []
+        self.train_numbers: List[str] = []
+        self._columns = {name: np.zeros(0, dtype=dtype) for name, dtype in
+                         (("keys", np.int64), ("departs", np.int32), ("arrives", np.int32),
+                          ("durations", np.int32), ("trains", np.int32))}
+        # Consecutive-stop hops with times unwrapped past midnight, for the transit router
+        self.connections = {name: np.zeros(0, dtype=np.int32) for name in ("from", "to", "depart", "arrive", "train")}
+        self._routes = self._route_index(self._columns["keys"])
+        self._unrolled: Dict[int, Dict[str, np.ndarray]] = {}  # horizon -> connections unrolled over days
+        self.version = 0
+        self._station_by_city: Dict[str, TrainStation] = {}
+        self.spatial_index = SpatialIndex(config.STATION_GRID_CELL_DEG)
+        self._freeze_columns()
+        if initialize:
+            self._initialize_data()
 
     def _initialize_data(self):
         self.stations = {
@@ -273,71 +849,913 @@ class TrainDataStorage:
             },
         ]
 
-        for train in MOCK_TRAIN_SCHEDULE:
-            for i in range(len(train["stops"])):
-                for j in range(i + 1, len(train["stops"])):
-                    start_id, _, dep_str = train["stops"][i]
-                    end_id, arr_str, _ = train["stops"][j]
-                    route = (start_id, end_id)
-                    if route not in self.trains_by_route:
-                        self.trains_by_route[route] = []
-                    
-                    dep_mins, arr_mins = time_to_minutes(dep_str), time_to_minutes(arr_str)
-                    duration = (arr_mins - dep_mins) if arr_mins >= dep_mins else (1440 - dep_mins + arr_mins)
-                    if "Mail" in train["name"]:
-                        duration += 1440
-
-                    self.trains_by_route[route].append({
-                        "name": train["name"],
-                        "number": train["number"],
-                        "depart_mins": dep_mins,
-                        "arrive_mins": arr_mins,
-                        "duration_mins": duration
-                    })
-        for route in self.trains_by_route:
-            self.trains_by_route[route].sort(key=lambda x: x["depart_mins"])
+        self._index_stations()
+        self.load_timetable(MOCK_TRAIN_SCHEDULE)
+
+    def _index_stations(self, directory: Optional[str] = None):
+        """City lookup, interned ids and the station grid, mapped from `directory` when saved there."""
+        self._station_by_city = {}
+        for station in self.stations.values():
+            self._station_by_city.setdefault(station.city.lower(), station)
+            self.intern_station(station.id)
+        if directory:
+            self.spatial_index.attach(directory, "station", list(self.stations))
+        else:
+            stations = list(self.stations.values())
+            self.spatial_index.load([s.id for s in stations], np.array([s.lat for s in stations], dtype=np.float64),
+                                    np.array([s.lon for s in stations], dtype=np.float64))
+
+    def nearest_station(self, lat: float, lon: float, max_km: Optional[float] = None) -> Optional[TrainStation]:
+        found = self.spatial_index.nearest(lat, lon, 1, max_km)
+        return self.stations[found[0][0]] if found else None
+
+    def intern_station(self, code: str) -> int:
+        station_id = self.station_ids.get(code)
+        if station_id is None:
+            station_id = len(self.station_codes)
+            self.station_ids[code] = station_id
+            self.station_codes.append(code)
+        return station_id
+
+    @staticmethod
+    def route_key(start: int, end: int) -> int:
+        return (start << 32) | end
+
+    def load_timetable(self, schedule: List[Dict]):
+        columns = {name: [column] for name, column in self._columns.items()}
+        hops = {name: [column] for name, column in self.connections.items()}
+        for train in schedule:
+            train_id = len(self.train_names)
+            self.train_names.append(train["name"])
+            self.train_numbers.append(train["number"])
+            stations = np.array([self.intern_station(code) for code, _, _ in train["stops"]], dtype=np.int64)
+            arrivals = np.array([time_to_minutes(arr_str) for _, arr_str, _ in train["stops"]], dtype=np.int32)
+            departures = np.array([time_to_minutes(dep_str) for _, _, dep_str in train["stops"]], dtype=np.int32)
+
+            # Every ordered stop pair (i before j) of the train is a bookable route
+            i, j = np.triu_indices(len(stations), 1)
+            dep_mins, arr_mins = departures[i], arrivals[j]
+            durations = np.where(arr_mins >= dep_mins, arr_mins - dep_mins, 1440 - dep_mins + arr_mins)
+            if "Mail" in train["name"]:
+                durations += 1440
+            columns["keys"].append((stations[i] << 32) | stations[j])
+            columns["departs"].append(dep_mins)
+            columns["arrives"].append(arr_mins)
+            columns["durations"].append(durations.astype(np.int32))
+            columns["trains"].append(np.full(len(i), train_id, dtype=np.int32))
+
+            # dep0, arr1, dep1, ..., arrN; every step backwards in clock time is a midnight
+            times = np.empty(2 * len(stations) - 1, dtype=np.int32)
+            times[0::2], times[1::2] = departures, arrivals[1:]
+            times[-1] = arrivals[-1]
+            times[1:] += 1440 * np.cumsum(np.diff(times) < 0, dtype=np.int32)
+            if "Mail" in train["name"]:
+                times[1:] += 1440
+            hops["from"].append(stations[:-1].astype(np.int32))
+            hops["to"].append(stations[1:].astype(np.int32))
+            hops["depart"].append(times[0:-1:2])
+            hops["arrive"].append(times[1::2])
+            hops["train"].append(np.full(len(stations) - 1, train_id, dtype=np.int32))
+
+        merged = {name: np.concatenate(parts) for name, parts in columns.items()}
+        order = np.lexsort((merged["departs"], merged["keys"]))
+        self._columns = {name: column[order] for name, column in merged.items()}
+        self.connections = {name: np.concatenate(parts) for name, parts in hops.items()}
+        self._routes = self._route_index(self._columns["keys"])
+        self._unrolled = {}
+        self._freeze_columns()
+        self.version += 1
+
+    @staticmethod
+    def _route_index(keys: np.ndarray) -> Dict[str, np.ndarray]:
+        unique_keys, starts = np.unique(keys, return_index=True)
+        return {"keys": unique_keys.astype(np.int64), "offsets": np.append(starts, len(keys)).astype(np.int64)}
+
+    def _freeze_columns(self):
+        # memoryviews index the (possibly mapped) columns in place and yield plain Python ints,
+        # so bisect probes neither box NumPy scalars nor need a private copy of the columns
+        self.route_keys, self.route_offsets = memoryview(self._routes["keys"]), memoryview(self._routes["offsets"])
+        self.departs = memoryview(self._columns["departs"])
+        self.arrives = memoryview(self._columns["arrives"])
+        self.durations = memoryview(self._columns["durations"])
+        self.trains = memoryview(self._columns["trains"])
+
+    def _route(self, start_id: str, end_id: str) -> Optional[Tuple[int, int]]:
+        start, end = self.station_ids.get(start_id), self.station_ids.get(end_id)
+        if start is None or end is None:
+            return None
+        key = self.route_key(start, end)
+        r = bisect_left(self.route_keys, key)
+        if r == len(self.route_keys) or self.route_keys[r] != key:
+            return None
+        return self.route_offsets[r], self.route_offsets[r + 1]
+
+    def _train_record(self, k: int, day_offset: int = 0) -> Dict:
+        return {
+            "name": self.train_names[self.trains[k]],
+            "number": self.train_numbers[self.trains[k]],
+            "depart_mins": self.departs[k] + day_offset,
+            "arrive_mins": self.arrives[k] + day_offset,
+            "duration_mins": self.durations[k]
+        }
 
     def find_next_train(self, start_id: str, end_id: str, current_mins: int) -> Optional[Dict]:
-        route = (start_id, end_id)
-        if route not in self.trains_by_route:
+        route = self._route(start_id, end_id)
+        if route is None:
             return None
-        for t in self.trains_by_route[route]:
-            if t["depart_mins"] >= current_mins:
-                return t  # same-day train
-
-        # wrap to tomorrow
-        if self.trains_by_route[route]:
-            t = dict(self.trains_by_route[route][0])  # copy
-            t["depart_mins"] += 1440
-            t["arrive_mins"] += 1440
-            return t
-        return None
+        lo, hi = route
+        k = bisect_left(self.departs, current_mins, lo, hi)
+        if k < hi:
+            return self._train_record(k)  # same-day train
+        return self._train_record(lo, 1440)  # wrap to tomorrow
+
+    def earliest_departure(self, start_id: str, end_id: str) -> Optional[int]:
+        route = self._route(start_id, end_id)
+        return self.departs[route[0]] if route else None
 
     def find_station_by_city(self, city: str) -> Optional[TrainStation]:
-        for station in self.stations.values():
-            if station.city.lower() == city.lower():
-                return station
-        return None
+        return self._station_by_city.get(city.lower())
+
+    def unrolled_connections(self, horizon: int) -> Dict[str, np.ndarray]:
+        """The connections repeated over enough days that departures in [0, 1440 + horizon) include
+        every train instance still running then, sorted by departure; `trip` numbers (train, day)."""
+        unrolled = self._unrolled.get(horizon)
+        if unrolled is not None:
+            return unrolled
+        hops = self.connections
+        n_trains = max(len(self.train_names), 1)
+        span_days = int(hops["arrive"].max()) // 1440 + 1 if len(hops["arrive"]) else 1
+        # Instances that started up to span_days before the first query day still run on it
+        copies = []
+        for day in range(-span_days, (1440 + horizon) // 1440 + 1):
+            depart = hops["depart"].astype(np.int64) + day * 1440
+            keep = (depart >= 0) & (depart < 1440 + horizon)
+            copies.append((depart[keep], hops["arrive"][keep].astype(np.int64) + day * 1440, hops["from"][keep],
+                           hops["to"][keep], hops["train"][keep].astype(np.int64) + (day + span_days) * n_trains))
+        order = np.argsort(np.concatenate([copy[0] for copy in copies]), kind="stable")
+        unrolled = {name: np.concatenate(column)[order]
+                    for name, column in zip(self.TRANSIT_COLUMNS, zip(*copies))}
+        self._unrolled[horizon] = unrolled
+        return unrolled
+
+    def schedule(self) -> List[Dict]:
+        """The loaded timetable in load_timetable's input form, rebuilt from the connections."""
+        hops = {name: column.tolist() for name, column in self.connections.items()}
+        by_train: Dict[int, List[int]] = defaultdict(list)
+        for k, train_id in enumerate(hops["train"]):
+            by_train[train_id].append(k)
+        clock = lambda mins: minutes_to_time(mins % 1440)
+        schedule = []
+        for train_id, ks in sorted(by_train.items()):
+            codes = [self.station_codes[hops["from"][k]] for k in ks] + [self.station_codes[hops["to"][ks[-1]]]]
+            arrivals = [hops["depart"][ks[0]]] + [hops["arrive"][k] for k in ks]
+            departures = [hops["depart"][k] for k in ks] + [hops["arrive"][ks[-1]]]
+            schedule.append({"name": self.train_names[train_id], "number": self.train_numbers[train_id],
+                             "stops": [(code, clock(arr), clock(dep)) for code, arr, dep in zip(codes, arrivals, departures)]})
+        return schedule
+
+    def save(self, directory: str):
+        """Write the route index, connections (also unrolled for the transit router) and station
+        grid as .npy columns plus a JSON header for `load`."""
+        for name, column in self._columns.items():
+            np.save(os.path.join(directory, f"timetable_{name}.npy"), column)
+        for name, column in self.connections.items():
+            np.save(os.path.join(directory, f"connections_{name}.npy"), column)
+        for name, column in self._routes.items():
+            np.save(os.path.join(directory, f"routes_{name}.npy"), column)
+        for name, column in self.unrolled_connections(config.TRANSIT_SEARCH_HORIZON).items():
+            np.save(os.path.join(directory, f"transit_{name}.npy"), column)
+        self.spatial_index.save(directory, "station")
+        with open(os.path.join(directory, "timetable_header.json"), "w") as f:
+            json.dump({"stations": [[s.id, s.name, s.city, s.lat, s.lon] for s in self.stations.values()],
+                       "station_codes": self.station_codes, "train_names": self.train_names,
+                       "train_numbers": self.train_numbers, "transit_horizon": config.TRANSIT_SEARCH_HORIZON}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "TrainDataStorage":
+        """Timetable written by `save`, memory-mapped copy-on-write; nothing is rebuilt from stops."""
+        data = cls(initialize=False)
+        with open(os.path.join(directory, "timetable_header.json")) as f:
+            header = json.load(f)
+        data.stations = {row[0]: TrainStation(*row) for row in header["stations"]}
+        data.station_codes = header["station_codes"]
+        data.station_ids = {code: station_id for station_id, code in enumerate(data.station_codes)}
+        data.train_names, data.train_numbers = header["train_names"], header["train_numbers"]
+        data._index_stations(directory)
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c")
+        data._columns = {name: load(f"timetable_{name}") for name in data._columns}
+        data.connections = {name: load(f"connections_{name}") for name in data.connections}
+        data._routes = {name: load(f"routes_{name}") for name in data._routes}
+        data._unrolled = {header["transit_horizon"]: {name: load(f"transit_{name}") for name in cls.TRANSIT_COLUMNS}}
+        data._freeze_columns()
+        data.version += 1
+        return data
+
+# --------------------
+# Travel Matrix
+# --------------------
+def road_travel_arrays(distance: np.ndarray, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized calculate_road_travel: (time, cost) arrays for a distance array."""
+    profile = config.TRANSPORT_PROFILES.get(mode, config.TRANSPORT_PROFILES["car"])
+    long_haul = distance > 200
+    speed = np.where(long_haul, 80.0, profile["speed"])
+    traffic_factor = np.select([long_haul, distance > 50, distance > 20], [1.0, 1.3, 1.2], default=1.1)
+    time = ((distance / speed) * 60 * traffic_factor).astype(np.int32)
+    cost = distance * profile["cost_km"]
+    return time, cost
+
+class TravelMatrix:
+    """All-pairs distances and per-mode road times/costs over every POI and station.
+
+    Nodes are addressed by integer index; `index_of` maps a coordinate pair back
+    to its node so coordinate-based callers can use the matrix transparently.
+    """
+
+    def __init__(self, poi_storage: POIStorage, train_data: TrainDataStorage, initialize: bool = True,
+                 max_nodes: Optional[int] = None):
+        self.max_nodes = config.TRAVEL_MATRIX_MAX_NODES if max_nodes is None else max_nodes
+        self.modes = list(config.TRANSPORT_PROFILES.keys())
+        self.mode_index = {mode: k for k, mode in enumerate(self.modes)}
+        self.poi_index: Dict[str, int] = {}
+        self.station_index: Dict[str, int] = {}
+        self._coord_index: Dict[Tuple[float, float], int] = {}
+        self.size = 0
+        self._allocate(0)
+        poi_storage.subscribe(self.add_poi)
+        if not initialize:
+            return
+
+        nodes = self.nodes(poi_storage, train_data)
+        self._ensure_capacity(len(nodes))
+        for key, coords in nodes:
+            self._register(key, coords)
+        for i in range(self.size):
+            self._fill_row(i, range(i + 1, self.size))
+
+    def nodes(self, poi_storage: POIStorage, train_data: TrainDataStorage) -> List[Tuple[Tuple[str, str], Tuple[float, float]]]:
+        """Matrix nodes in index order up to max_nodes: POIs in catalogue order, which day routing
+        queries pairwise, then stations."""
+        nodes = [(("poi", poi_id), coords) for poi_id, coords in
+                 zip(poi_storage.ids, zip(poi_storage.column("lat").tolist(), poi_storage.column("lon").tolist()))]
+        nodes += [(("station", s.id), (s.lat, s.lon)) for s in train_data.stations.values()]
+        if len(nodes) > self.max_nodes:
+            logger.warning(f"Travel matrix covers the first {self.max_nodes} of {len(nodes)} stations and POIs")
+        return nodes[:self.max_nodes]
+
+    def save(self, directory: str):
+        n = self.size
+        np.save(os.path.join(directory, "matrix_coords.npy"), self.coords[:n])
+        np.save(os.path.join(directory, "matrix_distance.npy"), self.distance[:n, :n])
+        np.save(os.path.join(directory, "matrix_time.npy"), self.time[:, :n, :n])
+        np.save(os.path.join(directory, "matrix_cost.npy"), self.cost[:, :n, :n])
+        with open(os.path.join(directory, "matrix_header.json"), "w") as f:
+            json.dump({"modes": self.modes, "stations": list(self.station_index), "pois": list(self.poi_index)}, f)
+
+    @classmethod
+    def load(cls, directory: str, poi_storage: POIStorage, train_data: TrainDataStorage) -> "TravelMatrix":
+        """Matrix written by `save`, memory-mapped copy-on-write. Rebuilt instead when its
+        nodes or modes no longer match the catalogue, timetable or configuration."""
+        matrix = cls(poi_storage, train_data, initialize=False)
+        with open(os.path.join(directory, "matrix_header.json")) as f:
+            header = json.load(f)
+        expected = [node_id for (_, node_id), _ in matrix.nodes(poi_storage, train_data)]
+        if header["modes"] != matrix.modes or header["pois"] + header["stations"] != expected:
+            logger.warning("Travel matrix artifact does not match the loaded data; rebuilding it")
+            return cls(poi_storage, train_data)
+        matrix.coords = np.load(os.path.join(directory, "matrix_coords.npy"), mmap_mode="c")
+        matrix.distance = np.load(os.path.join(directory, "matrix_distance.npy"), mmap_mode="c")
+        matrix.time = np.load(os.path.join(directory, "matrix_time.npy"), mmap_mode="c")
+        matrix.cost = np.load(os.path.join(directory, "matrix_cost.npy"), mmap_mode="c")
+        matrix.poi_index = {node_id: k for k, node_id in enumerate(header["pois"])}
+        matrix.station_index = {node_id: k + len(header["pois"]) for k, node_id in enumerate(header["stations"])}
+        matrix.size = len(expected)
+        for k, coords in enumerate(matrix.coords.tolist()):
+            matrix._coord_index.setdefault(tuple(coords), k)
+        return matrix
+
+    def _allocate(self, capacity: int):
+        n_modes = len(self.modes)
+        self.coords = np.zeros((capacity, 2))
+        self.distance = np.zeros((capacity, capacity))
+        self.time = np.zeros((n_modes, capacity, capacity), dtype=np.int32)
+        self.cost = np.zeros((n_modes, capacity, capacity))
+
+    def _ensure_capacity(self, needed: int):
+        capacity = self.coords.shape[0]
+        if needed <= capacity:
+            return
+        old_coords, old_distance, old_time, old_cost = self.coords, self.distance, self.time, self.cost
+        # Doubling stops at max_nodes: add_poi registers no nodes past it, so more is never used
+        self._allocate(min(max(needed, 2 * capacity, 16), max(self.max_nodes, needed)))
+        n = self.size
+        self.coords[:n] = old_coords[:n]
+        self.distance[:n, :n] = old_distance[:n, :n]
+        self.time[:, :n, :n] = old_time[:, :n, :n]
+        self.cost[:, :n, :n] = old_cost[:, :n, :n]
+
+    def _register(self, key: Tuple[str, str], coords: Tuple[float, float]) -> int:
+        kind, node_id = key
+        index = self.poi_index if kind == "poi" else self.station_index
+        idx = self.size
+        index[node_id] = idx
+        self.coords[idx] = coords
+        self._coord_index.setdefault(coords, idx)
+        self.size += 1
+        return idx
+
+    def _fill_row(self, i: int, others):
+        others = list(others)
+        if not others:
+            return
+        lat, lon = self.coords[i]
+        row = batch_distance(lat, lon, self.coords[others, 0], self.coords[others, 1], "exact")
+        self.distance[i, others] = row
+        self.distance[others, i] = row
+        for mode, k in self.mode_index.items():
+            time, cost = road_travel_arrays(row, mode)
+            self.time[k, i, others] = time
+            self.time[k, others, i] = time
+            self.cost[k, i, others] = cost
+            self.cost[k, others, i] = cost
+
+    def add_poi(self, poi: POI):
+        coords = (poi.lat, poi.lon)
+        idx = self.poi_index.get(poi.id)
+        if idx is None:
+            if self.size >= self.max_nodes:
+                return  # served by the on-demand distance paths
+            self._ensure_capacity(self.size + 1)
+            idx = self._register(("poi", poi.id), coords)
+        elif tuple(self.coords[idx]) != coords:
+            self.coords[idx] = coords
+            self._coord_index = {}
+            for j in range(self.size):
+                self._coord_index.setdefault((float(self.coords[j, 0]), float(self.coords[j, 1])), j)
+        else:
+            return
+        self._fill_row(idx, (j for j in range(self.size) if j != idx))
+
+    def index_of(self, lat: float, lon: float) -> Optional[int]:
+        return self._coord_index.get((lat, lon))
+
+    def distances_from(self, location: Tuple[float, float], pois: List[POI]) -> np.ndarray:
+        """Distances from `location` to each POI: a matrix row slice when possible, else a batch kernel call."""
+        return self.distances_to(location, [poi.id for poi in pois], [poi.lat for poi in pois], [poi.lon for poi in pois])
+
+    def distances_to(self, location: Tuple[float, float], poi_ids: List[str], lats, lons) -> np.ndarray:
+        """distances_from for column data: POI ids plus matching coordinate arrays."""
+        origin = self.index_of(*location)
+        nodes = [self.poi_index.get(poi_id) for poi_id in poi_ids]
+        if origin is not None and None not in nodes:
+            return self.distance[origin, nodes]
+        return batch_distance(location[0], location[1], lats, lons)
+
+    def time_matrix(self, origin: Tuple[float, float], pois: List[POI], mode: str = "car") -> np.ndarray:
+        """Square travel-time matrix over [origin] + pois for one road mode."""
+        nodes = [self.poi_index.get(poi.id) for poi in pois]
+        n = len(pois)
+        times = np.zeros((n + 1, n + 1), dtype=np.int32)
+        if None in nodes:
+            lats = np.array([poi.lat for poi in pois])
+            lons = np.array([poi.lon for poi in pois])
+            for k, poi in enumerate(pois):
+                times[k + 1, 1:] = road_travel_arrays(batch_distance(poi.lat, poi.lon, lats, lons), mode)[0]
+        else:
+            k_mode = self.mode_index.get(mode, self.mode_index["car"])
+            times[1:, 1:] = self.time[k_mode][np.ix_(nodes, nodes)]
+        origin_times = road_travel_arrays(self.distances_from(origin, pois), mode)[0]
+        times[0, 1:] = origin_times
+        times[1:, 0] = origin_times
+        return times
+
+    def road_travel(self, i: int, j: int, mode: str = "car") -> Dict:
+        k = self.mode_index.get(mode, self.mode_index["car"])
+        return {"time": int(self.time[k, i, j]), "cost": float(self.cost[k, i, j]), "distance": float(self.distance[i, j])}
+
+# --------------------
+# Transit Router
+# --------------------
+_UNREACHED = 1 << 62
+
+class _ConnectionScan:
+    """Resumable one-to-all connection scan from one station at one departure minute."""
+    __slots__ = ("arrival", "ready", "reached_by", "boarded", "position", "end")
+
+    def __init__(self, origin: int, depart_after: int, start: int, end: int, num_stations: int, num_trips: int):
+        self.arrival = [_UNREACHED] * num_stations
+        self.ready = [_UNREACHED] * num_stations  # earliest time a train can be boarded here
+        self.arrival[origin] = self.ready[origin] = depart_after
+        self.reached_by: Dict[int, Tuple[int, int]] = {}  # station -> (boarding, alighting) connection
+        self.boarded = [-1] * num_trips  # train instance -> boarding connection
+        self.position = start
+        self.end = end
+
+class TransitRouter:
+    """Earliest-arrival rail journeys with transfers (Connection Scan Algorithm).
+
+    The daily timetable is unrolled over enough days to cover overnight trains, so
+    a query at any minute of the day sees trains already running and tomorrow's
+    departures. Scans are cached per (origin, departure minute) and resumed only as
+    far as each target needs, so every candidate of one greedy step shares a scan.
+    """
+
+    def __init__(self, train_data: TrainDataStorage, cache_size: int = 256,
+                 min_transfer: Optional[int] = None, horizon: Optional[int] = None):
+        self.train_data = train_data
+        self.cache_size = cache_size
+        self.min_transfer = config.MIN_TRANSFER_MINUTES if min_transfer is None else min_transfer
+        self.horizon = config.TRANSIT_SEARCH_HORIZON if horizon is None else horizon
+        self._scans: "OrderedDict[Tuple[int, int], _ConnectionScan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+
+    def warm(self):
+        """Unroll the timetable now instead of on the first query."""
+        with self._lock:
+            if self._version != self.train_data.version:
+                self._rebuild()
+
+    def _rebuild(self):
+        # Queries depart in [0, 1440 + horizon). The scan loop indexes the unrolled columns per
+        # connection; memoryviews read them in place (mapped from the artifacts) as plain ints
+        unrolled = self.train_data.unrolled_connections(self.horizon)
+        self._depart, self._arrive, self._from, self._to, self._trip = (
+            memoryview(unrolled[name]) for name in TrainDataStorage.TRANSIT_COLUMNS)
+        self._n_trains = max(len(self.train_data.train_names), 1)
+        self._num_trips = int(unrolled["trip"].max()) + 1 if len(unrolled["trip"]) else 0
+        self._scans.clear()
+        self._version = self.train_data.version
+
+    def _scan_to(self, scan: _ConnectionScan, target: int) -> Optional[int]:
+        # Resume until no remaining connection can improve the target's arrival
+        depart, arrive, from_, to, trip = self._depart, self._arrive, self._from, self._to, self._trip
+        arrival, ready, reached_by, boarded = scan.arrival, scan.ready, scan.reached_by, scan.boarded
+        min_transfer, end = self.min_transfer, scan.end
+        c = scan.position
+        while c < end:
+            dep = depart[c]  # each column is read once per connection: memoryview reads box a new int
+            if dep >= arrival[target]:
+                break
+            t = trip[c]
+            board = boarded[t]
+            if board < 0:
+                if ready[from_[c]] > dep:
+                    c += 1
+                    continue
+                board = boarded[t] = c
+            station, arr = to[c], arrive[c]
+            if arr < arrival[station]:
+                arrival[station] = arr
+                ready[station] = arr + min_transfer
+                reached_by[station] = (board, c)
+            c += 1
+        scan.position = c
+        return arrival[target] if arrival[target] != _UNREACHED else None
+
+    def earliest_arrival(self, start_id: str, end_id: str, depart_after: int) -> Optional[Dict]:
+        """Earliest-arrival journey leaving `start_id` no earlier than minute-of-day `depart_after`.
+
+        Returns {"depart_mins", "arrive_mins", "legs": [...]} with times relative to the
+        query day (so they may exceed 1440), or None when no journey exists in the horizon.
+        """
+        origin, target = self.train_data.station_ids.get(start_id), self.train_data.station_ids.get(end_id)
+        if origin is None or target is None or origin == target:
+            return None
+        depart_after %= 1440
+        with self._lock:
+            if self._version != self.train_data.version:
+                self._rebuild()
+            key = (origin, depart_after)
+            scan = self._scans.get(key)
+            if scan is None:
+                start = bisect_left(self._depart, depart_after)
+                end = bisect_right(self._depart, depart_after + self.horizon)
+                scan = self._scans[key] = _ConnectionScan(origin, depart_after, start, end,
+                                                          len(self.train_data.station_codes), self._num_trips)
+                if len(self._scans) > self.cache_size:
+                    self._scans.popitem(last=False)
+            else:
+                self._scans.move_to_end(key)
+            if self._scan_to(scan, target) is None:
+                return None
+            legs, station = [], target
+            while station != origin:
+                board, alight = scan.reached_by[station]
+                legs.append(self._leg(board, alight))
+                station = self._from[board]
+        legs.reverse()
+        return {"depart_mins": legs[0]["depart_mins"], "arrive_mins": legs[-1]["arrive_mins"], "legs": legs}
+
+    def _leg(self, board: int, alight: int) -> Dict:
+        train_id = self._trip[board] % self._n_trains
+        codes = self.train_data.station_codes
+        return {
+            "name": self.train_data.train_names[train_id],
+            "number": self.train_data.train_numbers[train_id],
+            "from": codes[self._from[board]],
+            "to": codes[self._to[alight]],
+            "depart_mins": self._depart[board],
+            "arrive_mins": self._arrive[alight]
+        }
+
+# --------------------
+# Datastore
+# --------------------
+# Source tables (SQLite tables or <name>.parquet files); list columns hold comma-separated values
+SOURCE_TABLES = {
+    "stations": ("id", "name", "city", "lat", "lon"),
+    "stops": ("train_number", "train_name", "seq", "station_id", "arrival", "departure"),
+    "pois": ("id", "name", "city", "lat", "lon", "categories", "duration", "popularity", "open_time", "close_time",
+             "cost", "nearest_station_id", "description", "rating", "review_count", "accessibility_score",
+             "family_friendly", "best_time_to_visit"),
+}
+ARTIFACT_FORMAT = 2
+
+def read_source(source: str) -> Dict[str, pd.DataFrame]:
+    """Source tables from a SQLite file or a directory of Parquet files, in stored order."""
+    if os.path.isdir(source):
+        return {name: pd.read_parquet(os.path.join(source, f"{name}.parquet"), columns=list(columns))
+                for name, columns in SOURCE_TABLES.items()}
+    db = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        return {name: pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {name} ORDER BY rowid", db)
+                for name, columns in SOURCE_TABLES.items()}
+    finally:
+        db.close()
+
+def load_source(source: str) -> Tuple[TrainDataStorage, POIStorage]:
+    tables = read_source(source)
+    train_data = TrainDataStorage(initialize=False)
+    train_data.stations = {row["id"]: TrainStation(row["id"], row["name"], row["city"], float(row["lat"]), float(row["lon"]))
+                           for row in tables["stations"].to_dict("records")}
+    train_data._index_stations()
+    schedule = []
+    for number, stops in tables["stops"].groupby("train_number", sort=False):
+        stops = stops.sort_values("seq", kind="stable")
+        schedule.append({"name": stops["train_name"].iloc[0], "number": str(number),
+                         "stops": list(zip(stops["station_id"], stops["arrival"], stops["departure"]))})
+    train_data.load_timetable(schedule)
+
+    poi_storage = POIStorage(train_data, initialize=False)
+    split = lambda value: [v for v in str(value).split(",") if v] if isinstance(value, str) else []
+    for row in tables["pois"].to_dict("records"):
+        station = row["nearest_station_id"]
+        poi_storage._store(POI(
+            str(row["id"]), row["name"], row["city"], float(row["lat"]), float(row["lon"]), split(row["categories"]),
+            int(row["duration"]), float(row["popularity"]), int(row["open_time"]), int(row["close_time"]),
+            float(row["cost"]), station if isinstance(station, str) and station else None,
+            row["description"] if isinstance(row["description"], str) else "",
+            float(row["rating"]), int(row["review_count"]), float(row["accessibility_score"]),
+            bool(row["family_friendly"]), split(row["best_time_to_visit"])
+        ))
+    return train_data, poi_storage
+
+def export_source(path: str, train_data: TrainDataStorage, poi_storage: POIStorage):
+    """Write the loaded stations, timetable and POIs as a SQLite source for load_source."""
+    stations = pd.DataFrame([[s.id, s.name, s.city, s.lat, s.lon] for s in train_data.stations.values()],
+                            columns=SOURCE_TABLES["stations"])
+    stops = pd.DataFrame([[train["number"], train["name"], seq, code, arrival, departure]
+                          for train in train_data.schedule()
+                          for seq, (code, arrival, departure) in enumerate(train["stops"])],
+                         columns=SOURCE_TABLES["stops"])
+    pois = pd.DataFrame([[getattr(poi, column) if not isinstance(getattr(poi, column), list) else ",".join(getattr(poi, column))
+                          for column in SOURCE_TABLES["pois"]] for poi in poi_storage.get_all_pois()],
+                        columns=SOURCE_TABLES["pois"])
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    try:
+        for name, frame in (("stations", stations), ("stops", stops), ("pois", pois)):
+            frame.to_sql(name, db, index=False)
+    finally:
+        db.close()
+
+def write_artifacts(directory: str, train_data: TrainDataStorage, poi_storage: POIStorage,
+                    matrix: Optional["TravelMatrix"] = None, source: Optional[str] = None) -> Dict:
+    """Write every derived structure under `directory` for load_artifacts.
+
+    Files are written to a sibling directory that then replaces `directory`, so running
+    processes keep their mappings of the previous build.
+    """
+    started = time.time()
+    matrix = matrix or TravelMatrix(poi_storage, train_data)
+    staging = f"{directory.rstrip(os.sep)}.staging-{os.getpid()}"
+    os.makedirs(staging)
+    train_data.save(staging)
+    poi_storage.save(staging)
+    matrix.save(staging)
+    manifest = {"format": ARTIFACT_FORMAT, "source": os.path.abspath(source) if source else None,
+                "built_at": time.time(), "build_seconds": round(time.time() - started, 3), "pois": len(poi_storage),
+                "stations": len(train_data.stations), "trains": len(train_data.train_names), "matrix_nodes": matrix.size}
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    retired = f"{directory.rstrip(os.sep)}.retired-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, retired)
+    os.rename(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+def build_artifacts(source: str, directory: str) -> Dict:
+    """Load `source` and write its artifacts under `directory`."""
+    train_data, poi_storage = load_source(source)
+    return write_artifacts(directory, train_data, poi_storage, source=source)
+
+def load_artifacts(directory: str) -> Tuple[TrainDataStorage, POIStorage, TravelMatrix]:
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{directory} has artifact format {manifest.get('format')}, expected {ARTIFACT_FORMAT}; "
+                         f"run `python backend/main.py build-artifacts` again")
+    source = manifest.get("source")
+    if source and os.path.exists(source) and os.path.getmtime(source) > manifest["built_at"]:
+        logger.warning(f"{source} changed after the artifacts in {directory} were built")
+    train_data = TrainDataStorage.load(directory)
+    poi_storage = POIStorage.load(directory, train_data)
+    return train_data, poi_storage, TravelMatrix.load(directory, poi_storage, train_data)
+
+def initial_data(source: Optional[str] = None) -> Tuple[TrainDataStorage, POIStorage]:
+    """`source`, else DATA_SOURCE when configured, else the built-in sample."""
+    if source or config.DATA_SOURCE:
+        return load_source(source or config.DATA_SOURCE)
+    train_data = TrainDataStorage()
+    return train_data, POIStorage(train_data)
+
+class DataGenerations:
+    """Numbered artifact directories under one root that every worker process maps.
+
+    `CURRENT` names the newest complete generation and is replaced atomically, so a
+    reader sees either the previous generation or the new one. Workers attach by
+    memory-mapping that generation's files. The pages are shared between processes,
+    so per-worker memory stays flat as the dataset grows; with the root on /dev/shm
+    they live in shared memory. Only the newest `keep` generations stay on disk. A
+    process that still maps a removed one keeps its pages until it drops them.
+    """
+
+    def __init__(self, root: str, keep: int = 2):
+        self.root = root
+        self.keep = max(keep, 1)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, generation: int) -> str:
+        return os.path.join(self.root, f"gen-{generation:06d}")
+
+    def current(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _publish(self, train_data: TrainDataStorage, poi_storage: POIStorage,
+                 matrix: Optional["TravelMatrix"], source: Optional[str]) -> int:
+        generation = (self.current() or 0) + 1
+        write_artifacts(self.path(generation), train_data, poi_storage, matrix, source)
+        pointer = os.path.join(self.root, f"CURRENT.{os.getpid()}")
+        with open(pointer, "w") as f:
+            f.write(str(generation))
+        os.replace(pointer, os.path.join(self.root, "CURRENT"))
+        for name in os.listdir(self.root):
+            if name.startswith("gen-") and name[4:].isdigit() and int(name[4:]) <= generation - self.keep:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        return generation
+
+    def publish(self, train_data: TrainDataStorage, poi_storage: POIStorage,
+                matrix: Optional["TravelMatrix"] = None, source: Optional[str] = None) -> int:
+        """Write a new generation and make it current; returns its number."""
+        with self._locked():
+            return self._publish(train_data, poi_storage, matrix, source)
+
+    def attach(self, generation: Optional[int] = None) -> Tuple[int, TrainDataStorage, POIStorage, "TravelMatrix"]:
+        generation = self.current() if generation is None else generation
+        return (generation,) + load_artifacts(self.path(generation))
+
+    def attach_or_publish(self, build: Callable[[], Tuple[TrainDataStorage, POIStorage]]
+                          ) -> Tuple[int, TrainDataStorage, POIStorage, "TravelMatrix"]:
+        """Attach to the current generation, publishing one from `build()` first if there is
+        none. Concurrently starting workers wait for the first one's build."""
+        with self._locked():
+            if self.current() is None:
+                self._publish(*build(), None, config.DATA_SOURCE)
+            return self.attach()
+
+@dataclass
+class DataSnapshot:
+    """One consistent version of the catalogue, the timetable and the indexes derived from them.
+
+    A request pins the snapshot that is live when it starts (see pinned_data) and uses it
+    to the end, so a reload that swaps in a new snapshot never changes data under a
+    request in flight. `generation` is the shared generation in SHARED_DATA_DIR mode and
+    counts reloads otherwise.
+    """
+    generation: int
+    train_data: TrainDataStorage
+    poi_storage: POIStorage
+    travel_matrix: TravelMatrix
+    transit_router: TransitRouter
+    path: Optional[str] = None  # artifact directory the snapshot is mapped from, if any
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def version(self) -> Tuple[int, int, int]:
+        """Grows with every reload and add_poi or timetable change; caches key on it."""
+        return (self.generation, self.poi_storage.version, self.train_data.version)
+
+    @property
+    def timetable_version(self) -> Tuple[int, int]:
+        return (self.generation, self.train_data.version)
+
+def load_data(source: Optional[str] = None, rebuild: bool = False, generation: int = 0) -> DataSnapshot:
+    """Snapshot of the configured data: DATA_ARTIFACTS, the current SHARED_DATA_DIR
+    generation, or `source` / DATA_SOURCE / the built-in sample loaded in process.
+
+    With `rebuild`, a given `source` is first rebuilt into DATA_ARTIFACTS, and in shared mode
+    `source` or DATA_SOURCE is published as a new generation.
+    """
+    path = None
+    if config.DATA_ARTIFACTS:
+        if rebuild and source:
+            build_artifacts(source, config.DATA_ARTIFACTS)
+        path = config.DATA_ARTIFACTS
+        train_data, poi_storage, travel_matrix = load_artifacts(path)
+        logger.info(f"Mapped {len(poi_storage)} POIs and {len(train_data.train_names)} trains from {config.DATA_ARTIFACTS}")
+    elif shared_data is not None:
+        if rebuild and (source or config.DATA_SOURCE):
+            shared_data.publish(*initial_data(source), source=source or config.DATA_SOURCE)
+        generation, train_data, poi_storage, travel_matrix = shared_data.attach_or_publish(initial_data)
+        path = shared_data.path(generation)
+        logger.info(f"Attached to data generation {generation} in {config.SHARED_DATA_DIR}")
+    else:
+        train_data, poi_storage = initial_data(source)
+        if source or config.DATA_SOURCE:
+            logger.info(f"Loaded {len(poi_storage)} POIs from {source or config.DATA_SOURCE}; "
+                        f"build artifacts to start from memory-mapped files instead")
+        travel_matrix = TravelMatrix(poi_storage, train_data)
+    return DataSnapshot(generation, train_data, poi_storage, travel_matrix, TransitRouter(train_data), path)
 
 # Initialize Data Storages
-poi_storage = POIStorage()
-train_data = TrainDataStorage()
+shared_data = DataGenerations(config.SHARED_DATA_DIR, config.SHARED_DATA_KEEP) if config.SHARED_DATA_DIR else None
+_live_data: Optional[DataSnapshot] = None  # loaded on first use; replaced, never mutated, by DataReloader
+_live_data_lock = threading.Lock()
+_pinned_data: ContextVar[Optional[DataSnapshot]] = ContextVar("pinned_data", default=None)
+
+def live_data() -> DataSnapshot:
+    """The live snapshot, loaded on first use so that importing the module stays cheap."""
+    if _live_data is None:
+        with _live_data_lock:
+            if _live_data is None:
+                set_live_data(load_data())
+    return _live_data
+
+def set_live_data(snapshot: DataSnapshot):
+    global _live_data
+    _live_data = snapshot
+
+def current_data() -> DataSnapshot:
+    """The snapshot pinned for this request or job, else the live one."""
+    return _pinned_data.get() or live_data()
+
+@contextmanager
+def pinned_data(snapshot: Optional[DataSnapshot] = None):
+    """Pin `snapshot` (default: the current one) for the block, which may span the yields
+    of a generator. An existing pin is kept when no snapshot is given."""
+    if snapshot is None and _pinned_data.get() is not None:
+        yield _pinned_data.get()
+        return
+    snapshot = snapshot or live_data()
+    token = _pinned_data.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        try:
+            _pinned_data.reset(token)
+        except ValueError:
+            pass  # a generator closed from another thread; its pin ends with that context
+
+_shared_scores: ContextVar[Optional[Dict]] = ContextVar("shared_scores", default=None)
+
+@contextmanager
+def shared_scoring():
+    """Within the block, plans that filter and score the catalogue the same way share one
+    pass over it (batch generation)."""
+    token = _shared_scores.set({})
+    try:
+        yield
+    finally:
+        _shared_scores.reset(token)
 
 # --------------------
 # Journey Calculation
 # --------------------
+class JourneyLegCache:
+    """Process-wide LRU of journey legs, shared by every request and safe across threads.
+
+    Legs without a station at both ends do not depend on the clock and are keyed without
+    it. The others are keyed on the departure minute of day after rounding up to
+    `bucket_minutes`; the traveller is treated as leaving at that boundary, so one entry
+    serves the whole bucket. Entries belong to one timetable version: a newer version
+    drops them, and requests still running on an older one bypass the cache.
+    """
+
+    def __init__(self, max_entries: int, bucket_minutes: int):
+        self.max_entries = max_entries
+        self.bucket_minutes = max(1, bucket_minutes)
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def departure(self, current_time: int) -> int:
+        return -(-current_time // self.bucket_minutes) * self.bucket_minutes
+
+    def _advance(self, version: Tuple) -> bool:
+        if self._version is None or version > self._version:
+            self._entries.clear()
+            self._version = version
+        return version == self._version
+
+    def advance(self, version: Tuple):
+        """Drop the entries of timetables older than `version`."""
+        with self._lock:
+            self._advance(version)
+
+    def get(self, key: Tuple, version: Tuple) -> Optional[Dict]:
+        with self._lock:
+            leg = self._entries.get(key) if self._advance(version) else None
+            if leg is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return leg
+
+    def put(self, key: Tuple, leg: Dict, version: Tuple):
+        with self._lock:
+            if not self._advance(version):
+                return
+            self._entries[key] = leg
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self._entries), bucket_minutes=self.bucket_minutes,
+                        hit_rate=round(self.counters["hits"] / lookups, 4) if lookups else 0.0)
+
+journey_leg_cache = JourneyLegCache(config.JOURNEY_CACHE_SIZE, config.JOURNEY_TIME_BUCKET_MINUTES)
+
 def calculate_journey_details(start_location: Tuple[float, float], end_location: Tuple[float, float], 
                              start_station_id: Optional[str], end_station_id: Optional[str], 
-                             current_time: int, end_poi_name: str, transport_mode: str = "car") -> Dict:
+                             current_time: int, end_poi_name: str, transport_mode: str = "car",
+                             direct_distance: Optional[float] = None) -> Dict:
+    timed = bool(start_station_id and end_station_id)
+    depart = journey_leg_cache.departure(current_time) if timed else current_time
+    key = (start_location, end_location, start_station_id, end_station_id, depart % 1440 if timed else None,
+           end_poi_name, transport_mode, direct_distance)
+    version = current_data().timetable_version
+    leg = journey_leg_cache.get(key, version)
+    if leg is None:
+        leg = _journey_details(start_location, end_location, start_station_id, end_station_id, depart,
+                               end_poi_name, transport_mode, direct_distance)
+        journey_leg_cache.put(key, leg, version)
+    journey = dict(leg, details=list(leg["details"]))
+    if journey["mode"] == "train":
+        # Minutes spent waiting for the bucket boundary count towards the journey
+        journey["total_time"] += depart - current_time
+        journey["arrival_time"] = depart + leg["total_time"]
+    else:
+        journey["arrival_time"] = current_time + leg["total_time"]
+    return journey
+
+def _journey_details(start_location: Tuple[float, float], end_location: Tuple[float, float],
+                     start_station_id: Optional[str], end_station_id: Optional[str],
+                     current_time: int, end_poi_name: str, transport_mode: str = "car",
+                     direct_distance: Optional[float] = None) -> Dict:
     start_lat, start_lon = start_location
     end_lat, end_lon = end_location
+    data = current_data()
+    matrix = data.travel_matrix
 
     current_time_of_day = current_time % 1440
     
     # If no train stations or train not preferred, use direct road travel
     if not start_station_id or not end_station_id:
     # No stations at either end -> only then allow road
-        road_journey = calculate_road_travel(start_lat, start_lon, end_lat, end_lon, transport_mode)
+        road_journey = calculate_road_travel(start_lat, start_lon, end_lat, end_lon, transport_mode, direct_distance, matrix)
         return {
             "mode": transport_mode,
             "total_time": road_journey["time"],
@@ -346,13 +1764,24 @@ def calculate_journey_details(start_location: Tuple[float, float], end_location:
             "details": [f"Travel by {transport_mode} to {end_poi_name} ({road_journey['time']} mins)."]
         }
         
+    train_data, transit_router = data.train_data, data.transit_router
     start_station = train_data.stations.get(start_station_id)
     end_station = train_data.stations.get(end_station_id)
     train = train_data.find_next_train(start_station_id, end_station_id, current_time_of_day)
+    if not train and start_station and end_station:
+        # No direct train: offer a journey with changes unless it is far slower than driving
+        leg1 = calculate_road_travel(start_lat, start_lon, start_station.lat, start_station.lon, "auto", travel_matrix=matrix)
+        rail_journey = transit_router.earliest_arrival(start_station_id, end_station_id, current_time + leg1["time"])
+        if rail_journey:
+            connecting = _connecting_journey_details(rail_journey, leg1, start_station, end_station, (end_lat, end_lon),
+                                                     current_time, current_time + leg1["time"], end_poi_name)
+            road_time = calculate_road_travel(start_lat, start_lon, end_lat, end_lon, "car", direct_distance, matrix)["time"]
+            if connecting["total_time"] <= config.MAX_TRANSFER_SLOWDOWN * max(road_time, 1):
+                return connecting
     if not train or not start_station or not end_station:
         # If user explicitly requested trains but this segment has no train route, fall back to road for this segment.
         # Use "car" as last-mile/mid-city transport for train-unavailable legs.
-        road_journey = calculate_road_travel(start_lat, start_lon, end_lat, end_lon, "car")
+        road_journey = calculate_road_travel(start_lat, start_lon, end_lat, end_lon, "car", direct_distance, matrix)
         return {
             "mode": "car",
             "total_time": road_journey["time"],
@@ -364,15 +1793,16 @@ def calculate_journey_details(start_location: Tuple[float, float], end_location:
             ]
         }
         
-    leg1 = calculate_road_travel(start_lat, start_lon, start_station.lat, start_station.lon, "auto")
+    leg1 = calculate_road_travel(start_lat, start_lon, start_station.lat, start_station.lon, "auto", travel_matrix=matrix)
     time_at_station = current_time + leg1["time"]
     wait_time = train["depart_mins"] - (time_at_station % 1440)
     if wait_time < 0:
         wait_time += 1440
-    leg3 = calculate_road_travel(end_station.lat, end_station.lon, end_lat, end_lon, "auto")
+    leg3 = calculate_road_travel(end_station.lat, end_station.lon, end_lat, end_lon, "auto", travel_matrix=matrix)
     
     total_time = leg1["time"] + wait_time + train["duration_mins"] + leg3["time"]
-    ticket_cost = calculate_distance(start_station.lat, start_station.lon, end_station.lat, end_station.lon) * config.TRANSPORT_PROFILES["train"]["cost_km"]
+    ticket_cost = calculate_distance(start_station.lat, start_station.lon, end_station.lat, end_station.lon,
+                                     matrix) * config.TRANSPORT_PROFILES["train"]["cost_km"]
     total_cost = leg1["cost"] + ticket_cost + leg3["cost"]
     
     return {
@@ -388,6 +1818,43 @@ def calculate_journey_details(start_location: Tuple[float, float], end_location:
         ]
     }
 
+def _connecting_journey_details(rail_journey: Dict, leg1: Dict, start_station: TrainStation,
+                                end_station: TrainStation, end_location: Tuple[float, float],
+                                current_time: int, time_at_station: int, end_poi_name: str) -> Dict:
+    data = current_data()
+    leg3 = calculate_road_travel(end_station.lat, end_station.lon, end_location[0], end_location[1], "auto",
+                                 travel_matrix=data.travel_matrix)
+    rail_time = rail_journey["arrive_mins"] - (time_at_station % 1440)
+    total_time = leg1["time"] + rail_time + leg3["time"]
+    ticket_cost = calculate_distance(start_station.lat, start_station.lon, end_station.lat, end_station.lon,
+                                     data.travel_matrix) * config.TRANSPORT_PROFILES["train"]["cost_km"]
+
+    stations = data.train_data.stations
+
+    def station_name(code):
+        station = stations.get(code)
+        return station.name if station else code
+
+    details = [f"Take auto to {start_station.name} ({leg1['time']} mins)."]
+    ready_at = time_at_station % 1440
+    for k, leg in enumerate(rail_journey["legs"]):
+        wait = leg["depart_mins"] - ready_at
+        if k == 0:
+            details.append(f"Wait {wait} mins for {leg['name']}.")
+        else:
+            details.append(f"Change at {station_name(leg['from'])}: wait {wait} mins for {leg['name']}.")
+        details.append(f"Board at {minutes_to_time(leg['depart_mins'])}, arrive at {station_name(leg['to'])} at {minutes_to_time(leg['arrive_mins'])}.")
+        ready_at = leg["arrive_mins"]
+    details.append(f"Take auto to {end_poi_name} ({leg3['time']} mins).")
+
+    return {
+        "mode": "train",
+        "total_time": total_time,
+        "total_cost": leg1["cost"] + ticket_cost + leg3["cost"],
+        "arrival_time": current_time + total_time,
+        "details": details
+    }
+
 # --------------------
 # Personalization Engine
 # --------------------
@@ -422,10 +1889,11 @@ class PersonalizationEngine:
     def calculate_interest_score(self, poi: POI, user_interests: List[str]) -> float:
         if not user_interests:
             return 0.5
-        score = sum(self.category_weights.get(cat, 0.5) for cat in (set(poi.categories) & set(user_interests)))
+        # Summed in interest order so the batch path can reproduce the result bit for bit
+        score = sum(self.category_weights.get(cat, 0.5) for cat in dict.fromkeys(user_interests) if cat in poi.categories)
         return min(1.0, score / len(user_interests)) if user_interests else 0.5
 
-    def calculate_personalization_score(self, poi: POI, preferences: Dict) -> float:
+    def calculate_personalization_score(self, poi: POI, preferences: Dict, current_month: Optional[str] = None) -> float:
         score = 0.4 * self.calculate_interest_score(poi, preferences.get('interests', []))
         score += 0.25 * ((poi.popularity + poi.rating / 5.0) / 2.0)
         if preferences.get('accessibility_needs', False):
@@ -436,208 +1904,751 @@ class PersonalizationEngine:
             score += 0.10 * (1.0 if poi.family_friendly else 0.3)
         else:
             score += 0.10 * 0.8
-        current_month = datetime.datetime.now().strftime('%b')
+        current_month = current_month or datetime.datetime.now().strftime('%b')
         if poi.best_time_to_visit and current_month in poi.best_time_to_visit:
             score += 0.10
         else:
             score += 0.05
         return min(1.0, score)
 
+    def interest_weights(self, storage: "POIStorage", user_interests: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """User interests as a weight vector over the storage's category codes, in interest order.
+
+        Interests no stored POI carries are left out; they can never match.
+        """
+        known = [cat for cat in dict.fromkeys(user_interests) if cat in storage.category_codes]
+        codes = np.array([storage.category_codes[cat] for cat in known], dtype=np.uint64)
+        weights = np.array([self.category_weights.get(cat, 0.5) for cat in known], dtype=np.float64)
+        return codes, weights
+
+    def calculate_personalization_scores(self, storage: "POIStorage", preferences: Dict, rows: Optional[np.ndarray] = None,
+                                         current_month: Optional[str] = None) -> np.ndarray:
+        """Batch calculate_personalization_score over storage rows (default: the whole catalogue).
+
+        Every term is a column operation and the result matches the scalar path exactly.
+        """
+        def column(values):
+            values = values[:len(storage)]
+            return values if rows is None else values[rows]
+
+        n = len(storage) if rows is None else len(rows)
+        user_interests = preferences.get('interests', [])
+        if user_interests:
+            codes, weights = self.interest_weights(storage, user_interests)
+            words = column(storage.category_mask)[:, (codes >> np.uint64(6)).astype(np.intp)]
+            hits = (words >> (codes & np.uint64(63))) & np.uint64(1)
+            # cumsum adds left to right, the same order as the scalar sum
+            matched = np.cumsum(hits * weights, axis=1)[:, -1] if len(codes) else np.zeros(n)
+            interest = np.minimum(1.0, matched / len(user_interests))
+        else:
+            interest = np.full(n, 0.5)
+        score = 0.4 * interest
+        score += 0.25 * ((column(storage.columns["popularity"]) + column(storage.columns["rating"]) / 5.0) / 2.0)
+        if preferences.get('accessibility_needs', False):
+            score += 0.15 * column(storage.columns["accessibility_score"])
+        else:
+            score += 0.15 * 0.8
+        if preferences.get('family_trip', False):
+            score += 0.10 * np.where(column(storage.columns["family_friendly"]), 1.0, 0.3)
+        else:
+            score += 0.10 * 0.8
+        current_month = current_month or datetime.datetime.now().strftime('%b')
+        in_season = (column(storage.month_mask) & storage.month_bits([current_month])).any(axis=1)
+        score += np.where(in_season, 0.10, 0.05)
+        return np.minimum(1.0, score)
+
 # --------------------
 # Trip Planning Engine
 # --------------------
 class TripPlanningEngine:
     def __init__(self):
         self.personalization = PersonalizationEngine()
+        # (city, next city, mode) -> journey; locked and versioned like the journey legs, so a
+        # request pinned to older data neither reads nor writes the entries of a newer one
+        self._city_legs = JourneyLegCache(config.CITY_LEG_CACHE_SIZE, 1)
 
-    def filter_and_score_pois(self, all_pois: List[POI], preferences: Dict, base_location: Tuple[float, float]) -> List[POI]:
-        base_lat, base_lon = base_location
-        scored_pois = []
-        for poi in all_pois:
-            if not self._passes_filters(poi, preferences):
-                continue
-            personalization_score = self.personalization.calculate_personalization_score(poi, preferences)
-            distance = calculate_distance(base_lat, base_lon, poi.lat, poi.lon)
-            distance_score = 1.0 / (1.0 + distance / 100)  # Normalize distance score
-            budget_score = 1.0
-            if preferences.get('budget'):
-                if poi.cost > preferences['budget'] * 0.3:
-                    budget_score = 0.3
-                elif poi.cost > preferences['budget'] * 0.15:
-                    budget_score = 0.7
-            final_score = (0.6 * personalization_score + 0.2 * distance_score + 0.2 * budget_score)
-            scored_pois.append((final_score, poi))
-        
-        scored_pois.sort(key=lambda x: x[0], reverse=True)
-        return [poi for score, poi in scored_pois]
+    def filter_and_score_pois(self, storage: POIStorage, preferences: Dict, base_location: Tuple[float, float],
+                              limit: Optional[int] = None) -> List[POI]:
+        return storage.views(self.rank_pois(storage, preferences, base_location, limit))
+
+    def candidate_limit(self, preferences: Dict, storage: POIStorage) -> Optional[int]:
+        """How many ranked POIs a trip can use, over-provisioned so the router still has choices."""
+        if not config.CANDIDATE_OVERPROVISION:
+            return None
+        num_days = preferences.get('num_days', 7)
+        pois_per_day = config.PACE_CONFIGS[preferences.get('pace', 'moderate')]['pois_per_day']
+        # Every city after the first costs a travel day plus at least one sightseeing day
+        reachable_cities = min(len(storage.city_names), 1 + num_days // 2)
+        return math.ceil(config.CANDIDATE_OVERPROVISION * num_days * pois_per_day) + config.CANDIDATE_CITY_RESERVE * reachable_cities
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k best scores, in the order a stable descending sort would list them."""
+        if k >= len(scores):
+            return np.argsort(-scores, kind="stable")
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        # Ties at the cut-off keep the earliest rows, as the full sort would
+        chosen = np.sort(np.concatenate([above, np.flatnonzero(scores == kth)[:k - len(above)]]))
+        return chosen[np.argsort(-scores[chosen], kind="stable")]
 
-    def _passes_filters(self, poi: POI, preferences: Dict) -> bool:
-        if preferences.get('budget') and poi.cost > preferences['budget'] * 0.4:
-            return False
+    def rank_pois(self, storage: POIStorage, preferences: Dict, base_location: Tuple[float, float],
+                  limit: Optional[int] = None) -> np.ndarray:
+        """Storage rows passing the filters, best score first; only the best `limit` when given."""
+        return self.ranked_candidates(storage, preferences, base_location, limit)[0]
+
+    def ranked_candidates(self, storage: POIStorage, preferences: Dict, base_location: Tuple[float, float],
+                          limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """rank_pois together with the scores of the rows it returns. Inside shared_scoring()
+        the filter and score pass is reused by every plan with the same scoring inputs."""
+        shared = _shared_scores.get()
+        key = (storage.version, tuple(preferences.get('interests', [])), bool(preferences.get('accessibility_needs')),
+               bool(preferences.get('family_trip')), preferences.get('budget'), preferences.get('pace', 'moderate'),
+               tuple(base_location), datetime.datetime.now().strftime('%b'))
+        scored = shared.get(key) if shared is not None else None
+        if scored is None:
+            rows = np.flatnonzero(self._passes_filters(storage, preferences))
+            scored = rows, self.score_rows(storage, preferences, base_location, rows)
+            if shared is not None:
+                shared[key] = scored
+        rows, scores = scored
+        # Stable descending order, matching a reverse sort on the scores
+        order = np.argsort(-scores, kind="stable") if limit is None else self._top_k(scores, limit)
+        return rows[order], scores[order]
+
+    def score_rows(self, storage: POIStorage, preferences: Dict, base_location: Tuple[float, float],
+                   rows: np.ndarray) -> np.ndarray:
+        distances = current_data().travel_matrix.distances_to(base_location, [storage.ids[row] for row in rows.tolist()],
+                                                              storage.column("lat")[rows], storage.column("lon")[rows])
+        personalization_score = self.personalization.calculate_personalization_scores(storage, preferences, rows)
+        distance_score = 1.0 / (1.0 + distances / 100)  # Normalize distance score
+        budget_score = np.ones(len(rows))
+        if preferences.get('budget'):
+            cost = storage.column("cost")[rows]
+            budget_score = np.select([cost > preferences['budget'] * 0.3, cost > preferences['budget'] * 0.15], [0.3, 0.7], 1.0)
+        return 0.6 * personalization_score + 0.2 * distance_score + 0.2 * budget_score
+
+    def estimate_visit_costs(self, pois: List[POI]) -> np.ndarray:
+        """Entry fee plus a car leg from the nearest other POI of the same city (or its
+        station), which is what most in-city legs cost."""
+        data = current_data()
+        car_cost_km = config.TRANSPORT_PROFILES["car"]["cost_km"]
+        by_city = defaultdict(list)
+        for poi in pois:
+            by_city[poi.city].append(poi)
+        legs = {}
+        for city, members in by_city.items():
+            station = data.train_data.find_station_by_city(city)
+            for poi in members:
+                others = [other for other in members if other.id != poi.id]
+                nearest = data.travel_matrix.distances_from((poi.lat, poi.lon), others).min() if others else (
+                    calculate_distance(poi.lat, poi.lon, station.lat, station.lon, data.travel_matrix) if station else 0.0)
+                legs[poi.id] = float(nearest) * car_cost_km
+        return np.array([poi.cost + legs[poi.id] for poi in pois], dtype=float)
+
+    @staticmethod
+    def select_within_budget(scores: np.ndarray, costs: np.ndarray, budget: float, capacity: int) -> np.ndarray:
+        """Positions of the ranked candidates to plan with when their estimated `costs`
+        exceed `budget`; every position when they do not.
+
+        Maximizes the total score under the budget and at most `capacity` POIs by
+        Lagrangian relaxation of the budget: at a price `lam` per rupee, take up to
+        `capacity` candidates with a positive `scores - lam * costs`. Bisection finds
+        the lowest price whose pick fits. The pick is then topped up by score per rupee
+        while money and capacity remain. Positions come back in ranking order.
+        """
+        if costs.sum() <= budget:
+            return np.arange(len(costs))
+        if budget <= 0 or capacity <= 0:
+            return np.arange(0)
+
+        def pick(lam: float) -> np.ndarray:
+            reduced = scores - lam * costs
+            order = np.argsort(-reduced, kind="stable")[:capacity]
+            return order[reduced[order] > 0]
+
+        priced = costs > 0
+        lo, hi = 0.0, float((scores[priced] / costs[priced]).max()) + 1.0
+        chosen = pick(hi)  # only free candidates survive this price
+        for _ in range(40):
+            lam = (lo + hi) / 2
+            candidate = pick(lam)
+            if costs[candidate].sum() <= budget:
+                hi, chosen = lam, candidate
+            else:
+                lo = lam
+        taken, spent = set(chosen.tolist()), float(costs[chosen].sum())
+        for k in np.argsort(-scores / np.maximum(costs, 1e-9), kind="stable").tolist():
+            if len(taken) >= capacity:
+                break
+            if k not in taken and spent + costs[k] <= budget:
+                taken.add(k)
+                spent += costs[k]
+        return np.array(sorted(taken), dtype=np.int64)
+
+    def city_leg(self, city: str, next_city: str, transport_mode: str) -> Dict:
+        """Station-to-station journey of the travel day between two cities, leaving at
+        08:00. Callers must not modify the returned dict."""
+        data = current_data()
+        key = (city, next_city, transport_mode)
+        leg = self._city_legs.get(key, data.version)
+        if leg is not None:
+            return leg
+        ends = []
+        for name in (city, next_city):
+            station = data.train_data.find_station_by_city(name)
+            location = (station.lat, station.lon) if station else data.poi_storage.city_location(name)
+            ends.append((location or config.DEFAULT_BASE_LOCATION, station.id if station else None))
+        (start, start_id), (end, end_id) = ends
+        leg = calculate_journey_details(start, end, start_id, end_id, 8 * 60, next_city, transport_mode)
+        self._city_legs.put(key, leg, data.version)
+        return leg
+
+    def transfer_cost(self, city: str, next_city: str, transport_mode: str) -> float:
+        """Estimated fare of the travel day between two cities, station to station."""
+        return self.city_leg(city, next_city, transport_mode)["total_cost"]
+
+    @staticmethod
+    def city_days(pois: List[POI], pace: str) -> int:
+        """Days a city's POIs take at `pace`, counting only visiting time against the
+        whole day window. Optimistic on purpose: a city the days run out in is cut
+        short, one left out is lost."""
+        pace_config = config.PACE_CONFIGS[pace]
+        return math.ceil(sum(poi.duration for poi in pois) / (60 * (pace_config['daily_hours'] + pace_config['max_travel_hours'])))
+
+    def plan_city_tour(self, dest_city: str, pois_by_city: Dict[str, List[POI]], values: Dict[str, float],
+                       days: Optional[int], transport_mode: str, pace: str = 'moderate') -> List[str]:
+        """Order, and subset, of the cities to visit, starting from `dest_city`.
+
+        A prize-collecting open tour: every other city is worth the scores of its POIs
+        and takes its POI days plus a travel day. Held-Karp keeps the least transit time
+        for each set of cities and last city. The most valuable set that fits in `days`
+        wins, ties going to the shorter tour; `days=None` visits every city.
+        """
+        worth = {city: sum(values.get(poi.id, 0.0) for poi in pois) for city, pois in pois_by_city.items()}
+        others = sorted((city for city, pois in pois_by_city.items() if pois and city != dest_city),
+                        key=lambda city: -worth[city])[:config.CITY_TOUR_MAX_CITIES]
+        if not others:
+            return [dest_city]
+        limit = math.inf if days is None else days - self.city_days(pois_by_city.get(dest_city, []), pace)
+        need = [self.city_days(pois_by_city[city], pace) + 1 for city in others]
+        nodes = [dest_city] + others
+        minutes = np.array([[self.city_leg(a, b, transport_mode)["total_time"] if a != b else 0 for b in nodes]
+                            for a in nodes], dtype=float)
+
+        # best[mask, j]: least minutes to leave dest_city, visit the cities in `mask`, and end at city j
+        n = len(others)
+        masks = np.arange(1 << n)
+        members = (masks[:, None] >> np.arange(n)) & 1
+        sizes = members.sum(axis=1)
+        span, gain = members @ np.array(need), members @ np.array([worth[city] for city in others])
+        best = np.full((1 << n, n), np.inf)
+        parent = np.full((1 << n, n), -1)
+        best[1 << np.arange(n), np.arange(n)] = minutes[0, 1:]
+        hops = minutes[1:, 1:]
+        for size in range(2, n + 1):
+            # Sets are only ever entered from the set without their last city, so each layer is one gather
+            layer = masks[sizes == size]
+            rows, last = np.nonzero(members[layer])
+            tails = layer[rows]
+            reach = best[tails ^ (1 << last)] + hops[:, last].T
+            parent[tails, last] = reach.argmin(axis=1)
+            best[tails, last] = reach.min(axis=1)
+
+        fits = np.isfinite(best) & (span <= limit)[:, None]
+        if not fits.any():
+            return [dest_city]
+        mask, last = np.nonzero(fits)
+        pick = np.lexsort((best[mask, last], -sizes[mask], -gain[mask]))[0]
+        mask, last = int(mask[pick]), int(last[pick])
+        order = []
+        while last >= 0:
+            order.append(others[last])
+            mask, last = mask ^ (1 << last), int(parent[mask, last])
+        return [dest_city] + order[::-1]
+
+    def select_candidates(self, pois: List[POI], scores: np.ndarray, budget: float, capacity: int,
+                          dest_city: str, transport_mode: str, excluded: Iterable[str] = ()) -> np.ndarray:
+        """Positions of the ranked `pois` to plan with under `budget`.
+
+        Each city after the destination also costs a travel day, taken in the order the
+        city tour would visit them. A pick that cannot pay for its transfers is refitted
+        with them reserved, then the city worth least per rupee (its POIs plus the
+        transfer into it) is left out and the selection runs again. The highest-scoring
+        pick that fits, transfers included, wins.
+        """
+        costs = self.estimate_visit_costs(pois)
+        excluded, tours = set(excluded), {}
+
+        def transfers_for(positions: np.ndarray) -> Dict[str, float]:
+            by_city = defaultdict(list)
+            for k in positions.tolist():
+                by_city[pois[k].city].append(pois[k])
+            cities = frozenset(by_city)
+            if cities not in tours:
+                sequence = self.plan_city_tour(dest_city, by_city, {}, None, transport_mode)
+                tours[cities] = {next_city: self.transfer_cost(city, next_city, transport_mode)
+                                 for city, next_city in zip(sequence, sequence[1:])}
+            return tours[cities]
+
+        best, best_value = np.arange(0), -1.0
+        while True:
+            allowed = np.array([k for k, poi in enumerate(pois) if poi.city not in excluded], dtype=np.int64)
+            chosen = allowed[self.select_within_budget(scores[allowed], costs[allowed], budget, capacity)]
+            costs_into = transfers_for(chosen)
+            picks = [chosen]
+            if costs_into:
+                picks.append(allowed[self.select_within_budget(scores[allowed], costs[allowed],
+                                                               budget - sum(costs_into.values()), capacity)])
+            for pick in picks:
+                if costs[pick].sum() + sum(transfers_for(pick).values()) <= budget and scores[pick].sum() > best_value:
+                    best, best_value = pick, float(scores[pick].sum())
+            if best is chosen or not costs_into:
+                return best
+            value, spend = defaultdict(float), dict(costs_into)
+            for k in chosen.tolist():
+                value[pois[k].city] += scores[k]
+                spend[pois[k].city] = spend.get(pois[k].city, 0.0) + costs[k]
+            excluded.add(min(costs_into, key=lambda city: value[city] / max(spend[city], 1e-9)))
+
+    def _passes_filters(self, storage: POIStorage, preferences: Dict) -> np.ndarray:
+        """Boolean mask over the storage rows."""
+        passing = np.ones(len(storage), dtype=bool)
+        if preferences.get('budget'):
+            passing &= storage.column("cost") <= preferences['budget'] * 0.4
         pace_config = config.PACE_CONFIGS[preferences.get('pace', 'moderate')]
         max_duration = pace_config['daily_hours'] * 60 // 2
-        if poi.duration > max_duration:
-            return False
-        return True
+        passing &= storage.column("duration") <= max_duration
+        return passing
+
+    def _plan_visit(self, poi: POI, current_location: Tuple[float, float], current_time: int,
+                    start_station_id: Optional[str], transport_mode: str,
+                    direct_distance: Optional[float] = None) -> Optional[Dict]:
+        end_station_id_safe = poi.nearest_station_id if (poi.nearest_station_id and poi.nearest_station_id in current_data().train_data.stations) else start_station_id
+        journey = calculate_journey_details(
+            current_location, (poi.lat, poi.lon), start_station_id, 
+            end_station_id_safe, current_time, poi.name, transport_mode, direct_distance
+        )
+        
+        start_visit_time = max(journey["arrival_time"], current_time - (current_time % 1440) + poi.open_time)
+        end_visit_time = start_visit_time + poi.duration
+
+        if end_visit_time < (current_time - (current_time % 1440) + poi.close_time):
+            return {
+                "poi": poi,
+                "journey": journey,
+                "start_time": start_visit_time,
+                "end_time": end_visit_time
+            }
+        return None
+
+    @staticmethod
+    def _schedule_item(visit: Dict) -> Dict:
+        return {
+            "poi": visit["poi"],
+            "arrival_time": minutes_to_time(visit["journey"]["arrival_time"] % 1440),
+            "start_time": minutes_to_time(visit["start_time"] % 1440),
+            "end_time": minutes_to_time(visit["end_time"] % 1440),
+            "visit_cost": visit["poi"].cost,
+            "travel_cost": visit["journey"]["total_cost"],
+            "travel_time": visit["journey"]["total_time"],
+            "travel_details": visit["journey"]["details"]
+        }
 
     def optimize_day_route(self, day_pois: List[POI], start_location: Tuple[float, float], 
                           start_city: str, day_start_time: int, day_end_time: int, 
-                          transport_mode: str) -> Tuple[List[Dict], Tuple[float, float]]:
+                          transport_mode: str, solver: str = "greedy", pace: str = "moderate",
+                          time_limit_ms: Optional[int] = None) -> Tuple[List[Dict], Tuple[float, float]]:
+        if solver == "ortools" and day_pois:
+            routes = self._solve_day_routes(day_pois, start_location, [(day_start_time, day_end_time)],
+                                            transport_mode, pace, time_limit_ms)
+            if routes is not None:
+                return self._schedule_route([day_pois[k] for k in routes[0]], start_location,
+                                            start_city, day_start_time, transport_mode)
+            logger.info("OR-Tools found no route within the time limit, falling back to greedy")
+
         schedule, current_time, current_location = [], day_start_time, start_location
         remaining_pois = day_pois.copy()
-        start_station_id = train_data.find_station_by_city(start_city).id if train_data.find_station_by_city(start_city) else None
+        data = current_data()
+        start_station = data.train_data.find_station_by_city(start_city)
+        start_station_id = start_station.id if start_station else None
         
         while remaining_pois and current_time < (day_start_time - (day_start_time % 1440) + day_end_time):
             candidates = []
-            for poi in remaining_pois:
-                end_station_id_safe = poi.nearest_station_id if (poi.nearest_station_id and poi.nearest_station_id in train_data.stations) else start_station_id
-                journey = calculate_journey_details(
-                    current_location, (poi.lat, poi.lon), start_station_id, 
-                    end_station_id_safe, current_time, poi.name, transport_mode
-                )
-                
-                start_visit_time = max(journey["arrival_time"], current_time - (current_time % 1440) + poi.open_time)
-                end_visit_time = start_visit_time + poi.duration
-
-                if end_visit_time < (current_time - (current_time % 1440) + poi.close_time):
-                    candidates.append({
-                        "poi": poi,
-                        "journey": journey,
-                        "start_time": start_visit_time,
-                        "end_time": end_visit_time
-                    })
+            direct_distances = data.travel_matrix.distances_from(current_location, remaining_pois).tolist()
+            for poi, direct_distance in zip(remaining_pois, direct_distances):
+                visit = self._plan_visit(poi, current_location, current_time, start_station_id,
+                                         transport_mode, direct_distance)
+                if visit:
+                    candidates.append(visit)
             
             if not candidates:
                 break
             
             best = min(candidates, key=lambda c: c["journey"]["total_time"])
             
-            schedule.append({
-                "poi": best["poi"],
-                "arrival_time": minutes_to_time(best["journey"]["arrival_time"] % 1440),
-                "start_time": minutes_to_time(best["start_time"] % 1440),
-                "end_time": minutes_to_time(best["end_time"] % 1440),
-                "visit_cost": best["poi"].cost,
-                "travel_cost": best["journey"]["total_cost"],
-                "travel_time": best["journey"]["total_time"],
-                "travel_details": best["journey"]["details"]
-            })
+            schedule.append(self._schedule_item(best))
             current_time = best["end_time"]
             current_location = (best["poi"].lat, best["poi"].lon)
             remaining_pois = [p for p in remaining_pois if p.id != best["poi"].id]
             
         return schedule, current_location
 
-    def generate_itinerary(self, preferences: Dict) -> TripPlan:
-        try:
-            home_city = preferences.get("home_city", "Mumbai")
-            base_location = preferences.get("base_location", None)
-            dest_city = preferences.get("destination_city", "Ranchi")
-            start_date = datetime.datetime.strptime(preferences.get('start_date', datetime.date.today().isoformat()), '%Y-%m-%d').date()
-            num_days_total = preferences.get("num_days", 7)
-            transport_mode = preferences.get('transport_mode', 'car')
-            default_start_minutes = 8 * 60
-            first_day_start_minutes = default_start_minutes
-            if transport_mode == "train":
-                home_station = train_data.find_station_by_city(home_city)
-                dest_station = train_data.find_station_by_city(dest_city)
-                if home_station and dest_station:
-                    route = (home_station.id, dest_station.id)
-                    if route in train_data.trains_by_route and train_data.trains_by_route[route]:
-                        earliest_dep = min(t["depart_mins"] for t in train_data.trains_by_route[route])
-                        # If the earliest train leaves before the default 08:00, start the day earlier
-                        if earliest_dep < default_start_minutes:
-                            first_day_start_minutes = earliest_dep
-            # Determine starting coordinates
-            if base_location:
-                try:
-                    lat, lon = map(float, base_location)
-                    start_location = (lat, lon)
-                    home_station_id = None  # No station if custom coordinates provided
-                except (ValueError, TypeError):
-                    logger.warning("Invalid base_location, falling back to home_city")
-                    home_station = train_data.find_station_by_city(home_city)
-                    start_location = (home_station.lat, home_station.lon) if home_station else config.DEFAULT_BASE_LOCATION
-                    home_station_id = home_station.id if home_station else None
-            else:
+    def _schedule_route(self, route: List[POI], start_location: Tuple[float, float], start_city: str,
+                        day_start_time: int, transport_mode: str) -> Tuple[List[Dict], Tuple[float, float]]:
+        # Replay a solver-chosen order through the real journey model, skipping stops that no longer fit
+        schedule, current_time, current_location = [], day_start_time, start_location
+        start_station = current_data().train_data.find_station_by_city(start_city)
+        start_station_id = start_station.id if start_station else None
+        for poi in route:
+            visit = self._plan_visit(poi, current_location, current_time, start_station_id, transport_mode)
+            if not visit:
+                continue
+            schedule.append(self._schedule_item(visit))
+            current_time = visit["end_time"]
+            current_location = (poi.lat, poi.lon)
+        return schedule, current_location
+
+    def plan_city_days(self, pois: List[POI], base_location: Tuple[float, float], city: str,
+                       first_day_number: int, max_days: int, transport_mode: str,
+                       solver: str = "greedy", pace: str = "moderate",
+                       time_limit_ms: Optional[int] = None
+                       ) -> List[Tuple[List[Dict], Tuple[float, float], Tuple[float, float]]]:
+        """Assign a city's POIs to all of its days in one pass; returns each day's schedule
+        with the locations it starts and ends at.
+
+        The greedy solver clusters POIs into capacity-balanced day groups and routes each group,
+        starting each day where the previous one ended; the OR-Tools solver treats each day as
+        one vehicle of a single VRPTW starting from `base_location`.
+        """
+        if not pois or max_days <= 0:
+            return []
+        pace_config = config.PACE_CONFIGS.get(pace, config.PACE_CONFIGS["moderate"])
+        day_minutes = pace_config["daily_hours"] * 60
+        visit_minutes = sum(poi.duration for poi in pois)
+        num_days = max(1, min(max_days, math.ceil(visit_minutes / day_minutes)))
+
+        def day_start_time(d):
+            return (first_day_number - 1 + d) * 1440 + 8 * 60
+
+        if solver == "ortools":
+            # One vehicle per available day; the per-day fixed cost keeps the stay short
+            # while staying below the drop penalty, so an extra day beats skipping a POI
+            num_vehicles = min(max_days, len(pois))
+            routes = self._solve_day_routes(pois, base_location,
+                                            [(day_start_time(d), 22 * 60) for d in range(num_vehicles)],
+                                            transport_mode, pace, time_limit_ms, day_cost=2 * 1440)
+            if routes is not None:
+                routes = [route for route in routes if route]
+                day_plans = []
+                for d, route in enumerate(routes):
+                    schedule, end_location = self._schedule_route([pois[k] for k in route], base_location, city,
+                                                                  day_start_time(d), transport_mode)
+                    day_plans.append((schedule, base_location, end_location))
+                return day_plans
+            logger.info("OR-Tools found no multi-day plan within the time limit, falling back to clustering")
+
+        day_plans, carry_over, location = [], [], base_location
+        clusters = self._cluster_pois(pois, base_location, num_days, max(day_minutes, visit_minutes / num_days))
+        while (clusters or carry_over) and len(day_plans) < max_days:
+            candidates = carry_over + (clusters.pop(0) if clusters else [])
+            schedule, end_location = self.optimize_day_route(
+                candidates, location, city, day_start_time(len(day_plans)), 22 * 60, transport_mode
+            )
+            scheduled_ids = {item["poi"].id for item in schedule}
+            carry_over = [poi for poi in candidates if poi.id not in scheduled_ids]
+            if schedule:
+                day_plans.append((schedule, location, end_location))
+                location = end_location
+            elif not clusters:
+                break
+        return day_plans
+
+    @staticmethod
+    def _cluster_pois(pois: List[POI], base_location: Tuple[float, float], k: int,
+                      capacity: float, max_iter: int = 20) -> List[List[POI]]:
+        # k-means on locally projected coordinates where each cluster holds at most
+        # `capacity` minutes of visits; clusters are chained nearest-neighbour from base
+        if k <= 1:
+            return [list(pois)]
+        scale = math.cos(math.radians(base_location[0]))
+        points = np.array([(poi.lat, poi.lon * scale) for poi in pois])
+        weights = np.array([poi.duration for poi in pois], dtype=float)
+        base = np.array([base_location[0], base_location[1] * scale])
+
+        # Farthest-point seeding from the POI closest to base keeps the result deterministic
+        seeds = [int(np.argmin(((points - base) ** 2).sum(axis=1)))]
+        while len(seeds) < min(k, len(pois)):
+            gaps = ((points[:, None, :] - points[seeds][None, :, :]) ** 2).sum(axis=2).min(axis=1)
+            seeds.append(int(np.argmax(gaps)))
+        centroids = points[seeds]
+
+        labels = np.full(len(pois), -1)
+        for _ in range(max_iter):
+            dist = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            ranked = np.sort(dist, axis=1)
+            regret = ranked[:, 1] - ranked[:, 0] if dist.shape[1] > 1 else ranked[:, 0]
+            load = np.zeros(len(centroids))
+            new_labels = np.empty(len(pois), dtype=int)
+            for i in np.argsort(-regret, kind="stable"):
+                choices = np.argsort(dist[i], kind="stable")
+                fitting = [c for c in choices if load[c] + weights[i] <= capacity]
+                c = fitting[0] if fitting else choices[0]
+                new_labels[i] = c
+                load[c] += weights[i]
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            for c in range(len(centroids)):
+                if (labels == c).any():
+                    centroids[c] = points[labels == c].mean(axis=0)
+
+        order, position, unvisited = [], base, list(range(len(centroids)))
+        while unvisited:
+            c = min(unvisited, key=lambda c: ((centroids[c] - position) ** 2).sum())
+            order.append(c)
+            unvisited.remove(c)
+            position = centroids[c]
+        clusters = [[poi for poi, label in zip(pois, labels) if label == c] for c in order]
+        return [cluster for cluster in clusters if cluster]
+
+    def _solve_day_routes(self, pois: List[POI], start_location: Tuple[float, float],
+                          day_windows: List[Tuple[int, int]], transport_mode: str, pace: str,
+                          time_limit_ms: Optional[int] = None, day_cost: int = 0) -> Optional[List[List[int]]]:
+        """VRPTW over `pois` with one vehicle per (day_start_time, day_end_time) window.
+
+        Returns, per day, the visiting order as indices into `pois`, or None when
+        OR-Tools finds no solution within the time limit.
+        """
+        pace_config = config.PACE_CONFIGS.get(pace, config.PACE_CONFIGS["moderate"])
+        # Visits are modelled in minutes-of-day, so every vehicle (day) shares one clock
+        windows = []
+        for day_start_time, day_end_time in day_windows:
+            day_start = day_start_time % 1440
+            day_end = min(day_end_time, day_start + (pace_config["daily_hours"] + pace_config["max_travel_hours"]) * 60)
+            windows.append((day_start, max(day_start, day_end)))
+
+        road_mode = transport_mode if transport_mode != "train" else "car"
+        travel = current_data().travel_matrix.time_matrix(start_location, pois, road_mode)
+        n = len(pois)
+        end_node = n + 1
+        service = [0] + [poi.duration for poi in pois] + [0]
+
+        manager = pywrapcp.RoutingIndexManager(n + 2, len(windows), [0] * len(windows), [end_node] * len(windows))
+        routing = pywrapcp.RoutingModel(manager)
+
+        def travel_callback(from_index, to_index):
+            i, j = manager.IndexToNode(from_index), manager.IndexToNode(to_index)
+            return 0 if j == end_node or i == end_node else int(travel[i, j])
+
+        def time_callback(from_index, to_index):
+            return service[manager.IndexToNode(from_index)] + travel_callback(from_index, to_index)
+
+        travel_index = routing.RegisterTransitCallback(travel_callback)
+        time_index = routing.RegisterTransitCallback(time_callback)
+        routing.SetArcCostEvaluatorOfAllVehicles(travel_index)
+        routing.SetFixedCostOfAllVehicles(day_cost)
+
+        horizon = 1440
+        routing.AddDimension(time_index, horizon, horizon, False, "Time")
+        time_dimension = routing.GetDimensionOrDie("Time")
+        routing.AddDimension(travel_index, 0, pace_config["max_travel_hours"] * 60, True, "Travel")
+
+        for vehicle, (day_start, day_end) in enumerate(windows):
+            time_dimension.CumulVar(routing.Start(vehicle)).SetRange(day_start, day_start)
+            time_dimension.CumulVar(routing.End(vehicle)).SetRange(day_start, day_end)
+
+        # Dropping a POI always costs more than any detour; earlier (higher scored) POIs cost more to drop
+        for k, poi in enumerate(pois):
+            index = manager.NodeToIndex(k + 1)
+            latest_start = poi.close_time - poi.duration - 1
+            if latest_start < poi.open_time:
+                routing.AddDisjunction([index], 0)
+                routing.solver().Add(routing.ActiveVar(index) == 0)
+                continue
+            time_dimension.CumulVar(index).SetRange(poi.open_time, latest_start)
+            routing.AddDisjunction([index], 10 * horizon + (n - k))
+
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+        search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+        search_parameters.time_limit.FromMilliseconds(time_limit_ms or config.ORTOOLS_TIME_LIMIT_MS)
+
+        solution = routing.SolveWithParameters(search_parameters)
+        if solution is None:
+            return None
+
+        routes = []
+        for vehicle in range(len(windows)):
+            route, index = [], solution.Value(routing.NextVar(routing.Start(vehicle)))
+            while not routing.IsEnd(index):
+                route.append(manager.IndexToNode(index) - 1)
+                index = solution.Value(routing.NextVar(index))
+            routes.append(route)
+        return routes
+
+    def generate_itinerary(self, preferences: Dict, progress: Optional[Callable[[Dict], None]] = None) -> TripPlan:
+        """`progress`, when given, is called with a dict after candidate selection and as
+        each city and day is planned."""
+        with pinned_data():
+            try:
+                days = self.iter_itinerary(preferences, progress)
+                while True:
+                    next(days)
+            except StopIteration as finished:
+                return finished.value
+            except Exception as e:
+                logger.error(f"Error generating itinerary: {e}", exc_info=True)
+                return self._create_empty_trip_plan(preferences)
+
+    def iter_itinerary(self, preferences: Dict, progress: Optional[Callable[[Dict], None]] = None):
+        """Generator form of generate_itinerary: yields each ItineraryDay as soon as it is
+        scheduled and returns the TripPlan. Budget enforcement runs last and may still
+        trim days that were already yielded. Errors propagate to the caller. The data
+        snapshot current at the first step is used throughout."""
+        with pinned_data() as data:
+            return (yield from self._iter_itinerary(preferences, progress, data.train_data, data.poi_storage))
+
+    def _iter_itinerary(self, preferences: Dict, progress: Optional[Callable[[Dict], None]],
+                        train_data: TrainDataStorage, poi_storage: POIStorage):
+        report = progress or (lambda update: None)
+        home_city = preferences.get("home_city", "Mumbai")
+        base_location = preferences.get("base_location", None)
+        dest_city = preferences.get("destination_city", "Ranchi")
+        start_date = datetime.datetime.strptime(preferences.get('start_date', datetime.date.today().isoformat()), '%Y-%m-%d').date()
+        num_days_total = preferences.get("num_days", 7)
+        transport_mode = preferences.get('transport_mode', 'car')
+        solver = preferences.get('solver', config.DEFAULT_SOLVER)
+        planner = preferences.get('planner', config.DEFAULT_PLANNER)
+        default_start_minutes = 8 * 60
+        first_day_start_minutes = default_start_minutes
+        if transport_mode == "train":
+            home_station = train_data.find_station_by_city(home_city)
+            dest_station = train_data.find_station_by_city(dest_city)
+            if home_station and dest_station:
+                earliest_dep = train_data.earliest_departure(home_station.id, dest_station.id)
+                # If the earliest train leaves before the default 08:00, start the day earlier
+                if earliest_dep is not None and earliest_dep < default_start_minutes:
+                    first_day_start_minutes = earliest_dep
+        # Determine starting coordinates
+        if base_location:
+            try:
+                lat, lon = map(float, base_location)
+                start_location = (lat, lon)
+                home_station = train_data.nearest_station(lat, lon, config.MAX_STATION_DISTANCE_KM)
+                home_station_id = home_station.id if home_station else None
+            except (ValueError, TypeError):
+                logger.warning("Invalid base_location, falling back to home_city")
                 home_station = train_data.find_station_by_city(home_city)
                 start_location = (home_station.lat, home_station.lon) if home_station else config.DEFAULT_BASE_LOCATION
                 home_station_id = home_station.id if home_station else None
+        else:
+            home_station = train_data.find_station_by_city(home_city)
+            start_location = (home_station.lat, home_station.lon) if home_station else config.DEFAULT_BASE_LOCATION
+            home_station_id = home_station.id if home_station else None
 
-            all_pois = poi_storage.get_all_pois()
-            selected_pois = self.filter_and_score_pois(all_pois, preferences, start_location)
+        dest_station = train_data.find_station_by_city(dest_city)
+        if not dest_station:
+            dest_station_location = poi_storage.city_location(dest_city) or start_location
+            dest_station_id = None
+        else:
+            dest_station_location = (dest_station.lat, dest_station.lon)
+            dest_station_id = dest_station.id
+
+        journey_to_dest = calculate_journey_details(
+            start_location,
+            dest_station_location,
+            home_station_id,
+            dest_station_id,
+            first_day_start_minutes,
+            dest_city,
+            transport_mode
+        )
 
+        # Budget is a constraint on the candidates: what reaching the destination leaves
+        # is spent on the best-value POIs the trip has room for
+        budget = preferences.get('budget', config.DEFAULT_BUDGET)
+        rows, scores = self.ranked_candidates(poi_storage, preferences, start_location,
+                                              self.candidate_limit(preferences, poi_storage))
+        ranked_pois = selected_pois = poi_storage.views(rows)
+        capacity = num_days_total * config.PACE_CONFIGS[preferences.get('pace', 'moderate')]['pois_per_day']
+        num_travel_days = (journey_to_dest["total_time"] // 1440) + 1
+        # The city tour decides which cities fit the days left; candidates of the cities
+        # it leaves out make way for more in the ones it keeps
+        excluded = set()
+        while True:
+            chosen = self.select_candidates(selected_pois, scores, budget - journey_to_dest["total_cost"], capacity,
+                                            dest_city, transport_mode, excluded)
+            values = {selected_pois[k].id: scores[k] for k in chosen.tolist()}
             pois_by_city = defaultdict(list)
-            for poi in selected_pois:
-                pois_by_city[poi.city].append(poi)
-            
-            cities_to_visit = list(pois_by_city.keys())
-            if dest_city in cities_to_visit:
-                cities_to_visit.remove(dest_city)
-            city_sequence = [dest_city] + cities_to_visit
-            
-            trip_days, day_number, current_date, total_cost = [], 1, start_date, 0.0
-            
-            dest_station = train_data.find_station_by_city(dest_city)
-            if not dest_station:
-                dest_station_location = next(((poi.lat, poi.lon) for poi in all_pois if poi.city == dest_city), start_location)
-                dest_station_id = None
+            for k in chosen.tolist():
+                pois_by_city[selected_pois[k].city].append(selected_pois[k])
+            city_sequence = self.plan_city_tour(dest_city, pois_by_city, values, num_days_total - num_travel_days,
+                                                transport_mode, preferences.get('pace', 'moderate'))
+            dropped = set(pois_by_city) - set(city_sequence)
+            if not dropped:
+                break
+            excluded |= dropped
+        selected_pois = [selected_pois[k] for k in chosen.tolist()]
+        report({"stage": "candidates", "candidates": len(selected_pois), "cities": len(city_sequence),
+                "day": 0, "num_days": num_days_total})
+        
+        trip_days, day_number, current_date, total_cost = [], 1, start_date, 0.0
+        replayable = []  # what each later day was planned from, for budget repair
+
+        total_journey_time = journey_to_dest["total_time"]
+        
+        for i in range(num_travel_days):
+            if day_number > num_days_total:
+                break
+            action_details = {}
+            if i == 0:
+                action_details = {"action": f"Departure from {'custom location' if base_location else home_city}", 
+                                "travel_details": journey_to_dest["details"]}
+            elif i == num_travel_days - 1:
+                action_details = {"action": f"Arrival in {dest_city}", 
+                                "details": f"Complete journey and arrive in {dest_city}. Check into your accommodation."}
             else:
-                dest_station_location = (dest_station.lat, dest_station.lon)
-                dest_station_id = dest_station.id
-
-            journey_to_dest = calculate_journey_details(
-                start_location,
-                dest_station_location,
-                home_station_id,
-                dest_station_id,
-                first_day_start_minutes,
-                dest_city,
-                transport_mode
-            )
-            
-            total_journey_time = journey_to_dest["total_time"]
-            num_travel_days = (total_journey_time // 1440) + 1
-            
-            for i in range(num_travel_days):
-                if day_number > num_days_total:
-                    break
-                action_details = {}
-                if i == 0:
-                    action_details = {"action": f"Departure from {'custom location' if base_location else home_city}", 
-                                    "travel_details": journey_to_dest["details"]}
-                elif i == num_travel_days - 1:
-                    action_details = {"action": f"Arrival in {dest_city}", 
-                                    "details": f"Complete journey and arrive in {dest_city}. Check into your accommodation."}
-                else:
-                    action_details = {"action": "In Transit"}
+                action_details = {"action": "In Transit"}
 
-                daily_travel_time = min(total_journey_time, 1440)
-                total_journey_time -= daily_travel_time
-                trip_days.append(ItineraryDay(
-                    day_number=day_number,
-                    date=current_date.isoformat(),
-                    pois=[action_details],
-                    total_cost=(journey_to_dest["total_cost"] if i == 0 else 0),
-                    total_travel_time=daily_travel_time,
-                    total_visit_time=0,
-                    overnight_location=dest_city if i == num_travel_days - 1 else "In Transit"
+            daily_travel_time = min(total_journey_time, 1440)
+            total_journey_time -= daily_travel_time
+            trip_days.append(ItineraryDay(
+                day_number=day_number,
+                date=current_date.isoformat(),
+                pois=[action_details],
+                total_cost=(journey_to_dest["total_cost"] if i == 0 else 0),
+                total_travel_time=daily_travel_time,
+                total_visit_time=0,
+                overnight_location=dest_city if i == num_travel_days - 1 else "In Transit"
+            ))
+            yield trip_days[-1]
+            day_number += 1
+            current_date += datetime.timedelta(days=1)
+        
+        total_cost += journey_to_dest["total_cost"]
+        current_location = dest_station_location
+        
+        for i, city in enumerate(city_sequence):
+            city_pois_remaining = pois_by_city[city]
+            report({"stage": "city", "city": city, "city_index": i + 1, "cities": len(city_sequence),
+                    "day": day_number - 1, "num_days": num_days_total})
+
+            if planner == "joint":
+                joint_days = iter(self.plan_city_days(
+                    city_pois_remaining, current_location, city, day_number,
+                    num_days_total - day_number + 1, transport_mode,
+                    solver=solver, pace=preferences.get('pace', 'moderate')
                 ))
-                day_number += 1
-                current_date += datetime.timedelta(days=1)
-            
-            total_cost += journey_to_dest["total_cost"]
-            current_location = dest_station_location
-            
-            for i, city in enumerate(city_sequence):
-                city_pois_remaining = pois_by_city[city]
-                if not city_pois_remaining:
-                    continue
 
-                while city_pois_remaining:
-                    if day_number > num_days_total:
-                        break
-                    
+            while city_pois_remaining:
+                if day_number > num_days_total:
+                    break
+                
+                if planner == "joint":
+                    daily_schedule, day_start_location, end_location = next(joint_days, ([], current_location, current_location))
+                else:
+                    day_start_location = current_location
                     day_start_time = (day_number - 1) * 1440 + 8 * 60
                     daily_schedule, end_location = self.optimize_day_route(
                         city_pois_remaining,
@@ -645,118 +2656,299 @@ class TripPlanningEngine:
                         city,
                         day_start_time,
                         22 * 60,
-                        transport_mode
+                        transport_mode,
+                        solver=solver,
+                        pace=preferences.get('pace', 'moderate')
                     )
-                    
-                    if not daily_schedule:
-                        break
-
-                    scheduled_poi_ids = {item['poi'].id for item in daily_schedule}
-                    city_pois_remaining = [p for p in city_pois_remaining if p.id not in scheduled_poi_ids]
-                    
-                    current_location = end_location
-                    day_cost = sum(item['visit_cost'] + item['travel_cost'] for item in daily_schedule)
-                    total_cost += day_cost
-
-                    serializable_schedule = []
-                    for item in daily_schedule:
-                        item_copy = item.copy()
-                        item_copy['poi'] = asdict(item_copy['poi'])
-                        serializable_schedule.append(item_copy)
-                    
-                    trip_days.append(ItineraryDay(
-                        day_number=day_number,
-                        date=current_date.isoformat(),
-                        pois=serializable_schedule,
-                        total_cost=day_cost,
-                        total_travel_time=sum(item['travel_time'] for item in daily_schedule),
-                        total_visit_time=sum(item['poi']['duration'] for item in serializable_schedule),
-                        overnight_location=city
-                    ))
-                    day_number += 1
-                    current_date += datetime.timedelta(days=1)
                 
-                if day_number > num_days_total:
+                if not daily_schedule:
                     break
 
-                if i < len(city_sequence) - 1:
-                    next_city = city_sequence[i+1]
-                    if not pois_by_city[next_city]:
-                        continue
+                scheduled_poi_ids = {item['poi'].id for item in daily_schedule}
+                city_pois_remaining = [p for p in city_pois_remaining if p.id not in scheduled_poi_ids]
+                
+                current_location = end_location
+                day = ItineraryDay(day_number=day_number, date=current_date.isoformat(), pois=[], total_cost=0.0,
+                                   total_travel_time=0, total_visit_time=0, overnight_location=city)
+                self._fill_day(day, daily_schedule)
+                total_cost += day.total_cost
+                trip_days.append(day)
+                replayable.append({"day": day, "route": [item['poi'] for item in daily_schedule], "city": city,
+                                   "start": day_start_location, "start_time": (day_number - 1) * 1440 + 8 * 60,
+                                   "end": end_location})
+                yield day
+                report({"stage": "day", "city": city, "city_index": i + 1, "cities": len(city_sequence),
+                        "day": day_number, "num_days": num_days_total})
+                day_number += 1
+                current_date += datetime.timedelta(days=1)
+            
+            if day_number > num_days_total:
+                break
+
+            # Days per city were estimated; re-plan the rest of the tour with the days really left
+            # (in place, so the loop carries on over the new tail)
+            city_sequence[i + 1:] = self.plan_city_tour(
+                city, {other: pois_by_city[other] for other in city_sequence[i + 1:]}, values,
+                num_days_total - day_number + 1, transport_mode, preferences.get('pace', 'moderate'))[1:]
+            if i < len(city_sequence) - 1:
+                next_city = city_sequence[i+1]
+
+                end_st_location, start_st_id, end_st_id = self._transfer_ends(city, next_city, start_location)
+                intercity_journey = calculate_journey_details(
+                    current_location,
+                    end_st_location,
+                    start_st_id,
+                    end_st_id,
+                    (day_number-1)*1440 + 8 * 60,
+                    next_city,
+                    transport_mode
+                )
+                total_cost += intercity_journey["total_cost"]
+                trip_days.append(ItineraryDay(
+                    day_number=day_number,
+                    date=current_date.isoformat(),
+                    pois=[{
+                        "action": f"Travel from {city} to {next_city}",
+                        "travel_details": intercity_journey["details"]
+                    }],
+                    total_cost=intercity_journey["total_cost"],
+                    total_travel_time=intercity_journey["total_time"],
+                    total_visit_time=0,
+                    overnight_location=next_city
+                ))
+                replayable.append({"day": trip_days[-1], "start": current_location, "end": end_st_location,
+                                   "transfer": (end_st_location, start_st_id, end_st_id,
+                                                (day_number - 1) * 1440 + 8 * 60, next_city)})
+                yield trip_days[-1]
+                current_location = end_st_location
+                day_number += 1
+                current_date += datetime.timedelta(days=1)
+        
+        # Days the tour leaves over go to the candidates it did not get to in the city it ends in,
+        # as far as the budget allows; a day that still has nothing says why
+        city = trip_days[-1].overnight_location if trip_days else dest_city
+        scheduled = {poi.id for entry in replayable for poi in entry.get("route", [])}
+        unvisited = [poi for poi in ranked_pois if poi.city == city and poi.id not in scheduled]
+        extra, spare = [], budget - total_cost
+        for poi, cost in zip(unvisited, self.estimate_visit_costs(unvisited).tolist() if unvisited else []):
+            if cost <= spare:
+                extra.append(poi)
+                spare -= cost
+        while day_number <= num_days_total:
+            day_start_location = current_location
+            daily_schedule, end_location = self.optimize_day_route(
+                extra, current_location, city, (day_number - 1) * 1440 + 8 * 60, 22 * 60, transport_mode,
+                solver=solver, pace=preferences.get('pace', 'moderate')) if extra else ([], current_location)
+            scheduled_poi_ids = {item['poi'].id for item in daily_schedule}
+            extra = [p for p in extra if p.id not in scheduled_poi_ids]
+            unvisited = [p for p in unvisited if p.id not in scheduled_poi_ids]
+            if not unvisited:
+                reason = (f"Every place in {city} that suits this trip is already visited, "
+                          "and no other city fits the days left")
+            elif not extra:
+                reason = f"What is left of the budget does not cover another visit in {city}"
+            else:
+                reason = f"No other place in {city} is open long enough to visit today"
+            current_location = end_location
+            day = ItineraryDay(day_number=day_number, date=current_date.isoformat(), pois=[], total_cost=0.0,
+                               total_travel_time=0, total_visit_time=0, overnight_location=city)
+            self._fill_day(day, daily_schedule, reason)
+            total_cost += day.total_cost
+            trip_days.append(day)
+            replayable.append({"day": day, "route": [item['poi'] for item in daily_schedule], "city": city,
+                               "start": day_start_location, "start_time": (day_number - 1) * 1440 + 8 * 60,
+                               "end": end_location, "free": reason})
+            yield day
+            day_number += 1
+            current_date += datetime.timedelta(days=1)
+
+        # Selection worked from estimates; recover any overspend without breaking legs
+        if total_cost > budget:
+            planned = [poi for entry in replayable for poi in entry.get("route", [])]
+            self._trim_to_budget(replayable, total_cost - budget, values, transport_mode)
+            total_cost = sum(day.total_cost for day in trip_days)
+            kept = {poi.id for entry in replayable for poi in entry.get("route", [])}
+            trimmed = {poi.city for poi in planned if poi.id not in kept}
+            for entry in replayable:
+                if "route" in entry and not entry["route"]:
+                    self._fill_day(entry["day"], [], "Visits here were dropped to keep the trip within budget"
+                                   if entry["city"] in trimmed else entry["free"])
 
-                    start_st = train_data.find_station_by_city(city)
-                    end_st = train_data.find_station_by_city(next_city)
+        scheduled_poi_count = sum(len(day.pois) for day in trip_days if day.pois and 'action' not in day.pois[0])
+        trip_plan = TripPlan(
+            days=trip_days,
+            total_cost=total_cost,
+            total_pois=scheduled_poi_count,
+            user_preferences=preferences,
+            generated_at=datetime.datetime.now().isoformat()
+        )
+        logger.info(f"Generated itinerary with {scheduled_poi_count} POIs over {num_days_total} days")
+        return trip_plan
 
-                    if not start_st or not end_st:
-                        start_st_location = current_location
-                        end_st_location = next(((poi.lat, poi.lon) for poi in all_pois if poi.city == next_city), start_location)
-                        start_st_id, end_st_id = None, None
-                    else:
-                        start_st_location = (start_st.lat, start_st.lon)
-                        end_st_location = (end_st.lat, end_st.lon)
-                        start_st_id, end_st_id = start_st.id, end_st.id
+    @staticmethod
+    def _transfer_ends(city: str, next_city: str, fallback: Tuple[float, float]
+                       ) -> Tuple[Tuple[float, float], Optional[str], Optional[str]]:
+        """Where the travel day from `city` to `next_city` arrives, and the stations it runs
+        between; without a station at both ends it is a road trip into `next_city`."""
+        data = current_data()
+        start_st = data.train_data.find_station_by_city(city)
+        end_st = data.train_data.find_station_by_city(next_city)
+        if not start_st or not end_st:
+            return data.poi_storage.city_location(next_city) or fallback, None, None
+        return (end_st.lat, end_st.lon), start_st.id, end_st.id
 
-                    intercity_journey = calculate_journey_details(
-                        current_location,
-                        end_st_location,
-                        start_st_id,
-                        end_st_id,
-                        (day_number-1)*1440 + 8 * 60,
-                        next_city,
-                        transport_mode
-                    )
-                    total_cost += intercity_journey["total_cost"]
-                    trip_days.append(ItineraryDay(
-                        day_number=day_number,
-                        date=current_date.isoformat(),
-                        pois=[{
-                            "action": f"Travel from {city} to {next_city}",
-                            "travel_details": intercity_journey["details"]
-                        }],
-                        total_cost=intercity_journey["total_cost"],
-                        total_travel_time=intercity_journey["total_time"],
-                        total_visit_time=0,
-                        overnight_location=next_city
-                    ))
-                    current_location = end_st_location
-                    day_number += 1
-                    current_date += datetime.timedelta(days=1)
-            
-            # Enforce budget constraints
-            budget = preferences.get('budget', config.DEFAULT_BUDGET)
-            if total_cost > budget:
-                all_items = []
-                for day in trip_days:
-                    for item in day.pois:
-                        if item.get('poi'):
-                            all_items.append((item['visit_cost'] + item['travel_cost'], item, day))
-                all_items.sort(key=lambda x: x[0], reverse=True)
-                excess = total_cost - budget
-                removed_cost = 0
-                for cost, item, day in all_items:
-                    if removed_cost >= excess:
-                        break
-                    day.pois = [p for p in day.pois if p != item]
-                    removed_cost += cost
-                    day.total_cost -= cost
-                    day.total_visit_time -= item['poi']['duration'] if 'duration' in item['poi'] else 0
-                    day.total_travel_time -= item.get('travel_time', 0)
-                total_cost = sum(day.total_cost for day in trip_days)
-
-            scheduled_poi_count = sum(len(day.pois) for day in trip_days if day.pois and 'action' not in day.pois[0])
-            trip_plan = TripPlan(
-                days=trip_days,
-                total_cost=total_cost,
-                total_pois=scheduled_poi_count,
-                user_preferences=preferences,
-                generated_at=datetime.datetime.now().isoformat()
-            )
-            logger.info(f"Generated itinerary with {scheduled_poi_count} POIs over {num_days_total} days")
-            return trip_plan
+    @staticmethod
+    def _fill_day(day: ItineraryDay, schedule: List[Dict], empty_reason: str = "Nothing is left to visit on this day"):
+        """Write `schedule` into `day`; an empty one becomes a free day saying why it is empty."""
+        day.pois = ([dict(item, poi=poi_dict(item['poi'])) for item in schedule] or
+                    [{"action": f"Free day in {day.overnight_location}", "details": empty_reason}])
+        day.total_cost = sum(item['visit_cost'] + item['travel_cost'] for item in schedule)
+        day.total_travel_time = sum(item['travel_time'] for item in schedule)
+        day.total_visit_time = sum(item['poi'].duration for item in schedule)
 
-        except Exception as e:
-            logger.error(f"Error generating itinerary: {e}", exc_info=True)
-            return self._create_empty_trip_plan(preferences)
+    def _replay_days(self, entries: List[Dict], k: int, transport_mode: str) -> float:
+        """Re-schedule day `k` from its recorded start and its current route. Later days
+        that started where it ended are replayed from its new end. Returns the cost saved."""
+        saved = 0.0
+        while k < len(entries):
+            entry, day = entries[k], entries[k]["day"]
+            before = day.total_cost
+            if "route" in entry:
+                schedule, end = self._schedule_route(entry["route"], entry["start"], entry["city"],
+                                                     entry["start_time"], transport_mode)
+                self._fill_day(day, schedule)
+                entry["route"] = [item["poi"] for item in schedule]
+            else:
+                journey = calculate_journey_details(entry["start"], *entry["transfer"], transport_mode)
+                day.pois[0]["travel_details"] = journey["details"]
+                day.total_cost, day.total_travel_time = journey["total_cost"], journey["total_time"]
+                end = entry["end"]
+            saved += before - day.total_cost
+            old_end, entry["end"] = entry["end"], end
+            if end == old_end or k + 1 == len(entries) or entries[k + 1]["start"] != old_end:
+                break
+            entries[k + 1]["start"] = end
+            k += 1
+        return saved
+
+    def _trim_to_budget(self, entries: List[Dict], overspend: float, values: Dict[str, float], transport_mode: str):
+        """Drop the scheduled POIs worth least per rupee until `overspend` is recovered,
+        replaying only the days a removal affects so every travel leg stays valid."""
+        while overspend > 0:
+            options = [(values.get(poi.id, 0.0) / max(item["visit_cost"] + item["travel_cost"], 1e-9), k, poi.id)
+                       for k, entry in enumerate(entries) if "route" in entry
+                       for poi, item in zip(entry["route"], entry["day"].pois)]
+            if not options:
+                break
+            _, k, poi_id = min(options)
+            entries[k]["route"] = [poi for poi in entries[k]["route"] if poi.id != poi_id]
+            overspend -= self._replay_days(entries, k, transport_mode)
+
+    def _replayable_days(self, days: List[ItineraryDay], preferences: Dict) -> List[Dict]:
+        """The replay entries `_iter_itinerary` would have kept for `days`, rebuilt from a
+        finished plan: where each day after arrival starts, and what it was planned from."""
+        data = current_data()
+        dest_city = preferences.get('destination_city', 'Ranchi')
+        dest_station = data.train_data.find_station_by_city(dest_city)
+        location = ((dest_station.lat, dest_station.lon) if dest_station else
+                    data.poi_storage.city_location(dest_city) or config.DEFAULT_BASE_LOCATION)
+        city, entries = dest_city, []
+        for day in days:
+            start_time = (day.day_number - 1) * 1440 + 8 * 60
+            action = day.pois[0].get('action', '') if day.pois else ''
+            if action.startswith('Travel from'):
+                next_city = day.overnight_location
+                end, start_id, end_id = self._transfer_ends(city, next_city, location)
+                entries.append({"day": day, "start": location, "end": end,
+                                "transfer": (end, start_id, end_id, start_time, next_city)})
+                city, location = next_city, end
+            elif (not action or action.startswith('Free day')) and day.overnight_location == city:  # a sightseeing day
+                route = [data.poi_storage.get_poi(item['poi']['id']) for item in day.pois if 'poi' in item]
+                if None in route:
+                    raise ValueError(f"Day {day.day_number} visits POIs that are no longer in the catalogue")
+                end = (route[-1].lat, route[-1].lon) if route else location
+                entries.append({"day": day, "route": route, "city": day.overnight_location, "start": location,
+                                "start_time": start_time, "end": end})
+                location = end
+        return entries
+
+    def _reoptimize_day(self, entries: List[Dict], k: int, pois: List[POI], preferences: Dict) -> List[POI]:
+        """Route day `k` afresh over `pois`, then replay the later days whose first leg it
+        moved. Returns the POIs that no longer fit the day."""
+        entry, transport_mode = entries[k], preferences.get('transport_mode', 'car')
+        schedule, end = self.optimize_day_route(pois, entry["start"], entry["city"], entry["start_time"], 22 * 60,
+                                                transport_mode, solver=preferences.get('solver', config.DEFAULT_SOLVER),
+                                                pace=preferences.get('pace', 'moderate'))
+        self._fill_day(entry["day"], schedule)
+        entry["route"] = [item['poi'] for item in schedule]
+        old_end, entry["end"] = entry["end"], end
+        if end != old_end and k + 1 < len(entries) and entries[k + 1]["start"] == old_end:
+            entries[k + 1]["start"] = end
+            self._replay_days(entries, k + 1, transport_mode)
+        kept = {poi.id for poi in entry["route"]}
+        return [poi for poi in pois if poi.id not in kept]
+
+    def replan_itinerary(self, plan: Dict, changes: Dict) -> Tuple[TripPlan, Dict]:
+        """Apply `changes` to a plan returned by generate_itinerary, re-routing only the days
+        they touch (and replaying the legs of the days that follow a moved end).
+
+        `changes` may hold `remove_pois` and `add_pois` (POI ids; additions also join
+        `must_visit`; removals win) and a new `start_date`. An added POI goes to the least
+        busy day in its city that can fit it. Returns the plan and which days changed and which POIs
+        could not be scheduled.
+        """
+        preferences = dict(plan['user_preferences'])
+        days = [ItineraryDay(**{name: day[name] for name in ItineraryDay.__dataclass_fields__}) for day in plan['days']]
+        def signature(day: ItineraryDay) -> Tuple:
+            return (day.date, day.total_cost, day.total_travel_time,
+                    [item['poi']['id'] if 'poi' in item else '' for item in day.pois])
+
+        before = {day.day_number: signature(day) for day in days}
+
+        if changes.get('start_date'):
+            start_date = datetime.datetime.strptime(changes['start_date'], '%Y-%m-%d').date()
+            # Opening hours and timetables repeat daily, so a new start date only moves the calendar
+            for day in days:
+                day.date = (start_date + datetime.timedelta(days=day.day_number - 1)).isoformat()
+            preferences['start_date'] = start_date.isoformat()
+
+        storage = current_data().poi_storage
+        removed, added = set(changes.get('remove_pois', [])), list(dict.fromkeys(changes.get('add_pois', [])))
+        unknown = [poi_id for poi_id in added if poi_id not in storage]
+        if unknown:
+            raise ValueError(f"Unknown POI ids: {', '.join(unknown)}")
+
+        entries = self._replayable_days(days, preferences) if removed or added else []
+        pending = []  # POIs looking for a day: additions, and any a re-routed day squeezed out
+        for k, entry in enumerate(entries):
+            if "route" in entry and any(poi.id in removed for poi in entry["route"]):
+                pending += self._reoptimize_day(entries, k, [poi for poi in entry["route"] if poi.id not in removed],
+                                                preferences)
+        planned = {poi.id for entry in entries for poi in entry.get("route", [])}
+        pending += [storage.get_poi(poi_id) for poi_id in added if poi_id not in planned and poi_id not in removed]
+        preferences['must_visit'] = [poi_id for poi_id in dict.fromkeys(list(preferences.get('must_visit', [])) + added)
+                                     if poi_id not in removed]
+
+        unscheduled = []
+        for poi in pending:
+            waiting = [poi]
+            city_days = sorted((k for k, entry in enumerate(entries) if "route" in entry and entry["city"] == poi.city),
+                               key=lambda k: entries[k]["day"].total_visit_time + entries[k]["day"].total_travel_time)
+            for k in city_days:
+                waiting = self._reoptimize_day(entries, k, entries[k]["route"] + waiting, preferences)
+                if not waiting:
+                    break
+            unscheduled += waiting
+
+        trip_plan = TripPlan(
+            days=days,
+            total_cost=sum(day.total_cost for day in days),
+            total_pois=sum(len(day.pois) for day in days if day.pois and 'action' not in day.pois[0]),
+            user_preferences=preferences,
+            generated_at=datetime.datetime.now().isoformat()
+        )
+        changed = [day.day_number for day in days if signature(day) != before[day.day_number]]
+        return trip_plan, {"changed_days": changed, "unscheduled": [poi.id for poi in unscheduled]}
 
     def _create_empty_trip_plan(self, preferences: Dict) -> TripPlan:
         num_days = preferences.get('num_days', 5)
@@ -787,35 +2979,809 @@ class TripPlanningEngine:
 # Initialize trip planning engine
 trip_planner = TripPlanningEngine()
 
+# --------------------
+# Itinerary Cache
+# --------------------
+class ItineraryCache:
+    """TTL + LRU cache of serialized itineraries keyed on normalized preferences.
+
+    Plans do not depend on the start date beyond their day labels, so the key leaves it
+    out and entries store day offsets that are re-dated on every hit. The key includes
+    the data version (so add_poi or a reload invalidates it; requests still running on
+    older data bypass the cache) and the current month, which seasonality scoring depends on. With a `path`, a SQLite
+    file backs the in-process LRU so worker processes serving the same data share hits;
+    the file keeps the newest `max_entries` plans.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._data_version = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS itineraries (key TEXT PRIMARY KEY, stored REAL, plan TEXT)")
+            self._db.commit()
+
+    def key(self, preferences: Dict) -> str:
+        normalized = {k: v for k, v in preferences.items() if k != 'start_date'}
+        payload = json.dumps([normalized, self._data_version, datetime.datetime.now().strftime('%b')],
+                             sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _advance(self, data_version: Tuple) -> bool:
+        if self._data_version is None or data_version > self._data_version:
+            self._entries.clear()
+            self._data_version = data_version
+        return data_version == self._data_version
+
+    def advance(self, data_version: Tuple):
+        """Drop the in-process entries for data older than `data_version`."""
+        with self._lock:
+            self._advance(data_version)
+
+    def keys(self, preference_sets: List[Dict]) -> List[str]:
+        """Keys of `preference_sets`, taken under the lock after moving to the current data
+        version, as get and put take theirs."""
+        with self._lock:
+            self._advance(current_data().version)
+            return [self.key(preferences) for preferences in preference_sets]
+
+    def get(self, preferences: Dict) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            if not self._advance(current_data().version):
+                self.counters["misses"] += 1
+                return None
+            key = self.key(preferences)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+            elif self._db is not None:
+                row = self._db.execute("SELECT stored, plan FROM itineraries WHERE key = ? AND stored > ?",
+                                       (key, now - self.ttl_seconds)).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+                    self.counters["shared_hits"] += 1
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+        plan = decode_json(entry[1])
+        start_date = datetime.datetime.strptime(preferences['start_date'], '%Y-%m-%d').date()
+        for day in plan['days']:
+            day['date'] = (start_date + datetime.timedelta(days=day['date'])).isoformat()
+        plan['user_preferences'] = json.loads(json.dumps(preferences, default=list))
+        return plan
+
+    def put(self, preferences: Dict, plan: Dict):
+        if not any(day['pois'] for day in plan['days']):
+            return  # the fallback for a planning error; never pin it
+        start_date = datetime.datetime.strptime(preferences['start_date'], '%Y-%m-%d').date()
+        stored = dict(plan, user_preferences=None, days=[
+            dict(day, date=(datetime.date.fromisoformat(day['date']) - start_date).days) for day in plan['days']
+        ])
+        entry = (time.time(), encode_json(stored).decode())
+        with self._lock:
+            if not self._advance(current_data().version):
+                return
+            key = self.key(preferences)
+            self._remember(key, entry)
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO itineraries VALUES (?, ?, ?)", (key, entry[0], entry[1]))
+                self._db.execute("DELETE FROM itineraries WHERE stored <= ?", (entry[0] - self.ttl_seconds,))
+                self._db.execute("DELETE FROM itineraries WHERE key NOT IN "
+                                 "(SELECT key FROM itineraries ORDER BY stored DESC LIMIT ?)", (self.max_entries,))
+                self._db.commit()
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM itineraries")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["shared_hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self._entries), shared=self._db is not None,
+                        hit_rate=round((lookups - self.counters["misses"]) / lookups, 4) if lookups else 0.0)
+
+itinerary_cache = ItineraryCache(config.ITINERARY_CACHE_SIZE, config.ITINERARY_CACHE_TTL_SECONDS,
+                                 config.ITINERARY_CACHE_PATH)
+
+# --------------------
+# Solver Process Pool
+# --------------------
+class SolverPoolBusy(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+_worker_data = {"key": None, "replayed": 0}
+
+def _attach_worker_data(ref: Tuple[str, int, Tuple[POI, ...]]):
+    """Make the snapshot `ref` names live in this worker: the artifacts mapped from its
+    path (shared with every other process mapping them) plus the POIs added at runtime."""
+    path, generation, added = ref
+    if _worker_data["key"] != (path, generation):
+        train_data, poi_storage, travel_matrix = load_artifacts(path)
+        snapshot = DataSnapshot(generation, train_data, poi_storage, travel_matrix, TransitRouter(train_data), path)
+        snapshot.transit_router.warm()
+        set_live_data(snapshot)
+        _worker_data.update(key=(path, generation), replayed=0)
+    for poi in added[_worker_data["replayed"]:]:
+        live_data().poi_storage.add_poi(poi)
+    _worker_data["replayed"] = max(_worker_data["replayed"], len(added))
+
+def _generate_in_worker(preferences: Dict, deadline: float, ref: Tuple) -> Optional[Dict]:
+    if time.time() > deadline:
+        return None  # expired while queued
+    _attach_worker_data(ref)
+    return plan_dict(trip_planner.generate_itinerary(preferences))
+
+class SolverPool:
+    """Runs generate_itinerary in worker processes so CPU-bound planning never holds the
+    GIL of the serving process.
+
+    At most `max_pending` jobs are admitted (running plus queued); beyond that `run`
+    raises SolverPoolBusy. Workers are started once from a forkserver (spawn where there
+    is none), never forked from the threaded serving process, and attach to data by
+    path: every job names the artifact directory of the caller's snapshot and the POIs
+    added to it since, and a worker maps a new directory only when that changes. A
+    snapshot not mapped from disk is published to a private directory first. A job
+    past its deadline is abandoned by the caller and skipped by a worker that has not
+    started it; a running job keeps its slot until it finishes.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._in_flight = 0
+        self._executor = None
+        self._refs: "OrderedDict[int, Tuple[DataSnapshot, str, int]]" = OrderedDict()
+        self._published = None  # DataGenerations for snapshots built in process
+        self._lock = threading.Lock()
+        self.counters = {"completed": 0, "rejected": 0, "timeouts": 0, "published": 0}
+
+    def _count(self, counter: str, in_flight: int = 0):
+        with self._lock:
+            self.counters[counter] += 1
+            self._in_flight += in_flight
+
+    def _data_ref(self) -> Tuple[str, int, Tuple[POI, ...]]:
+        snapshot = current_data()
+        with self._lock:
+            entry = self._refs.get(id(snapshot))
+            if entry is None or entry[0] is not snapshot:
+                path, replayed = snapshot.path, 0
+                if path is None:
+                    if self._published is None:
+                        root = tempfile.mkdtemp(prefix="solver-pool-")
+                        atexit.register(shutil.rmtree, root, True)
+                        self._published = DataGenerations(root, keep=2)
+                    path = self._published.path(self._published.publish(
+                        snapshot.train_data, snapshot.poi_storage, snapshot.travel_matrix))
+                    replayed = len(snapshot.poi_storage.added)  # already in the published files
+                    self.counters["published"] += 1
+                entry = (snapshot, path, replayed)
+                self._refs[id(snapshot)] = entry
+                while len(self._refs) > 2:  # the live snapshot and one still pinned by older requests
+                    self._refs.popitem(last=False)
+            self._refs.move_to_end(id(snapshot))
+        _, path, replayed = entry
+        return (path, snapshot.generation, tuple(snapshot.poi_storage.added[replayed:]))
+
+    def _ensure_executor(self, ref: Tuple) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context,
+                                                     initializer=_attach_worker_data, initargs=(ref,))
+            return self._executor
+
+    def start(self):
+        """Start the workers and attach them to the current data now rather than on the first request."""
+        ref = self._data_ref()
+        executor = self._ensure_executor(ref)
+        for future in [executor.submit(_attach_worker_data, ref) for _ in range(self.workers)]:
+            future.result()
+
+    def run(self, preferences: Dict, timeout: float) -> Dict:
+        with self._lock:
+            admitted = self._in_flight < self.max_pending
+            if admitted:
+                self._in_flight += 1
+            else:
+                self.counters["rejected"] += 1
+        if not admitted:
+            raise SolverPoolBusy()
+        try:
+            ref = self._data_ref()
+            future = self._ensure_executor(ref).submit(_generate_in_worker, preferences, time.time() + timeout, ref)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda _: self._count("completed", -1))
+        try:
+            plan = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            plan = None
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None  # a worker died; start a fresh pool for the next job
+            raise
+        if plan is None:
+            self._count("timeouts")
+            raise TimeoutError(f"no itinerary within {timeout:g} s")
+        return plan
+
+    def run_batches(self, tasks: List[List[Tuple[int, Dict]]]) -> Iterable[List[Tuple[int, Optional[Dict], Optional[str]]]]:
+        """_generate_batch_in_worker results for `tasks`, as they finish. Tasks are not admitted
+        like requests; instead at most one per worker is queued at a time, so requests that
+        arrive meanwhile wait behind at most one batch task."""
+        ref = self._data_ref()
+        executor = self._ensure_executor(ref)
+        queued, running = iter(tasks), set()
+        try:
+            while True:
+                for task in queued:
+                    running.add(executor.submit(_generate_batch_in_worker, task, ref))
+                    if len(running) >= self.workers:
+                        break
+                if not running:
+                    return
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            raise
+        finally:
+            for future in running:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, workers=self.workers, max_pending=self.max_pending, in_flight=self._in_flight)
+
+solver_pool = SolverPool(config.SOLVER_WORKERS, config.SOLVER_MAX_PENDING) if config.SERVING_MODE == "pool" else None
+
+def plan_itinerary(preferences: Dict, timeout: float, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Serialized TripPlan for `preferences`, from the solver pool when serving in pool mode.
+    Progress is only reported for plans generated in this process."""
+    if solver_pool is None:
+        return plan_dict(trip_planner.generate_itinerary(preferences, progress))
+    return solver_pool.run(preferences, timeout)
+
+def cached_itinerary(preferences: Dict, timeout: float, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    plan = itinerary_cache.get(preferences)
+    if plan is None:
+        plan = plan_itinerary(preferences, timeout, progress)
+        itinerary_cache.put(preferences, plan)
+    return plan
+
+# --------------------
+# Batch Generation
+# --------------------
+def _generate_batch_in_worker(batch: List[Tuple[int, Dict]],
+                              ref: Optional[Tuple] = None) -> List[Tuple[int, Optional[Dict], Optional[str]]]:
+    if ref is not None:
+        _attach_worker_data(ref)
+    results = []
+    with pinned_data(), shared_scoring():
+        for index, preferences in batch:
+            try:
+                results.append((index, plan_dict(trip_planner.generate_itinerary(preferences)), None))
+            except Exception as e:
+                logger.error(f"Batch itinerary {index} failed: {e}", exc_info=True)
+                results.append((index, None, str(e)))
+    return results
+
+_batch_pool: Optional[SolverPool] = None
+_batch_pool_lock = threading.Lock()
+
+def batch_pool(workers: int) -> SolverPool:
+    """The serving solver pool in pool mode, else a pool of `workers` kept for later batches."""
+    global _batch_pool
+    if solver_pool is not None:
+        return solver_pool
+    with _batch_pool_lock:
+        if _batch_pool is None or _batch_pool.workers != workers:
+            if _batch_pool is not None:
+                _batch_pool.shutdown()
+            _batch_pool = SolverPool(workers, max_pending=0)
+        return _batch_pool
+
+def generate_batch(preference_sets: List[Dict], workers: int = config.BATCH_WORKERS, prime_cache: bool = True):
+    """Records for many normalized preference sets: one `itinerary` (or `error`) record per
+    set, by index, then a `summary` with the throughput.
+
+    The whole batch plans against one snapshot. Identical sets are planned once and cached
+    plans are reused. The rest are grouped by their scoring inputs so that each task
+    filters and scores the catalogue once for its whole group. With more than one worker
+    the tasks run on `batch_pool`, and their plans go into the itinerary cache when
+    `prime_cache` is set.
+    """
+    with pinned_data():
+        yield from _generate_batch(preference_sets, workers, prime_cache)
+
+def _generate_batch(preference_sets: List[Dict], workers: int, prime_cache: bool):
+    started = time.perf_counter()
+    by_key = {}
+    for index, key in enumerate(itinerary_cache.keys(preference_sets)):
+        by_key.setdefault(key, []).append(index)
+    counts = {"generated": 0, "cached": 0, "failed": 0}
+
+    def records(indices: List[int], plan: Optional[Dict], error: Optional[str]):
+        for index in indices:
+            if error is None:
+                yield {'type': 'itinerary', 'index': index, 'data': plan}
+            else:
+                yield {'type': 'error', 'index': index, 'message': error}
+
+    groups, same = defaultdict(list), {}
+    for indices in by_key.values():
+        preferences = preference_sets[indices[0]]
+        plan = itinerary_cache.get(preferences)
+        if plan is not None:
+            counts["cached"] += len(indices)
+            yield from records(indices, plan, None)
+            continue
+        same[indices[0]] = indices
+        group = json.dumps([preferences.get(name) for name in ('interests', 'accessibility_needs', 'family_trip',
+                                                                'budget', 'pace', 'home_city', 'base_location')],
+                           default=list)
+        groups[group].append((indices[0], preferences))
+
+    pool = batch_pool(workers) if workers > 1 else None
+    workers = pool.workers if pool else 1
+    pending = sum(len(members) for members in groups.values())
+    size = max(1, math.ceil(pending / (4 * workers)))  # a few tasks per worker evens out uneven plans
+    tasks = [members[k:k + size] for members in groups.values() for k in range(0, len(members), size)]
+    if pool is not None and len(tasks) > 1:
+        finished = pool.run_batches(tasks)
+    else:
+        finished = (_generate_batch_in_worker(task) for task in tasks)
+    for results in finished:
+        for index, plan, error in results:
+            counts["failed" if error else "generated"] += len(same[index])
+            if plan is not None and prime_cache:
+                itinerary_cache.put(preference_sets[index], plan)
+            yield from records(same[index], plan, error)
+    seconds = time.perf_counter() - started
+    yield {'type': 'summary', 'data': dict(counts, itineraries=len(preference_sets), unique=len(by_key),
+                                           workers=workers, seconds=round(seconds, 3),
+                                           itineraries_per_second=round(len(preference_sets) / max(seconds, 1e-9), 2))}
+
+# --------------------
+# Itinerary Jobs
+# --------------------
+class InMemoryJobStore:
+    """Job records by id in process memory."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: Dict):
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in ('done', 'failed') and job['updated_at'] < finished_before]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, so a poll can land on any worker process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None  # opened on first use, so a connection is never inherited across a fork
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, status TEXT, updated REAL, job TEXT)")
+            self._db.commit()
+        return self._db
+
+    def put(self, job: Dict):
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                       (job['job_id'], job['status'], job['updated_at'], encode_json(job).decode()))
+            db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return decode_json(row[0]) if row is not None else None
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            db = self._connection()
+            deleted = db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                                 (finished_before,)).rowcount
+            db.commit()
+            return deleted
+
+class ItineraryJobs:
+    """Background itinerary generation for requests that outlive an HTTP timeout.
+
+    A job moves queued -> running -> done | failed; while running it carries the latest
+    progress update from generate_itinerary. Identical requests (same preferences and
+    data versions) submitted while one is queued or running share that job. A job plans
+    against the data snapshot current when it was submitted. Finished jobs are purged
+    `ttl_seconds` after their last update. The worker threads start with the first job.
+    """
+
+    def __init__(self, store, workers: int, ttl_seconds: float, deadline_seconds: float):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.deadline_seconds = deadline_seconds
+        self.workers = workers
+        self._executor = None
+        self._in_flight: Dict[str, str] = {}  # dedupe key -> job id
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "merged": 0, "done": 0, "failed": 0, "expired": 0}
+
+    @staticmethod
+    def dedupe_key(preferences: Dict, snapshot: DataSnapshot) -> str:
+        payload = json.dumps([preferences, snapshot.version], sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def submit(self, preferences: Dict) -> Tuple[Dict, bool]:
+        """Queue a job for `preferences`; returns the job and whether it was newly created."""
+        self.expire()
+        snapshot = current_data()
+        key = self.dedupe_key(preferences, snapshot)
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                self.counters["merged"] += 1
+                return self.store.get(job_id), False
+            now = time.time()
+            job = {'job_id': key[:12] + format(int(now * 1000), 'x'), 'status': 'queued', 'progress': None,
+                   'created_at': now, 'updated_at': now, 'result': None, 'error': None}
+            self.store.put(job)
+            self._in_flight[key] = job['job_id']
+            self.counters["submitted"] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="itinerary-job")
+            executor = self._executor
+        executor.submit(self._run, job['job_id'], key, preferences, snapshot)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        self.expire()
+        return self.store.get(job_id)
+
+    def expire(self):
+        expired = self.store.purge(time.time() - self.ttl_seconds)
+        if expired:
+            with self._lock:
+                self.counters["expired"] += expired
+
+    def _update(self, job_id: str, **fields):
+        job = self.store.get(job_id)
+        job.update(fields, updated_at=time.time())
+        self.store.put(job)
+
+    def _run(self, job_id: str, key: str, preferences: Dict, snapshot: DataSnapshot):
+        try:
+            self._update(job_id, status='running')
+            with pinned_data(snapshot):
+                plan = cached_itinerary(preferences, self.deadline_seconds,
+                                        progress=lambda update: self._update(job_id, progress=update))
+            self._update(job_id, status='done', result=plan)
+            outcome = "done"
+        except SolverPoolBusy:
+            self._update(job_id, status='failed', error='The planner is at capacity, please retry shortly')
+            outcome = "failed"
+        except Exception as e:
+            logger.error(f"Itinerary job {job_id} failed: {e}", exc_info=True)
+            self._update(job_id, status='failed', error=str(e))
+            outcome = "failed"
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self.counters[outcome] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._in_flight))
+
+itinerary_jobs = ItineraryJobs(SQLiteJobStore(config.JOB_STORE_PATH) if config.JOB_STORE_PATH else InMemoryJobStore(),
+                               config.JOB_WORKERS, config.JOB_TTL_SECONDS, config.JOB_DEADLINE_SECONDS)
+
+# --------------------
+# Chat Assistant
+# --------------------
+CHAT_SYSTEM_PROMPT = """You are a multilingual travel assistant for Jharkhand, India.
+                    Answer concisely but include key facts (history, best season, transport, local food).
+                    If user's language is not Hindi or English, detect and reply in that language.
+                    When giving places, add short lat/long or nearest city for map use.
+                    Focus on Jharkhand's attractions like:
+                    - Waterfalls: Hundru Falls, Dassam Falls, Jonha Falls
+                    - Hills: Parasnath Hill, Netarhat, Tagore Hill
+                    - Wildlife: Betla National Park, Dalma Wildlife Sanctuary
+                    - Tribal culture: Santhal, Munda, Oraon tribes
+                    - Festivals: Sarhul, Karma, Tusu
+                    - Cities: Ranchi, Jamshedpur, Dhanbad, Bokaro
+                    """
+CHAT_FALLBACK = "I'm having trouble processing your request right now. Please try asking about Jharkhand's waterfalls, trekking spots, or tribal culture."
+
+class ChatBusy(Exception):
+    """Every completion slot stayed taken for CHAT_QUEUE_SECONDS."""
+
+class ChatAssistant:
+    """Answers /chat through one pooled model client.
+
+    Completions share a bounded keep-alive connection pool and at most `max_concurrency`
+    run at once; other requests wait CHAT_QUEUE_SECONDS for a slot and are then turned
+    away, so a slow model cannot pile up threads behind the proxy. Each answer must arrive
+    within CHAT_DEADLINE_SECONDS, retries included. Answers are cached for the TTL under
+    the normalized prompt, so rephrasings that differ only in case, spacing, punctuation
+    or Unicode form share one completion. The client is built on first use.
+    """
+
+    RETRYABLE = (APIConnectionError, RateLimitError, InternalServerError)
+
+    def __init__(self, base_url: Optional[str] = None, max_concurrency: int = config.CHAT_MAX_CONCURRENCY,
+                 max_entries: int = config.CHAT_CACHE_SIZE, ttl_seconds: float = config.CHAT_CACHE_TTL_SECONDS):
+        self.base_url = base_url
+        self._client = None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0,
+                         "completions": 0, "retries": 0, "rejected": 0}
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        # Category-based so Devanagari vowel signs survive; punctuation and symbols become spaces
+        text = unicodedata.normalize('NFKC', message).casefold()
+        return ' '.join(''.join(' ' if unicodedata.category(c)[0] in 'PS' else c for c in text).split())
+
+    def key(self, message: str) -> str:
+        return hashlib.sha256("\x1f".join((config.CHAT_MODEL, CHAT_SYSTEM_PROMPT, self.normalize(message))).encode()).hexdigest()
+
+    def cached(self, message: str) -> Optional[str]:
+        key = self.key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def store(self, message: str, answer: str):
+        if not answer:
+            return
+        key = self.key(message)
+        with self._lock:
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _ensure_client(self) -> Groq:
+        # Not at import: a server that forks workers after importing must not share one connection pool
+        with self._lock:
+            if self._client is None:
+                # A local OpenAI-compatible server needs no key, but the client insists on one
+                api_key = os.getenv("GROQ_API_KEY") or ("unused" if self.base_url else None)
+                limits = httpx.Limits(max_connections=config.CHAT_MAX_CONNECTIONS,
+                                      max_keepalive_connections=config.CHAT_MAX_CONNECTIONS)
+                self._client = Groq(api_key=api_key, base_url=self.base_url, max_retries=0,
+                                    http_client=httpx.Client(limits=limits))
+            return self._client
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=config.CHAT_QUEUE_SECONDS):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise ChatBusy()
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _create(self, message: str, stream: bool):
+        client = self._ensure_client()
+        deadline = time.monotonic() + config.CHAT_DEADLINE_SECONDS
+        for attempt in range(config.CHAT_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            try:
+                with self._lock:
+                    self.counters["completions"] += 1
+                return client.chat.completions.create(
+                    model=config.CHAT_MODEL,
+                    messages=[{"role": "system", "content": CHAT_SYSTEM_PROMPT}, {"role": "user", "content": message}],
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=stream,
+                    timeout=httpx.Timeout(remaining, connect=min(remaining, config.CHAT_CONNECT_TIMEOUT_SECONDS)))
+            except self.RETRYABLE as e:
+                backoff = 0.25 * 2 ** attempt
+                # A retry needs time left for the backoff and at least a second of model time
+                if attempt == config.CHAT_MAX_RETRIES or deadline - time.monotonic() < backoff + 1.0:
+                    raise
+                logger.warning(f"Chat completion failed, retrying: {e}")
+                with self._lock:
+                    self.counters["retries"] += 1
+                time.sleep(backoff)
+
+    def complete(self, message: str) -> Tuple[str, bool]:
+        """The answer to `message` and whether it came from the cache."""
+        answer = self.cached(message)
+        if answer is not None:
+            return answer, True
+        self._acquire()
+        try:
+            completion = self._create(message, stream=False)
+        finally:
+            self._release()
+        answer = completion.choices[0].message.content
+        self.store(message, answer)
+        return answer, False
+
+    def open_stream(self, message: str) -> Tuple[Iterable[str], bool]:
+        """Text deltas of the answer as the model produces them, and whether it came from the cache.
+
+        Raises before returning when no slot frees up or the model cannot be reached, so
+        callers can still answer with a status code; the slot is held until the deltas
+        are exhausted or closed.
+        """
+        answer = self.cached(message)
+        if answer is not None:
+            return iter((answer,)), True
+        self._acquire()
+        try:
+            chunks = self._create(message, stream=True)
+        except BaseException:
+            self._release()
+            raise
+        deltas = self._deltas(message, chunks)
+        next(deltas)
+        return deltas, False
+
+    def _deltas(self, message: str, chunks) -> Iterable[str]:
+        parts = []
+        try:
+            yield None  # primed by open_stream: from here on, closing the generator frees the slot
+            for chunk in chunks:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    yield text
+            self.store(message, ''.join(parts))
+        finally:
+            chunks.close()
+            self._release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self._entries), in_flight=self._in_flight,
+                        hit_rate=round(self.counters["hits"] / lookups, 4) if lookups else 0.0)
+
+chat_assistant = ChatAssistant(config.CHAT_BASE_URL)
+
 # --------------------
 # Flask API Endpoints
 # --------------------
+def poi_summary(poi: POI) -> Dict:
+    return {
+        'id': poi.id,
+        'name': poi.name,
+        'city': poi.city,
+        'categories': poi.categories,
+        'description': poi.description,
+        'rating': poi.rating,
+        'review_count': poi.review_count,
+        'duration': poi.duration,
+        'cost': poi.cost,
+        'best_time_to_visit': poi.best_time_to_visit or ['Year-round'],
+        'family_friendly': poi.family_friendly,
+        'accessibility_score': poi.accessibility_score,
+        'lat': poi.lat,
+        'lon': poi.lon
+    }
+
+POI_SUMMARY_FIELDS = ('id', 'name', 'city', 'categories', 'description', 'rating', 'review_count', 'duration',
+                      'cost', 'best_time_to_visit', 'family_friendly', 'accessibility_score', 'lat', 'lon')
+
 @app.route('/api/available-pois', methods=['GET'])
 def get_available_pois():
+    """The catalogue as POI summaries. Optional `fields` (comma-separated summary keys)
+    projects each summary, `offset`/`limit` select a page in catalogue order."""
     try:
-        all_pois = poi_storage.get_all_pois()
-        pois_json = [
-            {
-                'id': poi.id,
-                'name': poi.name,
-                'city': poi.city,
-                'categories': poi.categories,
-                'description': poi.description,
-                'rating': poi.rating,
-                'review_count': poi.review_count,
-                'duration': poi.duration,
-                'cost': poi.cost,
-                'best_time_to_visit': poi.best_time_to_visit or ['Year-round'],
-                'family_friendly': poi.family_friendly,
-                'accessibility_score': poi.accessibility_score,
-                'lat': poi.lat,
-                'lon': poi.lon
-            } for poi in all_pois
-        ]
+        fields = [f for f in request.args.get('fields', '').split(',') if f]
+        unknown = [f for f in fields if f not in POI_SUMMARY_FIELDS]
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        if unknown or offset < 0 or (limit is not None and limit < 1):
+            raise ValueError(f"unknown fields {unknown}" if unknown else "offset must be >= 0 and limit >= 1")
+    except ValueError as e:
         return jsonify({
+            'status': 'error',
+            'message': f'Invalid query: {e}'
+        }), 400
+    fields = tuple(f for f in POI_SUMMARY_FIELDS if f in fields) or None
+    data = current_data()
+    poi_storage = data.poi_storage
+
+    def render():
+        total = len(poi_storage)
+        stop = total if limit is None else min(total, offset + limit)
+        summaries = [poi_summary(poi) for poi in poi_storage.views(np.arange(min(offset, stop), stop))]
+        if fields:
+            summaries = [{f: summary[f] for f in fields} for summary in summaries]
+        return {
             'status': 'success',
-            'data': pois_json
-        }), 200
+            'data': summaries,
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        }
+
+    try:
+        return rendered_responses.respond(('available-pois', fields, offset, limit), data.version, render)
     except Exception as e:
         logger.error(f"Error fetching POIs: {str(e)}")
         return jsonify({
@@ -823,6 +3789,81 @@ def get_available_pois():
             'message': f'Failed to fetch POIs: {str(e)}'
         }), 500
 
+@app.route('/api/pois/nearby', methods=['GET'])
+def get_nearby_pois():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius_km = float(request.args.get('radius_km', 10))
+    except (KeyError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'lat and lon are required numbers; radius_km must be a number'
+        }), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not (0 < radius_km <= config.MAX_NEARBY_RADIUS_KM):
+        return jsonify({
+            'status': 'error',
+            'message': f'Coordinates out of range or radius_km not in (0, {config.MAX_NEARBY_RADIUS_KM}]'
+        }), 400
+    try:
+        data = current_data()
+        nearby = data.poi_storage.pois_within(lat, lon, radius_km)
+        station = data.train_data.nearest_station(lat, lon, config.MAX_STATION_DISTANCE_KM)
+        return jsonify({
+            'status': 'success',
+            'data': [dict(poi_summary(poi), distance_km=round(distance, 3)) for poi, distance in nearby],
+            'nearest_station_id': station.id if station else None
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching nearby POIs: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch nearby POIs: {str(e)}'
+        }), 500
+
+def parse_itinerary_request(data: Dict) -> Tuple[Dict, float]:
+    """Normalized preferences and the deadline in seconds for an itinerary request body."""
+    preferences = {
+        'num_days': int(data.get('num_days', 7)),
+        'budget': float(data.get('budget', config.DEFAULT_BUDGET)),
+        'start_date': data.get('start_date', datetime.date.today().isoformat()),
+        'home_city': data.get('home_city', 'Mumbai'),
+        'base_location': data.get('base_location', None),  # Accept [lat, lon]
+        'destination_city': data.get('destination_city', 'Ranchi'),
+        'interests': data.get('interests', []),
+        'family_trip': bool(data.get('family_trip', False)),
+        'accessibility_needs': bool(data.get('accessibility_needs', False)),
+        'transport_mode': data.get('transport_mode', 'car'),
+        'pace': data.get('pace', 'moderate'),
+        'must_visit': data.get('must_visit', []),
+        'solver': data.get('solver', config.DEFAULT_SOLVER),
+        'planner': data.get('planner', config.DEFAULT_PLANNER)
+    }
+    
+    available_categories = list(set(trip_planner.personalization.category_weights.keys()))
+    preferences['interests'] = [i.lower() for i in preferences['interests'] if i.lower() in available_categories]
+    preferences['must_visit'] = [pid for pid in preferences['must_visit'] if pid in current_data().poi_storage]
+    preferences['pace'] = preferences['pace'].lower() if preferences['pace'].lower() in config.PACE_CONFIGS else 'moderate'
+    preferences['transport_mode'] = preferences['transport_mode'].lower() if preferences['transport_mode'].lower() in config.TRANSPORT_PROFILES else 'car'
+    preferences['solver'] = str(preferences['solver']).lower() if str(preferences['solver']).lower() in config.SOLVERS else config.DEFAULT_SOLVER
+    preferences['planner'] = str(preferences['planner']).lower() if str(preferences['planner']).lower() in config.PLANNERS else config.DEFAULT_PLANNER
+
+    try:
+        deadline_seconds = min(float(data.get('deadline_seconds', config.ITINERARY_DEADLINE_SECONDS)),
+                               config.ITINERARY_DEADLINE_SECONDS)
+    except (TypeError, ValueError):
+        deadline_seconds = config.ITINERARY_DEADLINE_SECONDS
+
+    # Validate base_location
+    if preferences['base_location']:
+        try:
+            lat, lon = map(float, preferences['base_location'])
+            preferences['base_location'] = (lat, lon)
+        except (ValueError, TypeError):
+            logger.warning("Invalid base_location provided, ignoring")
+            preferences['base_location'] = None
+    return preferences, deadline_seconds
+
 @app.route('/api/generate-itinerary', methods=['POST'])
 def generate_itinerary():
     try:
@@ -832,64 +3873,331 @@ def generate_itinerary():
                 'status': 'error',
                 'message': 'No input data provided'
             }), 400
-        
-        preferences = {
-            'num_days': int(data.get('num_days', 7)),
-            'budget': float(data.get('budget', config.DEFAULT_BUDGET)),
-            'start_date': data.get('start_date', datetime.date.today().isoformat()),
-            'home_city': data.get('home_city', 'Mumbai'),
-            'base_location': data.get('base_location', None),  # Accept [lat, lon]
-            'destination_city': data.get('destination_city', 'Ranchi'),
-            'interests': data.get('interests', []),
-            'family_trip': bool(data.get('family_trip', False)),
-            'accessibility_needs': bool(data.get('accessibility_needs', False)),
-            'transport_mode': data.get('transport_mode', 'car'),
-            'pace': data.get('pace', 'moderate'),
-            'must_visit': data.get('must_visit', [])
-        }
-        
-        available_categories = list(set(trip_planner.personalization.category_weights.keys()))
-        preferences['interests'] = [i.lower() for i in preferences['interests'] if i.lower() in available_categories]
-        valid_poi_ids = {poi.id for poi in poi_storage.get_all_pois()}
-        preferences['must_visit'] = [pid for pid in preferences['must_visit'] if pid in valid_poi_ids]
-        preferences['pace'] = preferences['pace'].lower() if preferences['pace'].lower() in config.PACE_CONFIGS else 'moderate'
-        preferences['transport_mode'] = preferences['transport_mode'].lower() if preferences['transport_mode'].lower() in config.TRANSPORT_PROFILES else 'car'
-
-        # Validate base_location
-        if preferences['base_location']:
-            try:
-                lat, lon = map(float, preferences['base_location'])
-                preferences['base_location'] = (lat, lon)
-            except (ValueError, TypeError):
-                logger.warning("Invalid base_location provided, ignoring")
-                preferences['base_location'] = None
+        preferences, deadline_seconds = parse_itinerary_request(data)
+        plan = cached_itinerary(preferences, deadline_seconds)
+        return json_response({
+            'status': 'success',
+            'data': plan
+        })
+    except SolverPoolBusy:
+        return jsonify({
+            'status': 'error',
+            'message': 'The planner is at capacity, please retry shortly'
+        }), 429, {'Retry-After': '1'}
+    except TimeoutError as e:
+        logger.warning(f"Itinerary generation timed out: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Itinerary generation timed out: {e}'
+        }), 504
+    except Exception as e:
+        logger.error(f"Error in itinerary generation endpoint: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'An internal error occurred: {e}'
+        }), 500
+
+def json_response(payload: Dict, status: int = 200, headers: Optional[Dict] = None) -> Response:
+    """Like jsonify, through the fast encoder."""
+    return Response(encode_json(payload), status=status, headers=headers, mimetype='application/json')
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """Brotli (when installed) or gzip for clients that accept it; streams pass through."""
+    if (response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300):
+        return response
+    body = response.get_data()
+    if len(body) < config.COMPRESS_MIN_BYTES:
+        return response
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(body, quality=config.BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=config.GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
+
+class RenderedResponses:
+    """Pre-encoded, precompressed bodies for read-mostly GET endpoints.
+
+    Entries are keyed on the endpoint and its normalized query, and remember the data
+    version they were rendered from; a request that sees a newer version (e.g. after
+    add_poi) renders again. The ETag is a hash of the body, so worker processes holding
+    the same data agree on it. Compressed variants are built on first use.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[Any, str, Dict[str, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "renders": 0, "not_modified": 0}
+
+    def _entry(self, key: Tuple, version: Any, render: Callable[[], Dict]) -> Tuple[str, Dict[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1], entry[2]
+        body = encode_json(render())
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        variants = {'identity': body}
+        with self._lock:
+            self._entries[key] = (version, etag, variants)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.counters["renders"] += 1
+        return etag, variants
+
+    def respond(self, key: Tuple, version: Any, render: Callable[[], Dict]) -> Response:
+        etag, variants = self._entry(key, version, render)
+        if request.if_none_match.contains(etag):
+            with self._lock:
+                self.counters["not_modified"] += 1
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        body = variants['identity']
+        encoding = 'identity'
+        if len(body) >= config.COMPRESS_MIN_BYTES:
+            if brotli is not None and request.accept_encodings['br']:
+                encoding = 'br'
+            elif request.accept_encodings['gzip']:
+                encoding = 'gzip'
+        if encoding not in variants:
+            # Racing threads may both compress; the bytes are identical
+            variants[encoding] = (brotli.compress(body, quality=config.BROTLI_QUALITY) if encoding == 'br'
+                                  else gzip.compress(body, compresslevel=config.GZIP_LEVEL))
+        response = Response(variants[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # cache, but revalidate with If-None-Match
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+rendered_responses = RenderedResponses(config.RENDERED_CACHE_SIZE)
+
+def plan_records(plan: Dict):
+    for day in plan['days']:
+        yield 'day', day
+    yield 'summary', dict({k: v for k, v in plan.items() if k != 'days'}, adjusted_days=[])
+
+def streamed_plan_records(preferences: Dict, snapshot: DataSnapshot):
+    """Records for a plan generated on this thread from `snapshot`, each day sent as soon
+    as it is scheduled. Budget enforcement runs after the last day, so the summary
+    re-sends any day it trimmed."""
+    with pinned_data(snapshot):
+        days = trip_planner.iter_itinerary(preferences)
+        streamed = {}
+        try:
+            while True:
+                day = next(days)
+                streamed[day.day_number] = (len(day.pois), day.total_cost, day.total_travel_time)
+                yield 'day', day_dict(day)
+        except StopIteration as finished:
+            plan = plan_dict(finished.value)
+        itinerary_cache.put(preferences, plan)
+    summary = {k: v for k, v in plan.items() if k != 'days'}
+    summary['adjusted_days'] = [day for day in plan['days']
+                                if streamed.get(day['day_number']) != (len(day['pois']), day['total_cost'], day['total_travel_time'])]
+    yield 'summary', summary
+
+@app.route('/api/generate-itinerary/stream', methods=['POST'])
+def stream_itinerary():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'No input data provided'
+            }), 400
+        preferences, deadline_seconds = parse_itinerary_request(data)
+        plan = itinerary_cache.get(preferences)
+        if plan is None and solver_pool is not None:
+            # Worker processes cannot hand back days one by one; stream the finished plan
+            plan = plan_itinerary(preferences, deadline_seconds)
+            itinerary_cache.put(preferences, plan)
+        records = plan_records(plan) if plan is not None else streamed_plan_records(preferences, current_data())
+    except SolverPoolBusy:
+        return jsonify({
+            'status': 'error',
+            'message': 'The planner is at capacity, please retry shortly'
+        }), 429, {'Retry-After': '1'}
+    except TimeoutError as e:
+        logger.warning(f"Itinerary generation timed out: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Itinerary generation timed out: {e}'
+        }), 504
+    except Exception as e:
+        logger.error(f"Error in itinerary stream endpoint: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'An internal error occurred: {e}'
+        }), 500
+
+    sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+
+    def encode(kind: str, payload: Dict) -> bytes:
+        if sse:
+            return b"event: " + kind.encode() + b"\ndata: " + encode_json(payload) + b"\n\n"
+        return encode_json({'type': kind, 'data': payload}) + b"\n"
+
+    def generate():
+        try:
+            for kind, payload in records:
+                yield encode(kind, payload)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Error while streaming itinerary: {e}", exc_info=True)
+            yield encode('error', {'message': f'An internal error occurred: {e}'})
+
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/generate-itineraries/batch', methods=['POST'])
+def generate_itineraries_batch():
+    """Plan many preference sets at once, streamed back as NDJSON records."""
+    if not admin_authorized():
+        return jsonify({
+            'status': 'error',
+            'message': 'Batch generation needs ADMIN_TOKEN set and sent as a bearer token'
+        }), 403
+    try:
+        data = request.get_json()
+        bodies = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(bodies, list) or not bodies or not all(isinstance(item, dict) for item in bodies):
+            return jsonify({
+                'status': 'error',
+                'message': 'Provide "requests": a list of itinerary request bodies'
+            }), 400
+        if len(bodies) > config.BATCH_MAX_ITINERARIES:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {config.BATCH_MAX_ITINERARIES} itineraries per batch'
+            }), 413
+        preference_sets = [parse_itinerary_request(item)[0] for item in bodies]
+    except Exception as e:
+        logger.error(f"Error in batch itinerary endpoint: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'An internal error occurred: {e}'
+        }), 500
+    include_plans = data.get('include_plans', True)
+    records = generate_batch(preference_sets, prime_cache=data.get('prime_cache', True))
+
+    def generate():
+        try:
+            for record in records:
+                if include_plans or record['type'] != 'itinerary':
+                    yield encode_json(record) + b"\n"
+        except Exception as e:
+            logger.error(f"Error while streaming batch itineraries: {e}", exc_info=True)
+            yield encode_json({'type': 'error', 'message': f'An internal error occurred: {e}'}) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/itinerary/replan', methods=['POST'])
+def replan_itinerary():
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('plan'), dict) or not data['plan'].get('days'):
+            return jsonify({
+                'status': 'error',
+                'message': 'Provide the previous itinerary as "plan" and the edits as "changes"'
+            }), 400
+        plan, replan = trip_planner.replan_itinerary(data['plan'], data.get('changes') or {})
+        return json_response({
+            'status': 'success',
+            'data': plan_dict(plan),
+            'replan': replan
+        })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Cannot apply these changes: {e}'
+        }), 400
+    except Exception as e:
+        logger.error(f"Error in itinerary replan endpoint: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'An internal error occurred: {e}'
+        }), 500
 
-        trip_plan = trip_planner.generate_itinerary(preferences)
+@app.route('/api/itinerary-jobs', methods=['POST'])
+def create_itinerary_job():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'No input data provided'
+            }), 400
+        preferences, _ = parse_itinerary_request(data)
+        job, created = itinerary_jobs.submit(preferences)
         return jsonify({
             'status': 'success',
-            'data': asdict(trip_plan)
-        }), 200
+            'data': job
+        }), 202 if created else 200, {'Location': f"/api/itinerary-jobs/{job['job_id']}"}
     except Exception as e:
-        logger.error(f"Error in itinerary generation endpoint: {e}", exc_info=True)
+        logger.error(f"Error creating itinerary job: {e}", exc_info=True)
         return jsonify({
             'status': 'error',
             'message': f'An internal error occurred: {e}'
         }), 500
 
-@app.route('/api/options', methods=['GET'])
-def get_options():
+@app.route('/api/itinerary-jobs/<job_id>', methods=['GET'])
+def get_itinerary_job(job_id):
     try:
+        job = itinerary_jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unknown or expired job: {job_id}'
+            }), 404
+        return json_response({
+            'status': 'success',
+            'data': job
+        })
+    except Exception as e:
+        logger.error(f"Error fetching itinerary job: {e}", exc_info=True)
         return jsonify({
+            'status': 'error',
+            'message': f'An internal error occurred: {e}'
+        }), 500
+
+@app.route('/api/options', methods=['GET'])
+def get_options():
+    def render():
+        return {
             'status': 'success',
             'data': {
                 'transport_modes': list(config.TRANSPORT_PROFILES.keys()),
                 'pace_options': list(config.PACE_CONFIGS.keys()),
-                'available_categories': list(set(trip_planner.personalization.category_weights.keys())),
+                'solvers': list(config.SOLVERS),
+                'planners': list(config.PLANNERS),
+                'available_categories': list(trip_planner.personalization.category_weights.keys()),
                 'default_budget': config.DEFAULT_BUDGET,
                 'max_pois_per_day': config.MAX_POIS_PER_DAY,
                 'min_pois_per_day': config.MIN_POIS_PER_DAY
             }
-        }), 200
+        }
+
+    try:
+        # Options come from static configuration, so they render once per process
+        return rendered_responses.respond(('options',), None, render)
     except Exception as e:
         logger.error(f"Error fetching options: {str(e)}")
         return jsonify({
@@ -899,55 +4207,266 @@ def get_options():
 
 @app.route("/chat", methods=["POST"])
 def chat():
+    """Answer a travel question; streams SSE token events with "stream": true, ?stream=1 or Accept: text/event-stream."""
     try:
         data = request.get_json(force=True)
         user_message = data.get("message", "")
         
         if not user_message:
             return jsonify({"error": "Message is required"}), 400
-        
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a multilingual travel assistant for Jharkhand, India.
-                    Answer concisely but include key facts (history, best season, transport, local food).
-                    If user's language is not Hindi or English, detect and reply in that language.
-                    When giving places, add short lat/long or nearest city for map use.
-                    Focus on Jharkhand's attractions like:
-                    - Waterfalls: Hundru Falls, Dassam Falls, Jonha Falls
-                    - Hills: Parasnath Hill, Netarhat, Tagore Hill
-                    - Wildlife: Betla National Park, Dalma Wildlife Sanctuary
-                    - Tribal culture: Santhal, Munda, Oraon tribes
-                    - Festivals: Sarhul, Karma, Tusu
-                    - Cities: Ranchi, Jamshedpur, Dhanbad, Bokaro
-                    """
-                },
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        bot_response = completion.choices[0].message.content
-        return jsonify({"response": bot_response})
-        
+
+        if not (data.get("stream") or request.args.get('stream') == '1'
+                or 'text/event-stream' in request.headers.get('Accept', '')):
+            bot_response, cached = chat_assistant.complete(user_message)
+            return jsonify({"response": bot_response, "cached": cached})
+        deltas, cached = chat_assistant.open_stream(user_message)
+    except ChatBusy:
+        return jsonify({
+            "response": "Lots of travellers are asking right now. Please try again in a moment."
+        }), 429, {'Retry-After': '1'}
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error in chat endpoint: {e}")
+        return jsonify({"response": CHAT_FALLBACK}), 500
+
+    def encode(kind: str, payload: Dict) -> bytes:
+        return b"event: " + kind.encode() + b"\ndata: " + encode_json(payload) + b"\n\n"
+
+    def generate():
+        parts = []
+        try:
+            for text in deltas:
+                parts.append(text)
+                yield encode('token', {"text": text})
+            yield encode('done', {"response": ''.join(parts), "cached": cached})
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Error while streaming chat response: {e}")
+            yield encode('error', {"response": CHAT_FALLBACK})
+        finally:
+            close = getattr(deltas, 'close', None)
+            if close is not None:
+                close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --------------------
+# Data Reload
+# --------------------
+@app.before_request
+def pin_request_data():
+    g.data_pin = _pinned_data.set(live_data())
+
+@app.teardown_request
+def unpin_request_data(exc=None):
+    token = g.pop('data_pin', None)
+    if token is not None:
+        try:
+            _pinned_data.reset(token)
+        except ValueError:
+            pass  # torn down from another context (e.g. after a stream); the pin ends with it
+
+def data_signature() -> Optional[Tuple]:
+    """Changes when the configured data changes on disk; None when there is nothing to watch."""
+    if config.DATA_ARTIFACTS:
+        paths = [os.path.join(config.DATA_ARTIFACTS, "manifest.json")]
+    elif shared_data is not None:
+        return (shared_data.current(),)
+    elif config.DATA_SOURCE:
+        paths = [config.DATA_SOURCE] + ([os.path.join(config.DATA_SOURCE, f"{name}.parquet") for name in SOURCE_TABLES]
+                                        if os.path.isdir(config.DATA_SOURCE) else [])
+    else:
+        return None
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths)
+
+class DataReloader:
+    """Swaps in a new DataSnapshot without restarting or pausing the server.
+
+    The next snapshot (storages, travel matrix, unrolled timetable) is built on a
+    background thread while requests keep being served from the live one, then swapped
+    in with a single assignment. Requests already running, and jobs already submitted, keep
+    the snapshot they pinned until they finish. The caches move to the new data version,
+    and the solver pool's workers attach to it. One reload runs at a time. With `watch_seconds`, a watcher
+    thread reloads once the data on disk has changed and stayed unchanged for one more
+    poll; in SHARED_DATA_DIR mode that attaches every worker to a newly published
+    generation. The watcher starts with the first request (`start_data_watch`), not at
+    import, so every server process that serves requests runs its own.
+    """
+
+    def __init__(self, watch_seconds: float):
+        self.watch_seconds = watch_seconds
+        self._signature = data_signature()
+        self._thread = None
+        self._watcher = None
+        self._lock = threading.Lock()
+        self.status = {"state": "idle", "reloads": 0, "failures": 0, "started_at": None,
+                       "finished_at": None, "seconds": None, "source": None, "error": None}
+
+    def start(self, source: Optional[str] = None, rebuild: bool = True) -> Tuple[Dict, bool]:
+        """Begin a reload unless one is running; returns the status and whether it started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return dict(self.status), False
+            self.status.update(state="running", started_at=time.time(), finished_at=None, seconds=None,
+                               source=source, error=None)
+            self._thread = threading.Thread(target=self._run, args=(source, rebuild), name="data-reload", daemon=True)
+            self._thread.start()
+            return dict(self.status), True
+
+    def _run(self, source: Optional[str], rebuild: bool):
+        started = time.time()
+        try:
+            snapshot = load_data(source, rebuild, live_data().generation + 1)
+            snapshot.transit_router.warm()
+            set_live_data(snapshot)
+            itinerary_cache.advance(snapshot.version)
+            journey_leg_cache.advance(snapshot.timetable_version)
+            if solver_pool is not None:
+                solver_pool.start()
+            logger.info(f"Data generation {snapshot.generation} live after {time.time() - started:.1f} s")
+            outcome = dict(state="idle", error=None)
+        except Exception as e:
+            logger.error(f"Data reload failed, still serving generation {live_data().generation}: {e}", exc_info=True)
+            outcome = dict(state="failed", error=str(e))
+        self._signature = data_signature()
+        with self._lock:
+            self.status.update(outcome, finished_at=time.time(), seconds=round(time.time() - started, 3))
+            self.status["reloads" if outcome["state"] == "idle" else "failures"] += 1
+
+    def watch(self):
+        """Start the watcher thread, once, when there is data on disk to watch."""
+        with self._lock:
+            if self._watcher is not None or not (self.watch_seconds > 0 and self._signature is not None):
+                return
+            self._watcher = threading.Thread(target=self._poll, name="data-watch", daemon=True)
+        self._watcher.start()
+
+    def _poll(self):
+        pending = None
+        while True:
+            time.sleep(self.watch_seconds)
+            try:
+                signature = data_signature()
+            except OSError:
+                continue  # mid-replace; look again next poll
+            if signature == self._signature:
+                pending = None
+            elif signature == pending:
+                self.start(rebuild=False)
+            else:
+                pending = signature
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.status, generation=live_data().generation, loaded_at=live_data().loaded_at,
+                        watching=self._watcher is not None)
+
+data_reloader = DataReloader(config.DATA_WATCH_SECONDS)
+
+@app.before_request
+def start_data_watch():
+    if data_reloader._watcher is None:
+        data_reloader.watch()
+
+def admin_authorized() -> bool:
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), config.ADMIN_TOKEN.encode())
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def reload_data():
+    """POST starts a background reload (optionally from a `source` path); GET reports on it."""
+    if not admin_authorized():
         return jsonify({
-            "response": "I'm having trouble processing your request right now. Please try asking about Jharkhand's waterfalls, trekking spots, or tribal culture."
-        }), 500
+            'status': 'error',
+            'message': 'Admin endpoints need ADMIN_TOKEN set and sent as a bearer token'
+        }), 403
+    if request.method == 'GET':
+        return jsonify({'status': 'success', 'data': data_reloader.stats()}), 200
+    source = (request.get_json(silent=True) or {}).get('source')
+    if source is not None and not (isinstance(source, str) and os.path.exists(source)):
+        return jsonify({
+            'status': 'error',
+            'message': f'source {source!r} does not exist on the server'
+        }), 400
+    status, started = data_reloader.start(source)
+    return jsonify({'status': 'success', 'data': status}), 202 if started else 409
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'itinerary_cache': itinerary_cache.stats(),
+            'journey_leg_cache': journey_leg_cache.stats(),
+            'solver_pool': solver_pool.stats() if solver_pool else None,
+            'itinerary_jobs': itinerary_jobs.stats(),
+            'rendered_responses': rendered_responses.stats(),
+            'chat': chat_assistant.stats(),
+            'data': dict(data_reloader.stats(), pois=len(live_data().poi_storage), trains=len(live_data().train_data.train_names),
+                         poi_version=live_data().poi_storage.version, timetable_version=live_data().train_data.version)
+        }
+    }), 200
 
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "healthy", "service": "Jharkhand Travel Chatbot"})
 
-# Initialize Groq client with your API key
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 # --------------------
 # Main Application Entry Point
 # --------------------
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Namaste Jharkhand backend. Without a command, runs the API server.")
+    commands = parser.add_subparsers(dest="command")
+    build = commands.add_parser("build-artifacts", help="load a data source and write memory-mappable artifacts")
+    build.add_argument("--source", required=True, help="SQLite file or directory of Parquet files")
+    build.add_argument("--out", required=True, help="artifact directory (replaced atomically)")
+    export = commands.add_parser("export-source", help="write the currently loaded data as a SQLite source")
+    export.add_argument("path")
+    publish = commands.add_parser("publish", help="publish a new shared data generation for worker processes")
+    publish.add_argument("--source", help="SQLite file or directory of Parquet files (default: the loaded data)")
+    publish.add_argument("--root", default=config.SHARED_DATA_DIR, help="generation root (default: SHARED_DATA_DIR)")
+    batch = commands.add_parser("batch", help="precompute itineraries into NDJSON and/or the itinerary cache")
+    batch.add_argument("--input", help="JSON list or NDJSON of itinerary request bodies")
+    batch.add_argument("--grid", action="store_true", help="every destination city x pace x --days")
+    batch.add_argument("--days", type=int, nargs="+", default=[3, 5, 7])
+    batch.add_argument("--out", help="NDJSON file for the itinerary records")
+    batch.add_argument("--prime", action="store_true", help="store plans in the itinerary cache (ITINERARY_CACHE_PATH)")
+    batch.add_argument("--workers", type=int, default=config.BATCH_WORKERS)
+    args = parser.parse_args()
+
+    if args.command == "build-artifacts":
+        print(json.dumps(build_artifacts(args.source, args.out), indent=2))
+    elif args.command == "export-source":
+        export_source(args.path, live_data().train_data, live_data().poi_storage)
+    elif args.command == "publish":
+        if not args.root:
+            parser.error("publish needs --root or SHARED_DATA_DIR")
+        data = load_source(args.source) if args.source else (live_data().train_data, live_data().poi_storage)
+        print(DataGenerations(args.root, config.SHARED_DATA_KEEP).publish(*data, source=args.source))
+    elif args.command == "batch":
+        if args.prime and not config.ITINERARY_CACHE_PATH:
+            parser.error("--prime needs ITINERARY_CACHE_PATH; an in-memory cache ends with this process")
+        bodies = []
+        if args.input:
+            with open(args.input) as f:
+                text = f.read().strip()
+            bodies = json.loads(text) if text.startswith('[') else [json.loads(line) for line in text.splitlines() if line.strip()]
+        if args.grid:
+            bodies += [{'destination_city': city, 'pace': pace, 'num_days': days}
+                       for city in sorted(set(poi.city for poi in live_data().poi_storage.get_all_pois()))
+                       for pace in config.PACE_CONFIGS for days in args.days]
+        if not bodies:
+            parser.error("batch needs --input and/or --grid")
+        out = open(args.out, 'wb') if args.out else None
+        try:
+            for record in generate_batch([parse_itinerary_request(body)[0] for body in bodies], args.workers, args.prime):
+                if record['type'] == 'summary':
+                    print(json.dumps(record['data'], indent=2))
+                elif out is not None:
+                    out.write(encode_json(record) + b"\n")
+        finally:
+            if out is not None:
+                out.close()
+    else:
+        live_data()  # load the data now rather than during the first request
+        app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -2,7 +2,7 @@ import { type NextRequest, NextResponse } from "next/server";
 
 export async function POST(request: NextRequest) {
   try {
-    const { message } = await request.json();
+    const { message, stream } = await request.json();
 
     if (!message || typeof message !== "string") {
       return NextResponse.json(
@@ -11,6 +11,36 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    if (stream) {
+      try {
+        // Pass the backend's SSE token events straight through; the timeout only covers the wait for the first byte
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), 10000);
+        const pythonResponse = await fetch("http://localhost:5000/chat", {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            Accept: "text/event-stream",
+          },
+          body: JSON.stringify({ message, stream: true }),
+          signal: controller.signal,
+        });
+        clearTimeout(timer);
+
+        if (pythonResponse.ok && pythonResponse.body) {
+          return new Response(pythonResponse.body, {
+            headers: {
+              "Content-Type": "text/event-stream",
+              "Cache-Control": "no-cache",
+              "X-Accel-Buffering": "no",
+            },
+          });
+        }
+      } catch (pythonError) {
+        console.log("Python backend not available, using fallback responses");
+      }
+    }
+
     try {
       // Attempt to call Python Flask backend
       const pythonResponse = await fetch("http://localhost:5000/chat", {